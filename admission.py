@@ -0,0 +1,167 @@
+"""
+Admission control for Healthcare Chatbot
+This module rate-limits each client with a token bucket, caps the number of chats in
+flight to match the upstream quota, and sheds load once a bounded wait queue is full.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After seconds."""
+    
+    def __init__(self, status: int, retry_after: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.message = message
+
+class AdmissionController:
+    """Per-client token buckets in front of a global concurrency cap with a bounded queue."""
+    
+    def __init__(self, rate_per_minute: float = 30, burst: int = 10, max_concurrency: int = 16,
+                 max_queue: int = 32, queue_timeout: float = 10, max_clients: int = 10000):
+        """
+        Args:
+            rate_per_minute (float): Sustained requests allowed per client; 0 disables rate limiting
+            burst (int): Requests a client may make back to back before being limited
+            max_concurrency (int): Maximum requests processed at once
+            max_queue (int): Maximum requests waiting for a free slot before shedding load
+            queue_timeout (float): Seconds a request may wait for a slot
+            max_clients (int): Maximum number of client buckets tracked
+        """
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self._buckets = OrderedDict()
+        self._bucket_lock = threading.Lock()
+        self._slots = threading.Condition()
+    
+    def _take_token(self, client_id: str, cost: int = 1) -> float:
+        """Take tokens from the client's bucket; return 0, or the seconds until there are enough."""
+        if self.rate <= 0:
+            return 0
+        
+        now = time.monotonic()
+        with self._bucket_lock:
+            tokens, updated_at = self._buckets.pop(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (cost - tokens) / self.rate
+            
+            self._buckets[client_id] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+    
+    @property
+    def max_cost(self) -> Optional[int]:
+        """Most upstream calls one request may be charged for, or None without rate limiting."""
+        return self.burst if self.rate > 0 else None
+    
+    def charge(self, client_id: str, cost: int = 1):
+        """
+        Charge a client's rate limit for a request that makes `cost` upstream calls, at most max_cost.
+        
+        Raises:
+            AdmissionRejected: 429 if the client does not have `cost` tokens left
+        """
+        wait = self._take_token(client_id, cost)
+        if wait:
+            with self._slots:
+                self.rate_limited += 1
+            raise AdmissionRejected(429, math.ceil(wait), "Too many requests. Please slow down.")
+    
+    def acquire(self, client_id: str):
+        """
+        Admit a request, waiting in the queue for a free slot if necessary.
+        
+        Raises:
+            AdmissionRejected: 429 if the client is over its rate, 503 if the server is overloaded
+        """
+        self.charge(client_id)
+        self.acquire_slot()
+    
+    def acquire_slot(self, shed: bool = True):
+        """
+        Take one of the max_concurrency slots, waiting for one to free up if necessary.
+        
+        Args:
+            shed (bool): Give up once the queue is full or queue_timeout has passed; background
+                workers, already bounded by their pool size, pass False to wait as long as it takes
+        
+        Raises:
+            AdmissionRejected: 503 if the server is overloaded and shed is True
+        """
+        with self._slots:
+            if self.active < self.max_concurrency:
+                self.active += 1
+                self.admitted += 1
+                return
+            
+            if not shed:
+                while self.active >= self.max_concurrency:
+                    self._slots.wait()
+                self.active += 1
+                self.admitted += 1
+                return
+            
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise AdmissionRejected(503, math.ceil(self.queue_timeout), "Server is busy. Please try again shortly.")
+            
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        raise AdmissionRejected(503, math.ceil(self.queue_timeout), "Server is busy. Please try again shortly.")
+                    self._slots.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+            finally:
+                self.waiting -= 1
+    
+    def release(self):
+        """Free the slot held by an admitted request."""
+        with self._slots:
+            self.active -= 1
+            self._slots.notify()
+    
+    @contextmanager
+    def slot(self):
+        """Hold a slot for background work, waiting as long as it takes for one to free up."""
+        self.acquire_slot(shed=False)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def stats(self) -> dict:
+        """Get admission statistics as a dictionary."""
+        with self._slots:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "shed": self.shed
+            }
@@ -1,13 +1,37 @@
 import streamlit as st
-from chatbot import get_healthcare_response
+from config import config
+from export import FORMATS
+from logging_setup import configure_logging
+from sessions import session_store
+
+configure_logging()
+
+@st.cache_resource
+def load_chatbot():
+    """Import the chatbot and build its backend clients once per process, not on every rerun."""
+    import chatbot
+    chatbot.warm_up()
+    return chatbot
 
 st.set_page_config(page_title="Healthcare Chatbot", page_icon="🩺")
 
 st.title("Healthcare Chatbot 🤖 (OpenAI GPT-3.5)")
 
-# Store conversation history
-if "history" not in st.session_state:
-    st.session_state.history = []
+# Number of history windows shown; older turns are paged in on demand
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
+
+# The conversation lives in the shared session store; its id is kept in the URL so a
+# reload, another tab or a server restart picks the same conversation back up
+if "session_id" not in st.session_state:
+    session_id = st.experimental_get_query_params().get("session", [""])[0]
+    if not (session_id.isalnum() and len(session_id) <= 64):
+        session_id = session_store.new_session_id()
+    st.session_state.session_id = session_id
+    st.experimental_set_query_params(session=session_id)
+
+session_id = st.session_state.session_id
+total_turns = session_store.turn_count(session_id)
 
 # Sidebar for controls
 with st.sidebar:
@@ -15,55 +39,64 @@ with st.sidebar:
     
     # Clear chat button
     if st.button("🗑️ Clear Chat", help="Clear all conversation history"):
-        st.session_state.history = []
+        st.session_state.history_pages = 1
+        st.session_state.pop("export", None)
+        session_store.clear(session_id)
+        st.session_state.session_id = session_store.new_session_id()
+        st.experimental_set_query_params(session=st.session_state.session_id)
         st.success("Chat cleared successfully!")
         st.rerun()
     
-    # Show chat statistics
-    if st.session_state.history:
-        st.metric("Messages", len(st.session_state.history))
-        st.metric("User Messages", len([h for h in st.session_state.history if h.get("user")]))
-        st.metric("Bot Responses", len([h for h in st.session_state.history if h.get("bot")]))
-    
-    # Download chat history
-    if st.session_state.history:
-        chat_text = ""
-        for chat in st.session_state.history:
-            chat_text += f"User: {chat['user']}\n"
-            chat_text += f"Bot: {chat['bot']}\n"
-            chat_text += "---\n"
+    if total_turns:
+        # Show chat statistics
+        st.metric("Messages", total_turns)
         
-        st.download_button(
-            label="📥 Download Chat",
-            data=chat_text,
-            file_name="healthcare_chat_history.txt",
-            mime="text/plain"
-        )
-
-# Main chat interface
-col1, col2 = st.columns([4, 1])
+        # Download chat history
+        fmt = st.selectbox("Export format", list(FORMATS))
+        export_key = (session_id, fmt, total_turns)
+        if st.session_state.get("export", (None,))[0] != export_key:
+            if st.button("📄 Prepare Download"):
+                st.session_state.export = (export_key, "".join(session_store.export(session_id, fmt) or ()))
+        if st.session_state.get("export", (None,))[0] == export_key:
+            st.download_button(
+                label="📥 Download Chat",
+                data=st.session_state.export[1],
+                file_name=f"healthcare_chat_history.{FORMATS[fmt].extension}",
+                mime=FORMATS[fmt].mimetype
+            )
 
-with col1:
-    user_input = st.text_input("Ask me about your health:", placeholder="Type your health question here...", key="user_input")
-
-with col2:
-    send_button = st.button("Send", type="primary", use_container_width=True)
-
-# Process message
-if (send_button or user_input) and user_input.strip():
-    with st.spinner("Thinking..."):
-        reply = get_healthcare_response(user_input)
-        st.session_state.history.append({"user": user_input, "bot": reply})
-        st.rerun()
-
-# Display conversation
-if st.session_state.history:
-    st.markdown("### Conversation History")
+# Display a recent window of the conversation; only the shown turns are read and rendered
+if total_turns:
+    available = min(total_turns, config.STREAMLIT_HISTORY_MAX)
+    shown = min(available, config.STREAMLIT_HISTORY_WINDOW * st.session_state.history_pages)
+    if shown < available:
+        if st.button(f"⬆️ Show earlier messages ({available - shown} hidden)"):
+            st.session_state.history_pages += 1
+            st.rerun()
     
-    for i, chat in enumerate(st.session_state.history):
-        with st.expander(f"Message {i+1}", expanded=True):
-            st.markdown(f"**👤 You:** {chat['user']}")
-            st.markdown(f"**🤖 Bot:** {chat['bot']}")
+    for chat in session_store.history(session_id, shown):
+        # Follow-up answers after emergency guidance have no message of their own
+        if chat["user"]:
+            with st.chat_message("user"):
+                st.markdown(chat["user"])
+        with st.chat_message("assistant"):
+            st.markdown(chat["bot"])
 else:
     st.info("👋 Hello! I'm your AI healthcare assistant. I can help answer general health questions and provide health information. What would you like to know?")
     st.warning("⚠️ This is an AI assistant for general health information only. Always consult healthcare professionals for medical advice.")
+
+# Process message; chat_input returns each submission once and then clears itself
+user_input = st.chat_input("Ask me about your health...")
+if user_input and user_input.strip():
+    with st.chat_message("user"):
+        st.markdown(user_input)
+    
+    # Stream the reply into the page as it is generated
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        reply = ""
+        # The chatbot records the completed turn in the session store
+        for delta in load_chatbot().stream_healthcare_response(user_input, session_id):
+            reply += delta
+            placeholder.markdown(reply + "▌")
+        placeholder.markdown(reply)
@@ -0,0 +1,342 @@
+"""
+Async (ASGI) serving mode for Healthcare Chatbot
+This module exposes the same /chat, /health and /test contract as flask_app.py, but
+serves it from an asyncio event loop so slow upstream calls do not pin worker threads.
+It also serves the persistent WebSocket chat channel, /ws.
+
+Run with: uvicorn asgi_app:app --port 8000
+"""
+
+import asyncio
+import json
+import logging
+import time
+import metrics
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket
+from chatbot import get_healthcare_response_async, stream_healthcare_response_async, warm_up
+from config import config
+from logging_setup import configure_logging, log_payload
+from replies import ReplyRegistry
+from sessions import session_store
+
+# Configure logging
+configure_logging()
+logger = logging.getLogger(__name__)
+
+async def _get_chat_message(request: Request):
+    """
+    Validate the JSON body of a chat request.
+    
+    Returns:
+        tuple: (message, None) on success, or (None, error response) on failure
+    """
+    if request.headers.get('content-type', '').split(';')[0].strip() != 'application/json':
+        logger.error("Request is not JSON")
+        return None, JSONResponse({'error': 'Content-Type must be application/json'}, status_code=400)
+    
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    
+    if not data or not isinstance(data, dict):
+        logger.error("No JSON data provided")
+        return None, JSONResponse({'error': 'No JSON data provided'}, status_code=400)
+    
+    if 'message' not in data:
+        logger.error("No message field in request")
+        return None, JSONResponse({'error': 'No message field provided'}, status_code=400)
+    
+    user_message = data['message']
+    if not isinstance(user_message, str):
+        logger.error("Message is not a string: %s", type(user_message))
+        return None, JSONResponse({'error': 'Message must be a string'}, status_code=400)
+    
+    user_message = user_message.strip()
+    if not user_message:
+        logger.error("Empty message received")
+        return None, JSONResponse({'error': 'Empty message'}, status_code=400)
+    
+    return user_message, None
+
+async def _get_session_id(request: Request) -> str:
+    """Return the session id sent by the client, or a new one if it sent none."""
+    data = await request.json()
+    session_id = data.get('session_id')
+    if isinstance(session_id, str) and 0 < len(session_id) <= 64:
+        return session_id
+    return session_store.new_session_id()
+
+async def chat(request: Request):
+    """Handle chat messages and return AI responses."""
+    try:
+        user_message, error_response = await _get_chat_message(request)
+        if error_response:
+            return error_response
+        
+        session_id = await _get_session_id(request)
+        
+        log_payload("Processing async chat request: %s...", user_message[:100])
+        
+        ai_response = await get_healthcare_response_async(user_message, session_id)
+        
+        return JSONResponse({
+            'reply': ai_response,
+            'status': 'success',
+            'session_id': session_id
+        })
+    
+    except Exception as e:
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
+        return JSONResponse({
+            'error': 'Internal server error',
+            'status': 'error'
+        }, status_code=500)
+
+# Replies sent over /ws, kept after they finish so a reconnecting client can resume them
+reply_registry = ReplyRegistry(ttl=config.WS_RESUME_TTL)
+# Generation tasks outlive the connection that started them; hold references until they finish.
+# Their number is capped by WS_MAX_GENERATIONS in total and WS_MAX_GENERATIONS_PER_CLIENT per client
+_reply_tasks = set()
+_client_generations = {}
+_socket_count = 0
+
+metrics.registry.gauge("chatbot_websocket_connections", "Open WebSocket chat connections.", lambda: _socket_count)
+metrics.registry.gauge("chatbot_websocket_replies", "WebSocket replies being generated or kept for resuming.", lambda: len(reply_registry))
+
+def _valid_id(value) -> bool:
+    """Check a client-supplied request or session id."""
+    return isinstance(value, str) and 0 < len(value) <= 64
+
+def _client_id(websocket: WebSocket) -> str:
+    """Identify the client for the per-client generation cap."""
+    if config.TRUST_PROXY_HEADERS:
+        forwarded = websocket.headers.get('x-forwarded-for', '').split(',')[0].strip()
+        if forwarded:
+            return forwarded
+    return websocket.client.host if websocket.client else 'unknown'
+
+def _can_generate(client_id: str) -> bool:
+    """Check that neither the server nor the client already has the most replies allowed under way."""
+    return (len(_reply_tasks) < config.WS_MAX_GENERATIONS
+            and _client_generations.get(client_id, 0) < config.WS_MAX_GENERATIONS_PER_CLIENT)
+
+def _start_generation(client_id: str, key, reply, user_message: str, session_id: str):
+    """Generate a reply in the background, counting it against the client until it finishes."""
+    task = asyncio.ensure_future(_generate_reply(key, reply, user_message, session_id))
+    _reply_tasks.add(task)
+    _client_generations[client_id] = _client_generations.get(client_id, 0) + 1
+    
+    def forget(done):
+        _reply_tasks.discard(done)
+        remaining = _client_generations.pop(client_id) - 1
+        if remaining:
+            _client_generations[client_id] = remaining
+    task.add_done_callback(forget)
+
+async def _generate_reply(key, reply, user_message: str, session_id: str):
+    """Stream a reply into the registry, independently of the connection that asked for it."""
+    try:
+        async for delta in stream_healthcare_response_async(user_message, session_id):
+            reply.append(delta)
+        reply_registry.finish(key)
+    except Exception as e:
+        logger.error("Error while generating WebSocket reply: %s", e, exc_info=True)
+        reply_registry.finish(key, 'Internal server error')
+
+async def _relay_reply(send, request_id: str, reply, offset: int):
+    """Send a reply's chunks from an offset, then its outcome, over one connection."""
+    try:
+        async for seq, delta in reply.follow(offset):
+            await send({'type': 'chunk', 'id': request_id, 'seq': seq, 'delta': delta})
+        if reply.error:
+            await send({'type': 'error', 'id': request_id, 'error': reply.error})
+        else:
+            await send({'type': 'done', 'id': request_id, 'status': 'success', 'session_id': reply.session_id})
+    except Exception as e:
+        # The client went away; it can resume from the last chunk it received
+        logger.debug("Stopped relaying WebSocket reply %s: %s", request_id, e)
+
+async def _heartbeat(send):
+    """Push a status frame at a fixed interval so clients know the server is up without polling."""
+    try:
+        while True:
+            await asyncio.sleep(config.WS_HEARTBEAT_INTERVAL)
+            await send({'type': 'status', 'status': 'healthy', 'time': time.time()})
+    except Exception as e:
+        logger.debug("Stopped WebSocket heartbeat: %s", e)
+
+async def chat_socket(websocket: WebSocket):
+    """
+    Persistent chat channel carrying JSON frames.
+    
+    Client frames:
+        {"type": "chat", "id": ..., "message": ..., "session_id": ...} ask a question
+        {"type": "resume", "id": ..., "session_id": ..., "offset": n} continue a reply after reconnecting
+        {"type": "ping"}
+    
+    Server frames:
+        {"type": "ack", "id": ..., "session_id": ...} once a question is accepted
+        {"type": "chunk", "id": ..., "seq": n, "delta": ...} for each part of a reply
+        {"type": "done", ...} or {"type": "error", ...} when a reply ends
+        {"type": "status", ...} on connect and every WS_HEARTBEAT_INTERVAL seconds, and "pong"
+    """
+    global _socket_count
+    await websocket.accept()
+    _socket_count += 1
+    client_id = _client_id(websocket)
+    
+    send_lock = asyncio.Lock()
+    
+    async def send(frame: dict):
+        # Relays and the heartbeat share the socket; keep their frames whole
+        async with send_lock:
+            await websocket.send_text(json.dumps(frame))
+    
+    relays = {}
+    
+    def relay(request_id: str, reply, offset: int):
+        previous = relays.pop(request_id, None)
+        if previous:
+            previous.cancel()
+        task = relays[request_id] = asyncio.ensure_future(_relay_reply(send, request_id, reply, offset))
+        
+        def forget(done):
+            if relays.get(request_id) is done:
+                del relays[request_id]
+        task.add_done_callback(forget)
+    
+    heartbeat = asyncio.ensure_future(_heartbeat(send))
+    try:
+        await send({'type': 'status', 'status': 'healthy', 'heartbeat': config.WS_HEARTBEAT_INTERVAL})
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            try:
+                frame = json.loads(message.get('text') or '')
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                await send({'type': 'error', 'error': 'Frames must be JSON objects'})
+                continue
+            
+            kind, request_id = frame.get('type'), frame.get('id')
+            if kind == 'ping':
+                await send({'type': 'pong'})
+                continue
+            if kind not in ('chat', 'resume'):
+                await send({'type': 'error', 'id': request_id, 'error': 'Unknown frame type'})
+                continue
+            if not _valid_id(request_id):
+                await send({'type': 'error', 'error': 'Frames need an id of 1 to 64 characters'})
+                continue
+            if request_id not in relays and len(relays) >= config.WS_MAX_IN_FLIGHT:
+                await send({'type': 'error', 'id': request_id, 'error': 'Too many requests in flight'})
+                continue
+            
+            if kind == 'resume':
+                session_id, offset = frame.get('session_id'), frame.get('offset', 0)
+                reply = reply_registry.get((session_id, request_id)) if _valid_id(session_id) else None
+                if reply is None:
+                    await send({'type': 'error', 'id': request_id, 'error': 'Unknown or expired request'})
+                elif not isinstance(offset, int) or offset < 0:
+                    await send({'type': 'error', 'id': request_id, 'error': 'offset must be a non-negative integer'})
+                else:
+                    relay(request_id, reply, offset)
+                continue
+            
+            user_message = frame.get('message')
+            if not isinstance(user_message, str) or not user_message.strip():
+                await send({'type': 'error', 'id': request_id, 'error': 'Message must be a non-empty string'})
+                continue
+            session_id = frame.get('session_id')
+            if not _valid_id(session_id):
+                session_id = session_store.new_session_id()
+            
+            key = (session_id, request_id)
+            # A resent question (same id) is answered from the reply already under way
+            reply = reply_registry.get(key)
+            if reply is None:
+                if not _can_generate(client_id):
+                    await send({'type': 'error', 'id': request_id, 'error': 'Server is busy. Please try again shortly.'})
+                    continue
+                reply, _ = reply_registry.start(key, session_id)
+                _start_generation(client_id, key, reply, user_message.strip(), session_id)
+                log_payload("Processing WebSocket chat request: %s...", user_message[:100])
+            await send({'type': 'ack', 'id': request_id, 'session_id': session_id})
+            relay(request_id, reply, 0)
+    except Exception as e:
+        # Sending on a connection the client has closed ends the loop too
+        logger.debug("WebSocket connection ended: %s", e)
+    finally:
+        _socket_count -= 1
+        heartbeat.cancel()
+        # Stop relaying; the replies themselves keep generating for a client that resumes
+        for task in list(relays.values()):
+            task.cancel()
+
+async def health_check(request: Request):
+    """Health check endpoint."""
+    return JSONResponse({'status': 'healthy', 'service': 'healthcare-chatbot'})
+
+async def test_endpoint(request: Request):
+    """Test endpoint for debugging."""
+    return JSONResponse({
+        'status': 'success',
+        'message': 'Test endpoint working',
+        'config_loaded': bool(config),
+        'openai_configured': bool(config.OPENAI_API_KEY)
+    })
+
+async def metrics_endpoint(request: Request):
+    """Expose metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Count requests and record their latency."""
+    
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Label by route rather than raw path to keep label cardinality bounded
+        route_paths = {route.path for route in request.app.routes}
+        endpoint = request.url.path if request.url.path in route_paths else 'unmatched'
+        metrics.http_requests.inc(endpoint=endpoint, status=response.status_code)
+        metrics.request_latency.observe(time.perf_counter() - started, endpoint=endpoint)
+        return response
+
+app = Starlette(
+    routes=[
+        Route('/chat', chat, methods=['POST']),
+        Route('/health', health_check),
+        Route('/test', test_endpoint),
+        Route('/metrics', metrics_endpoint),
+        WebSocketRoute('/ws', chat_socket)
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(MetricsMiddleware)
+    ],
+    on_startup=[warm_up]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    # Validate configuration
+    if not config.validate_config():
+        logger.error("Configuration validation failed. Please check your .env file.")
+        exit(1)
+    
+    config.print_config()
+    
+    logger.info("Starting ASGI app on %s:%s", config.FLASK_HOST, config.ASGI_PORT)
+    uvicorn.run(app, host=config.FLASK_HOST, port=config.ASGI_PORT)
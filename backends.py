@@ -0,0 +1,401 @@
+"""
+LLM backends for Healthcare Chatbot
+This module defines the backends that can answer a chat completion request (the OpenAI
+API, any OpenAI-compatible server, and an offline canned-answer backend), a registry of
+backend types, and a router that tries the configured backends in order.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from circuit import CircuitBreaker, CircuitOpenError
+from config import config
+from hedging import Hedger
+from intents import intent_engine
+
+logger = logging.getLogger(__name__)
+
+# Sent to OpenAI-compatible servers that need no key, since the SDK requires one
+PLACEHOLDER_API_KEY = "not-needed"
+
+failovers = metrics.registry.register(metrics.Counter(
+    "chatbot_backend_failovers_total", "Backend calls that failed over to the next backend.", ("backend", "error")
+))
+
+class BackendError(Exception):
+    """Raised when a backend cannot answer a request."""
+
+class ClientNotConfiguredError(BackendError):
+    """Raised when no backend is configured, e.g. the OpenAI API key is missing."""
+
+class Backend:
+    """Base class for something that can answer chat completion requests."""
+    
+    # Whether answers from this backend may be stored in the response cache
+    cacheable = True
+    # Whether slow calls to this backend may be hedged with a second identical call
+    hedgeable = True
+    # Whether calls to this backend go through a circuit breaker
+    guarded = True
+    
+    def __init__(self, name: str, model: str, timeout: float, tier_models: Optional[Dict[str, str]] = None, **options):
+        """
+        Args:
+            name (str): Name used in logs and metrics
+            model (str): Model to request
+            timeout (float): Seconds to wait for an answer before failing over
+            tier_models (dict): Model to request instead for each routing tier that has one
+        """
+        self.name = name
+        self.model = model
+        self.timeout = timeout
+        self.tier_models = tier_models or {}
+    
+    def model_for(self, tier: Optional[str]) -> str:
+        """The model this backend answers a routing tier with."""
+        return self.tier_models.get(tier) or self.model
+    
+    @property
+    def configured(self) -> bool:
+        """Whether the backend has what it needs to serve requests."""
+        return True
+    
+    def warm_up(self):
+        """Prepare expensive resources now rather than on the first request."""
+    
+    def complete(self, messages: List[dict], **params) -> str:
+        """Answer a chat completion request."""
+        raise NotImplementedError
+    
+    async def complete_async(self, messages: List[dict], **params) -> str:
+        """Answer a chat completion request without blocking the event loop."""
+        raise NotImplementedError
+    
+    def stream(self, messages: List[dict], **params) -> Iterator[str]:
+        """Answer a chat completion request as a stream of text deltas."""
+        raise NotImplementedError
+    
+    def stream_async(self, messages: List[dict], **params) -> AsyncIterator[str]:
+        """Answer a chat completion request as a stream of text deltas without blocking the event loop."""
+        raise NotImplementedError
+
+BACKEND_TYPES: Dict[str, Callable[..., Backend]] = {}
+
+def register_backend_type(kind: str):
+    """Class decorator that makes a backend type available to build_backends."""
+    def decorator(cls):
+        BACKEND_TYPES[kind] = cls
+        return cls
+    return decorator
+
+def _record_usage(response):
+    """Count the prompt and completion tokens reported for a completion."""
+    usage = getattr(response, "usage", None)
+    if usage:
+        metrics.upstream_tokens.inc(usage.prompt_tokens, kind="prompt")
+        metrics.upstream_tokens.inc(usage.completion_tokens, kind="completion")
+
+@register_backend_type("openai")
+class OpenAIBackend(Backend):
+    """The OpenAI API, or any server exposing an OpenAI-compatible chat completions API."""
+    
+    def __init__(self, name: str, model: str, timeout: float, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, max_retries: int = 2,
+                 tier_models: Optional[Dict[str, str]] = None, **options):
+        """
+        Args:
+            api_key (str): API key; required for OpenAI itself, optional for a server at base_url
+            base_url (str): API base URL, e.g. a local inference server; defaults to OpenAI
+            max_retries (int): Retries made by the client before the router fails over
+        """
+        super().__init__(name, model, timeout, tier_models)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+    
+    @property
+    def configured(self) -> bool:
+        # OpenAI itself needs a key; a self-hosted compatible server often does not
+        return bool(self.api_key or self.base_url)
+    
+    @property
+    def _client_api_key(self) -> str:
+        """The key sent with requests; the SDK refuses to build a client without one."""
+        return self.api_key or PLACEHOLDER_API_KEY
+    
+    @property
+    def client(self):
+        """The OpenAI client, built on first use; importing the SDK is a large share of startup time."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import openai
+                    self._client = openai.OpenAI(api_key=self._client_api_key, base_url=self.base_url, max_retries=self.max_retries)
+        return self._client
+    
+    @property
+    def async_client(self):
+        """Shared async client with a pooled connection set for the ASGI serving mode, built on first use."""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    import httpx
+                    import openai
+                    self._async_client = openai.AsyncOpenAI(
+                        api_key=self._client_api_key,
+                        base_url=self.base_url,
+                        max_retries=self.max_retries,
+                        http_client=httpx.AsyncClient(
+                            limits=httpx.Limits(
+                                max_connections=config.ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=config.ASYNC_MAX_KEEPALIVE_CONNECTIONS
+                            ),
+                            timeout=self.timeout
+                        )
+                    )
+        return self._async_client
+    
+    def warm_up(self):
+        if self.configured:
+            self.client
+            self.async_client
+    
+    def _request(self, messages: List[dict], params: dict) -> dict:
+        """Build the keyword arguments for a chat completion request, resolving the routing tier to this backend's model."""
+        params = dict(params)
+        model = self.model_for(params.pop("tier", None))
+        return {"model": model, "messages": messages, "timeout": self.timeout, **params}
+    
+    def complete(self, messages: List[dict], **params) -> str:
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(**self._request(messages, params))
+        metrics.upstream_latency.observe(time.perf_counter() - started, backend=self.name, mode="sync")
+        _record_usage(response)
+        return response.choices[0].message.content.strip()
+    
+    async def complete_async(self, messages: List[dict], **params) -> str:
+        started = time.perf_counter()
+        response = await self.async_client.chat.completions.create(**self._request(messages, params))
+        metrics.upstream_latency.observe(time.perf_counter() - started, backend=self.name, mode="async")
+        _record_usage(response)
+        return response.choices[0].message.content.strip()
+    
+    def stream(self, messages: List[dict], **params) -> Iterator[str]:
+        started = time.perf_counter()
+        stream = self.client.chat.completions.create(**self._request(messages, params), stream=True)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+        metrics.upstream_latency.observe(time.perf_counter() - started, backend=self.name, mode="stream")
+    
+    async def stream_async(self, messages: List[dict], **params) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        stream = await self.async_client.chat.completions.create(**self._request(messages, params), stream=True)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+        metrics.upstream_latency.observe(time.perf_counter() - started, backend=self.name, mode="stream_async")
+
+@register_backend_type("offline")
+class OfflineBackend(Backend):
+    """Canned answers from the offline intent engine; never calls the network."""
+    
+    cacheable = False
+    hedgeable = False
+    guarded = False
+    
+    def complete(self, messages: List[dict], **params) -> str:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        answer = intent_engine.fallback_response(question)
+        if not answer:
+            raise BackendError("No offline answer for this question")
+        return answer
+    
+    async def complete_async(self, messages: List[dict], **params) -> str:
+        return self.complete(messages, **params)
+    
+    def stream(self, messages: List[dict], **params) -> Iterator[str]:
+        yield self.complete(messages, **params)
+    
+    async def stream_async(self, messages: List[dict], **params) -> AsyncIterator[str]:
+        yield self.complete(messages, **params)
+
+def build_backends(backend_configs: List[dict]) -> List[Backend]:
+    """Instantiate backends from configuration dictionaries, in order."""
+    backends = []
+    for options in backend_configs:
+        kind = options["type"]
+        if kind not in BACKEND_TYPES:
+            raise ValueError(f"Unknown backend type '{kind}' for backend '{options['name']}'")
+        backends.append(BACKEND_TYPES[kind](**{k: v for k, v in options.items() if k != "type"}))
+    return backends
+
+class BackendRouter:
+    """Try backends in order, failing over to the next on errors or timeouts."""
+    
+    def __init__(self, backends: List[Backend], hedge_options: Optional[dict] = None,
+                 breaker_options: Optional[dict] = None):
+        """
+        Args:
+            backends (list): Backends in failover order
+            hedge_options (dict): Hedger settings, plus max_workers for the thread pool
+                running hedged calls; None disables hedging
+            breaker_options (dict): CircuitBreaker settings; None disables circuit breaking
+        """
+        self.backends = backends
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.hedgers: Dict[str, Hedger] = {}
+        if hedge_options:
+            options = dict(hedge_options)
+            executor = ThreadPoolExecutor(max_workers=options.pop("max_workers"), thread_name_prefix="hedge")
+            self.hedgers = {
+                backend.name: Hedger(backend.name, executor, **options)
+                for backend in backends if backend.hedgeable
+            }
+    
+    def warm_up(self):
+        """Build every configured backend's clients before the first request arrives."""
+        for backend in self.backends:
+            if backend.configured:
+                backend.warm_up()
+    
+    def available(self) -> List[Backend]:
+        """Configured backends in failover order."""
+        backends = [backend for backend in self.backends if backend.configured]
+        if not backends:
+            raise ClientNotConfiguredError()
+        return backends
+    
+    def _failed(self, backend: Backend, exc: Exception, remaining: int):
+        """Record a failed backend call."""
+        failovers.inc(backend=backend.name, error=type(exc).__name__)
+        if remaining and not isinstance(exc, CircuitOpenError):
+            logger.warning("Backend %s failed (%s); failing over", backend.name, type(exc).__name__)
+    
+    def _guard(self, backend: Backend, params: dict):
+        """Get a context manager running a call through the backend and model's circuit breaker."""
+        if not self.breaker_options or not backend.guarded:
+            return nullcontext()
+        name = f"{backend.name}/{backend.model_for(params.get('tier'))}"
+        with self._breakers_lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = self.breakers[name] = CircuitBreaker(name, **self.breaker_options)
+        return breaker.guard()
+    
+    def _complete(self, backend: Backend, messages: List[dict], params: dict) -> str:
+        """Call a backend through its circuit breaker, hedging the call if enabled for it."""
+        hedger = self.hedgers.get(backend.name)
+        with self._guard(backend, params):
+            if hedger:
+                return hedger.call(lambda: backend.complete(messages, **params))
+            return backend.complete(messages, **params)
+    
+    async def _complete_async(self, backend: Backend, messages: List[dict], params: dict) -> str:
+        """Call a backend without blocking the event loop; see _complete."""
+        hedger = self.hedgers.get(backend.name)
+        with self._guard(backend, params):
+            if hedger:
+                return await hedger.call_async(lambda: backend.complete_async(messages, **params))
+            return await backend.complete_async(messages, **params)
+    
+    def _stream(self, backend: Backend, messages: List[dict], params: dict) -> Iterator[str]:
+        """Stream from a backend through its circuit breaker."""
+        with self._guard(backend, params):
+            yield from backend.stream(messages, **params)
+    
+    async def _stream_async(self, backend: Backend, messages: List[dict], params: dict) -> AsyncIterator[str]:
+        """Stream from a backend through its circuit breaker without blocking the event loop."""
+        with self._guard(backend, params):
+            async for delta in backend.stream_async(messages, **params):
+                yield delta
+    
+    def complete(self, messages: List[dict], **params) -> Tuple[str, Backend]:
+        """
+        Answer a chat completion request from the first backend that succeeds.
+        
+        Returns:
+            tuple: (answer text, backend that produced it)
+        """
+        backends = self.available()
+        for position, backend in enumerate(backends, 1):
+            try:
+                return self._complete(backend, messages, params), backend
+            except Exception as e:
+                self._failed(backend, e, len(backends) - position)
+                if position == len(backends):
+                    raise
+    
+    async def complete_async(self, messages: List[dict], **params) -> Tuple[str, Backend]:
+        """Answer a chat completion request without blocking the event loop; see complete."""
+        backends = self.available()
+        for position, backend in enumerate(backends, 1):
+            try:
+                return await self._complete_async(backend, messages, params), backend
+            except Exception as e:
+                self._failed(backend, e, len(backends) - position)
+                if position == len(backends):
+                    raise
+    
+    def stream(self, messages: List[dict], **params) -> Iterator[Tuple[Backend, str]]:
+        """
+        Stream an answer from the first backend that starts producing one.
+        
+        Failover only happens before the first delta has been yielded.
+        
+        Yields:
+            tuple: (backend, text delta)
+        """
+        backends = self.available()
+        for position, backend in enumerate(backends, 1):
+            deltas = self._stream(backend, messages, params)
+            try:
+                first = next(deltas, None)
+            except Exception as e:
+                self._failed(backend, e, len(backends) - position)
+                if position == len(backends):
+                    raise
+                continue
+            
+            if first is not None:
+                yield backend, first
+                for delta in deltas:
+                    yield backend, delta
+            return
+    
+    async def stream_async(self, messages: List[dict], **params) -> AsyncIterator[Tuple[Backend, str]]:
+        """Stream an answer without blocking the event loop; see stream."""
+        backends = self.available()
+        for position, backend in enumerate(backends, 1):
+            deltas = self._stream_async(backend, messages, params)
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                self._failed(backend, e, len(backends) - position)
+                if position == len(backends):
+                    raise
+                continue
+            
+            if first is not None:
+                yield backend, first
+                async for delta in deltas:
+                    yield backend, delta
+            return
@@ -0,0 +1,4 @@
+"""
+Offline benchmark suite for Healthcare Chatbot
+Run from the repository root, e.g. python -m benchmarks.run_benchmark --help
+"""
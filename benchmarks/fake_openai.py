@@ -0,0 +1,221 @@
+"""
+Local OpenAI stand-in for Healthcare Chatbot benchmarks
+This module serves an OpenAI-compatible /v1/chat/completions endpoint on localhost with a
+configurable latency distribution, streaming, error injection and 429 responses.
+
+Run standalone with: python -m benchmarks.fake_openai --port 8900 --latency lognormal:0.5,0.4
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+DEFAULT_REPLY = (
+    "Rest, stay hydrated and monitor your symptoms. If they persist or get worse, "
+    "please consult a healthcare professional."
+)
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Build a latency sampler from a spec string.
+    
+    Args:
+        spec (str): "fixed:S", "uniform:MIN,MAX" or "lognormal:MEDIAN,SIGMA" (seconds)
+        
+    Returns:
+        callable: Returns one latency sample in seconds per call
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class _HTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog large enough for load tests."""
+    
+    daemon_threads = True
+    request_queue_size = 1024
+    
+    def handle_error(self, request, client_address):
+        # Clients that time out or cancel a hedged call hang up mid-response
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+class FakeOpenAIServer:
+    """A threaded HTTP server imitating the OpenAI chat completions API."""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0.2",
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 stream_chunks: int = 20, reply: str = DEFAULT_REPLY):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port
+            latency (str): Latency distribution spec, see parse_latency
+            error_rate (float): Fraction of requests answered with HTTP 500
+            rate_limit_rate (float): Fraction of requests answered with HTTP 429
+            stream_chunks (int): Number of chunks a streamed reply is split into
+            reply (str): Text of every completion
+        """
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunks = stream_chunks
+        self.reply = reply
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), self._make_handler())
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        """The base URL to configure an OpenAI client with."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+    
+    def _make_handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, {"requests": server.requests})
+                else:
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                    return
+                
+                with server._lock:
+                    server.requests += 1
+                
+                roll = random.random()
+                if roll < server.rate_limit_rate:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                    {"Retry-After": "1"})
+                    return
+                if roll < server.rate_limit_rate + server.error_rate:
+                    self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+                
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                model = request.get("model", "gpt-3.5-turbo")
+                latency = server.sample_latency()
+                
+                if request.get("stream"):
+                    self._stream(completion_id, model, latency)
+                    return
+                
+                time.sleep(latency)
+                completion_tokens = len(server.reply) // 4 + 1
+                prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4 + 1
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.reply},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                })
+            
+            def _stream(self, completion_id: str, model: str, latency: float):
+                # Spend a third of the latency before the first token, the rest between chunks
+                words = server.reply.split(" ")
+                size = max(1, math.ceil(len(words) / server.stream_chunks))
+                pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+                
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                
+                time.sleep(latency / 3)
+                for piece in pieces:
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(latency * 2 / 3 / len(pieces))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+        
+        return Handler
+
+def main():
+    """Run the fake server from the command line."""
+    parser = argparse.ArgumentParser(description="Local OpenAI stand-in for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.error_rate, args.rate_limit_rate)
+    print(f"🧪 Fake OpenAI server listening on {server.base_url}", flush=True)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
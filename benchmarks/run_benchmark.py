@@ -0,0 +1,307 @@
+"""
+Load-test runner for Healthcare Chatbot
+This module starts a local OpenAI stand-in and the Flask or ASGI app in separate processes, drives
+it at a fixed concurrency (closed loop) or a fixed arrival rate (open loop), and reports
+throughput, latency percentiles and error rates. No network access is needed.
+
+Examples:
+    python -m benchmarks.run_benchmark --target flask --concurrency 32 --requests 500
+    python -m benchmarks.run_benchmark --target asgi --mode open --rate 100 --duration 30
+    python -m benchmarks.run_benchmark --endpoint /chat/stream --output results.json --baseline old.json
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import requests
+
+def _free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(url: str, process: subprocess.Popen):
+    """Poll url until it answers, failing if the process exits first."""
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process serving {url} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+def start_fake_upstream(args) -> Tuple[subprocess.Popen, str]:
+    """
+    Start the OpenAI stand-in in its own process.
+    
+    Returns:
+        tuple: (process, base URL of the fake API)
+    """
+    port = _free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai",
+        "--port", str(port),
+        "--latency", args.latency,
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate)
+    ], stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    _wait_until_up(f"http://127.0.0.1:{port}/stats", process)
+    return process, base_url
+
+def _target_environment(upstream_url: str, args) -> dict:
+    """Point the app at the fake upstream and relax limits that would skew the measurement."""
+    env = dict(os.environ)
+    env["OPENAI_API_KEY"] = "benchmark-key"
+    env["OPENAI_BASE_URL"] = upstream_url
+    env.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    env.setdefault("MAX_CONCURRENT_CHATS", str(max(args.concurrency, 1000)))
+    env.setdefault("ADMISSION_QUEUE_SIZE", "10000")
+    env.setdefault("LOG_PAYLOADS", "False")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["FLASK_DEBUG"] = "False"
+    # Benchmark conversations go to a throwaway database, never the repository or a real one
+    env["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="chatbot-benchmark-"), "conversations.db")
+    if args.no_cache:
+        env["CACHE_ENABLED"] = "False"
+        env["FAQ_ENABLED"] = "False"
+    return env
+
+def target_command(target: str, port: int) -> List[str]:
+    """Build the command that serves the app under test on a local port."""
+    if target == "flask":
+        return [sys.executable, "-m", "flask", "--app", "flask_app", "run",
+                "--port", str(port), "--with-threads", "--no-reload", "--no-debugger"]
+    if target == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "flask_app:app",
+                "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    if target == "asgi":
+        return [sys.executable, "-m", "uvicorn", "asgi_app:app",
+                "--port", str(port), "--log-level", "warning"]
+    raise ValueError(f"Unknown target: {target}")
+
+def start_target(upstream_url: str, args) -> Tuple[subprocess.Popen, str]:
+    """
+    Serve the app under test in its own process.
+    
+    Returns:
+        tuple: (process, base URL of the running app)
+    """
+    port = _free_port()
+    process = subprocess.Popen(target_command(args.target, port), env=_target_environment(upstream_url, args),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_until_up(f"{base_url}/health", process)
+    return process, base_url
+
+def _question(index: int, unique_questions: int) -> str:
+    """Build the question for a request; avoids keywords answered locally by the intent engine."""
+    if unique_questions:
+        index = random.randrange(unique_questions)
+    return f"Benchmark question {index}: what should I know about my knee?"
+
+def _send(session: requests.Session, url: str, question: str, stream: bool, scheduled: float) -> dict:
+    """Send one chat request and time it from its scheduled start."""
+    try:
+        response = session.post(url, json={"message": question}, stream=stream, timeout=120)
+        first_byte = None
+        body = b""
+        for chunk in response.iter_content(chunk_size=None):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            body += chunk
+        finished = time.perf_counter()
+        
+        text = body.decode("utf-8", errors="replace")
+        error = response.status_code != 200 or '"Error: ' in text or '"error"' in text
+        return {
+            "status": response.status_code,
+            "error": error,
+            "latency": finished - scheduled,
+            "ttfb": (first_byte or finished) - scheduled
+        }
+    except requests.RequestException as e:
+        return {"status": 0, "error": True, "latency": time.perf_counter() - scheduled, "ttfb": None, "exception": type(e).__name__}
+
+def run_closed_loop(url: str, args) -> List[dict]:
+    """Keep a fixed number of requests in flight until the request budget is used."""
+    results = []
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+    
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            result = _send(session, url, _question(index, args.unique_questions), args.stream, time.perf_counter())
+            with lock:
+                results.append(result)
+    
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def run_open_loop(url: str, args) -> List[dict]:
+    """Issue requests with Poisson arrivals at a fixed rate, independent of response times."""
+    local = threading.local()
+    
+    def send(index: int, scheduled: float) -> dict:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return _send(local.session, url, _question(index, args.unique_questions), args.stream, scheduled)
+    
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+        start = time.perf_counter()
+        scheduled = start
+        index = 0
+        while scheduled - start < args.duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Latency is measured from the scheduled arrival to avoid coordinated omission
+            futures.append(pool.submit(send, index, scheduled))
+            index += 1
+            scheduled += random.expovariate(args.rate)
+    return [future.result() for future in futures]
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(percentile / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def _distribution_ms(values: List[float]) -> dict:
+    """Summarize a list of durations in milliseconds."""
+    if not values:
+        return {}
+    return {
+        "p50": round(_percentile(values, 50) * 1000, 2),
+        "p95": round(_percentile(values, 95) * 1000, 2),
+        "p99": round(_percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2)
+    }
+
+def summarize(results: List[dict], elapsed: float) -> dict:
+    """Aggregate per-request results into a report."""
+    errors = sum(1 for r in results if r["error"])
+    by_status = {}
+    for r in results:
+        by_status[str(r["status"])] = by_status.get(str(r["status"]), 0) + 1
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "status_codes": by_status,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _distribution_ms([r["latency"] for r in results]),
+        "ttfb_ms": _distribution_ms([r["ttfb"] for r in results if r["ttfb"] is not None])
+    }
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    """Print a report, with the change against a baseline report if given."""
+    results = report["results"]
+    old = baseline["results"] if baseline else {}
+    
+    def line(label, value, old_value):
+        change = ""
+        if old_value:
+            change = f"  ({(value - old_value) / old_value * 100:+.1f}%)"
+        print(f"  {label:<16}{value}{change}")
+    
+    print("=" * 60)
+    print(f"📊 {report['config']['target']} {report['config']['endpoint']} ({report['config']['mode']} loop)")
+    print("=" * 60)
+    line("Requests", results["requests"], old.get("requests"))
+    line("Throughput rps", results["throughput_rps"], old.get("throughput_rps"))
+    line("Error rate", results["error_rate"], old.get("error_rate"))
+    for name in ("p50", "p95", "p99"):
+        line(f"Latency {name} ms", results["latency_ms"].get(name), old.get("latency_ms", {}).get(name))
+    for name in ("p50", "p99"):
+        line(f"TTFB {name} ms", results["ttfb_ms"].get(name), old.get("ttfb_ms", {}).get(name))
+    print(f"  {'Status codes':<16}{results['status_codes']}")
+
+def main():
+    """Run a benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Offline load test for Healthcare Chatbot")
+    parser.add_argument("--target", choices=["flask", "gunicorn", "asgi"], default="flask")
+    parser.add_argument("--endpoint", default="/chat", help="/chat or /chat/stream")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight (closed loop)")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests (closed loop)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Arrivals per second (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of arrivals (open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Client threads (open loop)")
+    parser.add_argument("--unique-questions", type=int, default=0, help="Draw from N distinct questions; 0 makes every question unique")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache and FAQ answers")
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="Fake upstream latency: fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of upstream calls failing with 429")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+    args.stream = args.endpoint.endswith("/stream")
+    
+    upstream, upstream_url = start_fake_upstream(args)
+    target, base_url = None, None
+    try:
+        target, base_url = start_target(upstream_url, args)
+        url = f"{base_url}{args.endpoint}"
+        
+        started = time.perf_counter()
+        results = run_closed_loop(url, args) if args.mode == "closed" else run_open_loop(url, args)
+        elapsed = time.perf_counter() - started
+        
+        upstream_stats = requests.get(upstream_url.replace("/v1", "/stats"), timeout=5).json()
+    finally:
+        for process in (target, upstream):
+            if process is not None:
+                process.terminate()
+                process.wait()
+    
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "upstream_requests": upstream_stats["requests"],
+        "results": summarize(results, elapsed)
+    }
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+    
+    return 1 if report["results"]["requests"] == 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
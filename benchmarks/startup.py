@@ -0,0 +1,123 @@
+"""
+Startup benchmark for Healthcare Chatbot
+This module measures cold-start cost: how long importing the app modules takes in a fresh
+interpreter, and how long each server takes from launch until /health first answers.
+
+Examples:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --targets flask,asgi --output startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import requests
+
+from benchmarks.run_benchmark import _free_port, target_command
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+def _environment() -> dict:
+    """Configure the app as in production, pointed at an upstream that is never called."""
+    env = dict(os.environ)
+    env["OPENAI_API_KEY"] = "benchmark-key"
+    env["OPENAI_BASE_URL"] = "http://127.0.0.1:9/v1"
+    env["FLASK_DEBUG"] = "False"
+    env["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="chatbot-benchmark-"), "conversations.db")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("LOG_PAYLOADS", "False")
+    return env
+
+def measure_import(module: str) -> float:
+    """Seconds a fresh interpreter spends importing a module."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        env=_environment(), capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_first_health(target: str, timeout: float = 30.0) -> float:
+    """Seconds from launching a server until its /health endpoint first answers."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(target_command(target, port), env=_environment(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{target} exited with code {process.returncode}")
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.ConnectionError:
+                time.sleep(0.005)
+        raise RuntimeError(f"{target} did not answer /health within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+def _summary_ms(values: List[float]) -> dict:
+    """Summarize a list of durations in milliseconds."""
+    return {
+        "min": round(min(values) * 1000, 1),
+        "median": round(statistics.median(values) * 1000, 1),
+        "max": round(max(values) * 1000, 1)
+    }
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    """Print a report, with the change in medians against a baseline report if given."""
+    def section(title, key):
+        print(f"\n{title}")
+        for name, summary in report[key].items():
+            old = (baseline or {}).get(key, {}).get(name, {}).get("median")
+            change = f"  ({(summary['median'] - old) / old * 100:+.1f}%)" if old else ""
+            print(f"  {name:<16}median {summary['median']} ms (min {summary['min']}, max {summary['max']}){change}")
+    
+    print("=" * 60)
+    print(f"🚀 Startup benchmark ({report['config']['runs']} runs each)")
+    print("=" * 60)
+    section("Import time", "import_ms")
+    section("Time to first /health", "first_health_ms")
+
+def main():
+    """Run the startup benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for Healthcare Chatbot")
+    parser.add_argument("--runs", type=int, default=5, help="Measurements per module and server")
+    parser.add_argument("--modules", default="chatbot,flask_app,asgi_app", help="Comma-separated modules to import")
+    parser.add_argument("--targets", default="flask,gunicorn,asgi", help="Comma-separated servers to launch")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+    
+    modules = [name for name in args.modules.split(",") if name]
+    targets = [name for name in args.targets.split(",") if name]
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"runs": args.runs, "modules": modules, "targets": targets},
+        "import_ms": {name: _summary_ms([measure_import(name) for _ in range(args.runs)]) for name in modules},
+        "first_health_ms": {name: _summary_ms([measure_first_health(name) for _ in range(args.runs)]) for name in targets}
+    }
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
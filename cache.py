@@ -0,0 +1,144 @@
+"""
+Response cache for Healthcare Chatbot
+This module provides a bounded LRU cache with per-entry TTL and optional disk persistence
+for answers returned by the OpenAI model.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+def normalize_query(text: str) -> str:
+    """Normalize a user question so trivially different phrasings share a cache key."""
+    text = _PUNCTUATION_RE.sub(" ", text.lower())
+    return " ".join(text.split())
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL and optional JSON persistence."""
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, path: Optional[str] = None):
+        """
+        Args:
+            max_size (int): Maximum number of entries kept before evicting the least recently used
+            ttl (float): Seconds an entry stays valid after it is stored
+            path (str): Optional file used to persist entries across restarts
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        if self.path:
+            self.load()
+    
+    @staticmethod
+    def make_key(user_input: str, model: str, temperature: float, max_tokens: int) -> str:
+        """Build a cache key from the normalized question and the model settings."""
+        return json.dumps([normalize_query(user_input), model, temperature, max_tokens])
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: str, value: str):
+        """Store value under key, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> dict:
+        """Get cache statistics as a dictionary."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+    
+    def load(self):
+        """Load unexpired entries from the persistence file, if it exists."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load response cache from %s: %s", self.path, e)
+            return
+        
+        now = time.time()
+        with self._lock:
+            for key, value, expires_at in stored:
+                if expires_at > now:
+                    self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        logger.info("Loaded %d cached responses from %s", len(self._entries), self.path)
+    
+    def save(self):
+        """Write unexpired entries to the persistence file atomically."""
+        if not self.path:
+            return
+        
+        now = time.time()
+        with self._lock:
+            stored = [
+                [key, value, expires_at]
+                for key, (value, expires_at) in self._entries.items()
+                if expires_at > now
+            ]
+        
+        # Each process writes its own temporary file, so workers saving at once never share one
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(self.path)),
+                prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = f.name
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save response cache to %s: %s", self.path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
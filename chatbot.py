@@ -1,83 +1,495 @@
-import openai
+import asyncio
+import atexit
 import logging
-from typing import Optional
+import metrics
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
+from backends import BackendError, BackendRouter, ClientNotConfiguredError, build_backends
+from cache import ResponseCache
+from circuit import CircuitOpenError
 from config import config
+from faq import FaqIndex
+from intents import intent_engine
+from logging_setup import log_payload
+from routing import QueryRouter, Route
+from sessions import session_store
+from singleflight import SingleFlight
+from triage import triage_engine
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-if not config.OPENAI_API_KEY:
-    logger.warning("OpenAI API key not found in environment variables")
-    client = None
+SYSTEM_PROMPT = "You are a helpful healthcare assistant. Provide accurate, helpful medical information while always reminding users to consult healthcare professionals for serious concerns. Keep responses concise and informative. Always include a disclaimer about consulting healthcare professionals for serious medical issues."
+
+# LLM backends, tried in order until one answers; their clients are built on first use
+backend_router = BackendRouter(
+    build_backends(config.get_backend_configs()),
+    hedge_options=config.get_hedge_config(),
+    breaker_options=config.get_breaker_config()
+)
+
+# Bounds the number of upstream calls in flight from the async serving mode
+async_limiter = asyncio.Semaphore(config.ASYNC_MAX_CONCURRENCY)
+
+# Model answers fetched in the background after emergency guidance was sent
+follow_up_executor = ThreadPoolExecutor(max_workers=config.TRIAGE_FOLLOW_UP_WORKERS, thread_name_prefix="triage-follow-up")
+_follow_up_tasks = set()
+
+# Initialize response cache
+if config.CACHE_ENABLED:
+    response_cache = ResponseCache(
+        max_size=config.CACHE_MAX_SIZE,
+        ttl=config.CACHE_TTL,
+        path=config.CACHE_PATH
+    )
+    if config.CACHE_PATH:
+        atexit.register(response_cache.save)
+else:
+    response_cache = None
+
+# Picks the model tier and output token cap for each question
+query_router = QueryRouter(
+    config.get_route_tiers(),
+    config.OPENAI_MAX_TOKENS,
+    simple_max_words=config.ROUTE_SIMPLE_MAX_WORDS,
+    complex_min_words=config.ROUTE_COMPLEX_MIN_WORDS
+)
+
+# Vetted answers to common questions, matched by similarity; the index is loaded on first use
+if config.FAQ_ENABLED:
+    _app_dir = os.path.dirname(os.path.abspath(__file__))
+    faq_index = FaqIndex(
+        os.path.join(_app_dir, config.FAQ_PATH),
+        os.path.join(_app_dir, config.FAQ_INDEX_DIR),
+        threshold=config.FAQ_THRESHOLD,
+        margin=config.FAQ_MIN_MARGIN
+    )
 else:
-    client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
+    faq_index = None
+
+# Coalesces concurrent identical questions into one upstream call
+upstream_flight = SingleFlight()
+
+# Answers served without calling the model, by source
+local_answers = metrics.registry.register(metrics.Counter(
+    "chatbot_local_answers_total", "Answers served without calling OpenAI, by source.", ("source",)
+))
+if response_cache:
+    metrics.registry.gauge("chatbot_cache_hits", "Response cache hits.", lambda: response_cache.hits)
+    metrics.registry.gauge("chatbot_cache_misses", "Response cache misses.", lambda: response_cache.misses)
+    metrics.registry.gauge("chatbot_cache_hit_ratio", "Response cache hit ratio.", lambda: response_cache.stats()["hit_rate"])
+    metrics.registry.gauge("chatbot_cache_entries", "Entries in the response cache.", lambda: response_cache.stats()["size"])
+metrics.registry.gauge("chatbot_coalesced_requests", "Requests that shared another request's upstream call.", lambda: upstream_flight.coalesced)
+
+def _validate_input(user_input) -> Optional[str]:
+    """Return an error message for invalid input, or None if it is usable."""
+    if not user_input or not isinstance(user_input, str):
+        return "Please enter a valid healthcare question."
+    if not user_input.strip():
+        return "Please enter a valid healthcare question."
+    # Check if input is too long
+    if len(user_input.strip()) > config.MAX_MESSAGE_LENGTH:
+        return f"Your message is too long. Please keep it under {config.MAX_MESSAGE_LENGTH} characters."
+    return None
+
+def warm_up():
+    """Build the backend clients and load the FAQ index ahead of the first request, e.g. before forking workers."""
+    if not config.OPENAI_API_KEY:
+        logger.warning("OpenAI API key not found in environment variables")
+    backend_router.warm_up()
+    if faq_index:
+        faq_index.warm_up()
+
+def _build_messages(user_input: str, context: Optional[list] = None) -> list:
+    """Build the chat completion message list for a user question and its conversation context."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(context or []),
+        {"role": "user", "content": user_input}
+    ]
+
+def _request_key(user_input: str) -> str:
+    """Build the key identifying a question under the model settings it is routed to."""
+    route = query_router.route(user_input)
+    return ResponseCache.make_key(
+        user_input,
+        f"{config.OPENAI_MODEL}/{route.tier}",
+        config.OPENAI_TEMPERATURE,
+        route.max_tokens
+    )
+
+def _route(user_input: str) -> Route:
+    """Choose the model tier for a question that needs the model, and log the decision."""
+    route = query_router.route(user_input)
+    logger.info(
+        "Routed query to %s tier (max_tokens=%d; words=%d, symptom_terms=%d, questions=%d)",
+        route.tier, route.max_tokens,
+        route.features.words, route.features.symptom_terms, route.features.questions
+    )
+    return route
+
+def _error_message(exc: Exception) -> str:
+    """Map an exception raised by the LLM backends to a user-facing message."""
+    metrics.upstream_errors.inc(error=type(exc).__name__)
+    if isinstance(exc, ClientNotConfiguredError):
+        logger.error("OpenAI client not initialized - API key missing")
+        return "Error: API key not configured. Please check your environment setup."
+    if isinstance(exc, CircuitOpenError):
+        logger.warning("Failing fast: %s", exc)
+        return "Error: Our AI service is temporarily unavailable. Please try again in a moment."
+    if isinstance(exc, BackendError):
+        logger.error("No backend could answer: %s", exc)
+        return "Error: Unable to process your request. Please try again later."
+    # Imported here so that importing this module does not load the SDK
+    import openai
+    if isinstance(exc, openai.AuthenticationError):
+        logger.error("OpenAI authentication failed")
+        return "Error: Invalid API key. Please check your OpenAI API key configuration."
+    if isinstance(exc, openai.RateLimitError):
+        logger.error("OpenAI rate limit exceeded")
+        return "Error: Rate limit exceeded. Please try again in a moment."
+    if isinstance(exc, openai.APITimeoutError):
+        logger.error("OpenAI API timeout")
+        return "Error: Request timed out. Please try again."
+    if isinstance(exc, openai.APIError):
+        logger.error("OpenAI API error: %s", exc)
+        return "Error: Unable to process your request. Please try again later."
+    logger.error("Unexpected error: %s", exc)
+    return "Error: An unexpected error occurred. Please try again."
+
+def is_error_reply(reply: str) -> bool:
+    """Check whether a reply is an error message returned in place of an answer (see _error_message)."""
+    return reply.startswith("Error: ")
+
+def _degraded_response(user_input: str, exc: Exception) -> str:
+    """Answer from the offline intent engine when the model fails, else return the error message."""
+    error_message = _error_message(exc)
+    fallback = intent_engine.fallback_response(user_input)
+    if fallback:
+        log_payload("Serving offline fallback for healthcare query: %s...", user_input[:100])
+        local_answers.inc(source="fallback")
+        return fallback
+    return error_message
 
-def get_healthcare_response(user_input: str) -> str:
+def _local_response(user_input: str, context: Optional[list] = None) -> Optional[str]:
+    """Answer a validated question without calling the model, if possible."""
+    # Answer greetings, thanks and capability questions locally
+    smalltalk = intent_engine.smalltalk_response(user_input)
+    if smalltalk:
+        local_answers.inc(source="smalltalk")
+        return smalltalk
+    
+    # Answer common questions with a vetted answer; follow-ups depend on their context
+    if faq_index and not context:
+        match = faq_index.search(user_input)
+        if match is not None:
+            log_payload("FAQ answer %s (similarity %.2f) for healthcare query: %s...", match.id, match.score, user_input[:100])
+            local_answers.inc(source="faq")
+            return match.answer
+    
+    # Serve repeated questions from the cache; follow-ups depend on their context
+    if response_cache and not context:
+        cached = response_cache.get(_request_key(user_input))
+        if cached is not None:
+            log_payload("Cache hit for healthcare query: %s...", user_input[:100])
+            local_answers.inc(source="cache")
+            return cached
+    
+    return None
+
+def _triage_response(user_input: str) -> Optional[str]:
+    """Return emergency guidance if the message mentions red-flag symptoms."""
+    if not config.TRIAGE_ENABLED:
+        return None
+    match = triage_engine.match(user_input)
+    if match is None:
+        return None
+    logger.warning("Emergency triage matched red flag: %s", match.name)
+    local_answers.inc(source="triage")
+    return match.response
+
+def _follow_up(user_input: str, session_id: str, context: list):
     """
-    Get healthcare response from OpenAI GPT model.
+    Add the model's answer to a triaged message to the session as a further, answer-only turn.
+    
+    Args:
+        context (list): The session context from before the emergency guidance was recorded
+    """
+    try:
+        response_text = _complete(user_input, context)
+    except Exception as e:
+        logger.warning("Follow-up answer after emergency triage failed: %s", _error_message(e))
+        return
+    # The user's message is already recorded with the emergency guidance
+    _record_turn(session_id, "", response_text)
+
+async def _follow_up_async(user_input: str, session_id: str, context: list):
+    """Add the model's answer to a triaged message to the session without blocking the event loop."""
+    try:
+        response_text = await _complete_async(user_input, context)
+    except Exception as e:
+        logger.warning("Follow-up answer after emergency triage failed: %s", _error_message(e))
+        return
+    _record_turn(session_id, "", response_text)
+
+def _remember(user_input: str, response_text: str, context: Optional[list] = None):
+    """Store a model answer so repeated questions can be served locally."""
+    if response_cache and response_text and not context:
+        response_cache.set(_request_key(user_input), response_text)
+
+def _completion_params(route: Route) -> dict:
+    """Build the routing tier and sampling parameters for a chat completion request; each backend maps the tier to its own model."""
+    return {
+        "tier": route.tier,
+        "temperature": config.OPENAI_TEMPERATURE,
+        "max_tokens": route.max_tokens
+    }
+
+def _complete(user_input: str, context: Optional[list] = None) -> str:
+    """Ask the model for an answer to a validated question."""
+    # Log the request
+    log_payload("Processing healthcare query: %s...", user_input[:100])
+    
+    route = _route(user_input)
+    started = time.perf_counter()
+    response_text, backend = backend_router.complete(_build_messages(user_input, context), **_completion_params(route))
+    metrics.route_latency.observe(time.perf_counter() - started, tier=route.tier)
+    
+    log_payload("Generated response from %s: %s...", backend.name, response_text[:100])
+    if backend.cacheable:
+        _remember(user_input, response_text, context)
+    return response_text
+
+async def _complete_async(user_input: str, context: Optional[list] = None) -> str:
+    """Ask the model for an answer to a validated question without blocking the event loop."""
+    log_payload("Processing async healthcare query: %s...", user_input[:100])
+    
+    route = _route(user_input)
+    started = time.perf_counter()
+    async with async_limiter:
+        response_text, backend = await backend_router.complete_async(
+            _build_messages(user_input, context), **_completion_params(route)
+        )
+    metrics.route_latency.observe(time.perf_counter() - started, tier=route.tier)
+    
+    log_payload("Generated response from %s: %s...", backend.name, response_text[:100])
+    if backend.cacheable:
+        _remember(user_input, response_text, context)
+    return response_text
+
+def _session_context(session_id: Optional[str]) -> list:
+    """Get the earlier conversation context for a session, if any."""
+    return session_store.context(session_id) if session_id else []
+
+def _record_turn(session_id: Optional[str], user_input: str, response_text: str):
+    """Add a completed turn to the session history."""
+    if session_id and response_text:
+        session_store.append(session_id, user_input, response_text)
+
+def get_healthcare_response(user_input: str, session_id: Optional[str] = None) -> str:
+    """
+    Get healthcare response from the configured LLM backends.
     
     Args:
         user_input (str): User's healthcare question or message
+        session_id (str): Optional conversation id whose earlier turns are sent as context
         
     Returns:
         str: AI response or error message
     """
     try:
         # Input validation
-        if not user_input or not isinstance(user_input, str):
-            return "Please enter a valid healthcare question."
-            
+        error = _validate_input(user_input)
+        if error:
+            return error
         user_input = user_input.strip()
-        if not user_input:
-            return "Please enter a valid healthcare question."
-            
-        # Check if input is too long
-        if len(user_input) > config.MAX_MESSAGE_LENGTH:
-            return f"Your message is too long. Please keep it under {config.MAX_MESSAGE_LENGTH} characters."
-            
-        # Check if client is initialized
-        if not client:
-            logger.error("OpenAI client not initialized - API key missing")
-            return "Error: API key not configured. Please check your environment setup."
-        
-        # Log the request
-        logger.info(f"Processing healthcare query: {user_input[:100]}...")
-        
-        response = client.chat.completions.create(
-            model=config.OPENAI_MODEL,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a helpful healthcare assistant. Provide accurate, helpful medical information while always reminding users to consult healthcare professionals for serious concerns. Keep responses concise and informative. Always include a disclaimer about consulting healthcare professionals for serious medical issues."
-                },
-                {"role": "user", "content": user_input}
-            ],
-            temperature=config.OPENAI_TEMPERATURE,
-            max_tokens=config.OPENAI_MAX_TOKENS,
-            timeout=config.OPENAI_TIMEOUT
-        )
         
-        response_text = response.choices[0].message.content.strip()
-        logger.info(f"Generated response: {response_text[:100]}...")
+        # Emergencies are answered at once; the model's answer can follow in the session history
+        urgent = _triage_response(user_input)
+        if urgent:
+            follow_up = config.TRIAGE_FOLLOW_UP and session_id
+            # Taken before the guidance is recorded, so the model sees the question once and not its own notice
+            context = _session_context(session_id) if follow_up else None
+            _record_turn(session_id, user_input, urgent)
+            if follow_up:
+                follow_up_executor.submit(_follow_up, user_input, session_id, context)
+            return urgent
+        
+        context = _session_context(session_id)
+        response_text = _local_response(user_input, context)
+        if response_text is None:
+            if context:
+                response_text = _complete(user_input, context)
+            else:
+                # Identical questions already in flight share one upstream call
+                response_text = upstream_flight.do(_request_key(user_input), lambda: _complete(user_input))
+        
+        _record_turn(session_id, user_input, response_text)
         return response_text
         
-    except openai.AuthenticationError:
-        logger.error("OpenAI authentication failed")
-        return "Error: Invalid API key. Please check your OpenAI API key configuration."
-    except openai.RateLimitError:
-        logger.error("OpenAI rate limit exceeded")
-        return "Error: Rate limit exceeded. Please try again in a moment."
-    except openai.APITimeoutError:
-        logger.error("OpenAI API timeout")
-        return "Error: Request timed out. Please try again."
-    except openai.APIError as e:
-        logger.error(f"OpenAI API error: {e}")
-        return "Error: Unable to process your request. Please try again later."
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return "Error: An unexpected error occurred. Please try again."
+        return _degraded_response(user_input, e)
+
+async def get_healthcare_response_async(user_input: str, session_id: Optional[str] = None) -> str:
+    """
+    Get healthcare response from the configured LLM backends without blocking the event loop.
+    
+    Args:
+        user_input (str): User's healthcare question or message
+        session_id (str): Optional conversation id whose earlier turns are sent as context
+        
+    Returns:
+        str: AI response or error message
+    """
+    try:
+        error = _validate_input(user_input)
+        if error:
+            return error
+        user_input = user_input.strip()
+        
+        urgent = _triage_response(user_input)
+        if urgent:
+            follow_up = config.TRIAGE_FOLLOW_UP and session_id
+            context = _session_context(session_id) if follow_up else None
+            _record_turn(session_id, user_input, urgent)
+            if follow_up:
+                task = asyncio.ensure_future(_follow_up_async(user_input, session_id, context))
+                _follow_up_tasks.add(task)
+                task.add_done_callback(_follow_up_tasks.discard)
+            return urgent
+        
+        context = _session_context(session_id)
+        response_text = _local_response(user_input, context)
+        if response_text is None:
+            if context:
+                response_text = await _complete_async(user_input, context)
+            else:
+                response_text = await upstream_flight.do_async(_request_key(user_input), lambda: _complete_async(user_input))
+        
+        _record_turn(session_id, user_input, response_text)
+        return response_text
+        
+    except Exception as e:
+        return _degraded_response(user_input, e)
+
+def stream_healthcare_response(user_input: str, session_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Stream a healthcare response from the configured LLM backends as it is generated.
+    
+    Args:
+        user_input (str): User's healthcare question or message
+        session_id (str): Optional conversation id whose earlier turns are sent as context
+        
+    Yields:
+        str: Successive text deltas of the AI response, or a single error message
+    """
+    parts = []
+    try:
+        error = _validate_input(user_input)
+        if error:
+            yield error
+            return
+        user_input = user_input.strip()
+        
+        # Emergency guidance goes out first; the model's answer may be streamed after it
+        urgent = _triage_response(user_input)
+        if urgent:
+            parts.append(urgent)
+            yield urgent
+            if config.TRIAGE_FOLLOW_UP:
+                parts.append("\n\n")
+                yield "\n\n"
+                messages = _build_messages(user_input, _session_context(session_id))
+                for _, delta in backend_router.stream(messages, **_completion_params(_route(user_input))):
+                    parts.append(delta)
+                    yield delta
+            _record_turn(session_id, user_input, "".join(parts).strip())
+            return
+        
+        context = _session_context(session_id)
+        local = _local_response(user_input, context)
+        if local is not None:
+            _record_turn(session_id, user_input, local)
+            yield local
+            return
+        
+        log_payload("Streaming healthcare query: %s...", user_input[:100])
+        
+        backend = None
+        route = _route(user_input)
+        started = time.perf_counter()
+        for backend, delta in backend_router.stream(_build_messages(user_input, context), **_completion_params(route)):
+            parts.append(delta)
+            yield delta
+        metrics.route_latency.observe(time.perf_counter() - started, tier=route.tier)
+        
+        response_text = "".join(parts).strip()
+        if backend and backend.cacheable:
+            _remember(user_input, response_text, context)
+        _record_turn(session_id, user_input, response_text)
+        
+    except Exception as e:
+        # Only fall back to a canned answer if nothing has been sent yet
+        if parts:
+            yield f"\n\n{_error_message(e)}"
+        else:
+            yield _degraded_response(user_input, e)
+
+async def stream_healthcare_response_async(user_input: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Stream a healthcare response without blocking the event loop; see stream_healthcare_response.
+    
+    Each upstream stream holds a slot of async_limiter until it ends.
+    """
+    parts = []
+    try:
+        error = _validate_input(user_input)
+        if error:
+            yield error
+            return
+        user_input = user_input.strip()
+        
+        urgent = _triage_response(user_input)
+        if urgent:
+            parts.append(urgent)
+            yield urgent
+            if config.TRIAGE_FOLLOW_UP:
+                parts.append("\n\n")
+                yield "\n\n"
+                messages = _build_messages(user_input, _session_context(session_id))
+                async with async_limiter:
+                    async for _, delta in backend_router.stream_async(messages, **_completion_params(_route(user_input))):
+                        parts.append(delta)
+                        yield delta
+            _record_turn(session_id, user_input, "".join(parts).strip())
+            return
+        
+        context = _session_context(session_id)
+        local = _local_response(user_input, context)
+        if local is not None:
+            _record_turn(session_id, user_input, local)
+            yield local
+            return
+        
+        log_payload("Streaming async healthcare query: %s...", user_input[:100])
+        
+        backend = None
+        route = _route(user_input)
+        started = time.perf_counter()
+        async with async_limiter:
+            async for backend, delta in backend_router.stream_async(_build_messages(user_input, context), **_completion_params(route)):
+                parts.append(delta)
+                yield delta
+        metrics.route_latency.observe(time.perf_counter() - started, tier=route.tier)
+        
+        response_text = "".join(parts).strip()
+        if backend and backend.cacheable:
+            _remember(user_input, response_text, context)
+        _record_turn(session_id, user_input, response_text)
+        
+    except Exception as e:
+        if parts:
+            yield f"\n\n{_error_message(e)}"
+        else:
+            yield _degraded_response(user_input, e)
@@ -0,0 +1,180 @@
+"""
+Circuit breakers for Healthcare Chatbot
+This module stops sending requests to an upstream that keeps failing, so requests fail
+fast instead of tying up workers, and probes it again after a cool-down.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+transitions = metrics.registry.register(metrics.Counter(
+    "chatbot_circuit_transitions_total", "Circuit breaker state changes, by breaker and new state.", ("breaker", "state")
+))
+rejections = metrics.registry.register(metrics.Counter(
+    "chatbot_circuit_rejected_total", "Calls failed fast because a circuit breaker was open.", ("breaker",)
+))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+    
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit breaker '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+def is_timeout(exc: Exception) -> bool:
+    """Whether an exception means the upstream did not answer in time."""
+    import openai
+    return isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError, TimeoutError))
+
+def is_failure(exc: Exception) -> bool:
+    """Whether an exception says the upstream is unhealthy, rather than the request being bad."""
+    # Only remote backends are guarded, so the SDK is already loaded by the time this runs
+    import openai
+    if isinstance(exc, openai.RateLimitError):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500
+    return True
+
+class CircuitBreaker:
+    """Track the outcomes of calls to one upstream and fail fast while it is unhealthy."""
+    
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 10, window: int = 20,
+                 consecutive_timeouts: int = 3, reset_timeout: float = 30.0, half_open_probes: int = 1):
+        """
+        Args:
+            name (str): Breaker name used in errors and metrics
+            failure_rate (float): Fraction of failed recent calls that trips the breaker
+            min_calls (int): Recent calls needed before the failure rate is considered
+            window (int): Number of recent call outcomes kept
+            consecutive_timeouts (int): Timeouts in a row that trip the breaker
+            reset_timeout (float): Seconds the breaker stays open before probing again
+            half_open_probes (int): Probe calls allowed at once, and successes needed to close
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.consecutive_timeouts = consecutive_timeouts
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._timeouts = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+    
+    def _transition(self, state: str):
+        """Move to a new state; the caller holds the lock."""
+        self.state = state
+        self._outcomes.clear()
+        self._timeouts = 0
+        self._probes = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        transitions.inc(breaker=self.name, state=state)
+    
+    def _acquire(self) -> bool:
+        """
+        Admit a call or raise CircuitOpenError.
+        
+        Returns:
+            bool: Whether the call is a half-open probe
+        """
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    rejections.inc(breaker=self.name)
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    rejections.inc(breaker=self.name)
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probes += 1
+                return True
+            return False
+    
+    def _on_success(self, probe: bool):
+        """Record a successful call."""
+        with self._lock:
+            if probe:
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED)
+            elif self.state == CLOSED:
+                self._outcomes.append(False)
+                self._timeouts = 0
+    
+    def _on_failure(self, probe: bool, exc: Exception):
+        """Record a failed call, tripping the breaker if the upstream looks unhealthy."""
+        if not is_failure(exc):
+            self._release(probe)
+            return
+        with self._lock:
+            if probe:
+                if self.state == HALF_OPEN:
+                    self._transition(OPEN)
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append(True)
+            self._timeouts = self._timeouts + 1 if is_timeout(exc) else 0
+            failures = sum(self._outcomes)
+            if (self._timeouts >= self.consecutive_timeouts or
+                    (len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate)):
+                self._transition(OPEN)
+    
+    def _release(self, probe: bool):
+        """Give back a probe slot for a call that ended without a verdict."""
+        if probe:
+            with self._lock:
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+    
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run the enclosed call through the breaker.
+        
+        Raises CircuitOpenError without running the call while the breaker is open, and
+        records whether the call succeeded otherwise.
+        """
+        probe = self._acquire()
+        try:
+            yield
+        except Exception as e:
+            self._on_failure(probe, e)
+            raise
+        except BaseException:
+            # Cancelled or abandoned calls say nothing about the upstream
+            self._release(probe)
+            raise
+        else:
+            self._on_success(probe)
+    
+    def stats(self) -> dict:
+        """Get the breaker state and recent failure count."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": sum(self._outcomes),
+                "consecutive_timeouts": self._timeouts
+            }
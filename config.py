@@ -19,6 +19,33 @@ class Config:
     OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
     OPENAI_MAX_TOKENS: int = int(os.getenv("OPENAI_MAX_TOKENS", "400"))
     OPENAI_TIMEOUT: int = int(os.getenv("OPENAI_TIMEOUT", "30"))
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL")
+    
+    # LLM Backend Configuration (comma-separated, tried in order)
+    LLM_BACKENDS: str = os.getenv("LLM_BACKENDS", "openai")
+    
+    # Request Hedging Configuration
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "False").lower() == "true"
+    HEDGE_DELAY: float = float(os.getenv("HEDGE_DELAY", "0"))
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MAX_RATIO: float = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_WINDOW: int = int(os.getenv("HEDGE_WINDOW", "200"))
+    HEDGE_MAX_WORKERS: int = int(os.getenv("HEDGE_MAX_WORKERS", "64"))
+    
+    # Query Routing Configuration (model tier and output token cap per question class)
+    ROUTING_ENABLED: bool = os.getenv("ROUTING_ENABLED", "True").lower() == "true"
+    ROUTE_SIMPLE_MAX_WORDS: int = int(os.getenv("ROUTE_SIMPLE_MAX_WORDS", "12"))
+    ROUTE_COMPLEX_MIN_WORDS: int = int(os.getenv("ROUTE_COMPLEX_MIN_WORDS", "60"))
+    
+    # Circuit Breaker Configuration
+    CIRCUIT_BREAKER_ENABLED: bool = os.getenv("CIRCUIT_BREAKER_ENABLED", "True").lower() == "true"
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+    CIRCUIT_WINDOW: int = int(os.getenv("CIRCUIT_WINDOW", "20"))
+    CIRCUIT_CONSECUTIVE_TIMEOUTS: int = int(os.getenv("CIRCUIT_CONSECUTIVE_TIMEOUTS", "3"))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+    CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
     
     # Flask Configuration
     FLASK_ENV: str = os.getenv("FLASK_ENV", "development")
@@ -26,12 +53,93 @@ class Config:
     FLASK_HOST: str = os.getenv("FLASK_HOST", "0.0.0.0")
     FLASK_PORT: int = int(os.getenv("FLASK_PORT", "5000"))
     
+    # Production Server (gunicorn) Configuration; 0 derives the value automatically
+    GUNICORN_WORKER_CLASS: str = os.getenv("GUNICORN_WORKER_CLASS", "auto")
+    GUNICORN_WORKERS: int = int(os.getenv("GUNICORN_WORKERS", "0"))
+    GUNICORN_THREADS: int = int(os.getenv("GUNICORN_THREADS", "0"))
+    GUNICORN_WORKER_CONNECTIONS: int = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+    GUNICORN_TIMEOUT: int = int(os.getenv("GUNICORN_TIMEOUT", "0"))
+    GUNICORN_GRACEFUL_TIMEOUT: int = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "0"))
+    GUNICORN_KEEPALIVE: int = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+    GUNICORN_MAX_REQUESTS: int = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+    UPSTREAM_WAIT_RATIO: float = float(os.getenv("UPSTREAM_WAIT_RATIO", "0.9"))
+    
+    # Emergency Triage Configuration
+    TRIAGE_ENABLED: bool = os.getenv("TRIAGE_ENABLED", "True").lower() == "true"
+    TRIAGE_FOLLOW_UP: bool = os.getenv("TRIAGE_FOLLOW_UP", "False").lower() == "true"
+    TRIAGE_FOLLOW_UP_WORKERS: int = int(os.getenv("TRIAGE_FOLLOW_UP_WORKERS", "4"))
+    
+    # FAQ Retrieval Configuration
+    FAQ_ENABLED: bool = os.getenv("FAQ_ENABLED", "True").lower() == "true"
+    FAQ_PATH: str = os.getenv("FAQ_PATH", "faq.json")
+    FAQ_INDEX_DIR: str = os.getenv("FAQ_INDEX_DIR", "faq_index")
+    FAQ_THRESHOLD: float = float(os.getenv("FAQ_THRESHOLD", "0.7"))
+    FAQ_MIN_MARGIN: float = float(os.getenv("FAQ_MIN_MARGIN", "0.1"))
+    
+    # Static Asset Configuration
+    STATIC_DIR: str = os.getenv("STATIC_DIR", "static")
+    STATIC_MAX_AGE: int = int(os.getenv("STATIC_MAX_AGE", "300"))
+    
+    # Conversation Memory Configuration
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    SESSION_TTL: int = int(os.getenv("SESSION_TTL", "3600"))
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+    CONTEXT_SUMMARY_TOKENS: int = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200"))
+    EXPORT_MAX_TURNS: int = int(os.getenv("EXPORT_MAX_TURNS", "500"))
+    
+    # Conversation Store Configuration (opt-in; an empty path keeps history in process memory)
+    CONVERSATION_DB_PATH: str = os.getenv("CONVERSATION_DB_PATH", "")
+    CONVERSATION_DB_BATCH_SIZE: int = int(os.getenv("CONVERSATION_DB_BATCH_SIZE", "100"))
+    CONVERSATION_DB_FLUSH_INTERVAL: float = float(os.getenv("CONVERSATION_DB_FLUSH_INTERVAL", "0.05"))
+    CONVERSATION_DB_QUEUE_SIZE: int = int(os.getenv("CONVERSATION_DB_QUEUE_SIZE", "10000"))
+    CONVERSATION_RETENTION_DAYS: float = float(os.getenv("CONVERSATION_RETENTION_DAYS", "30"))
+    
+    # Admission Control Configuration
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "10"))
+    MAX_CONCURRENT_CHATS: int = int(os.getenv("MAX_CONCURRENT_CHATS", "16"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    TRUST_PROXY_HEADERS: bool = os.getenv("TRUST_PROXY_HEADERS", "False").lower() == "true"
+    
+    # Batch API Configuration
+    BATCH_MAX_MESSAGES: int = int(os.getenv("BATCH_MAX_MESSAGES", "500"))
+    BATCH_MAX_WORKERS: int = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+    
+    # Job Queue Configuration
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "8"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+    JOB_TTL: float = float(os.getenv("JOB_TTL", "600"))
+    JOB_MAX_STORED: int = int(os.getenv("JOB_MAX_STORED", "10000"))
+    JOB_MAX_WAIT: float = float(os.getenv("JOB_MAX_WAIT", "30"))
+    
+    # Async (ASGI) Serving Configuration
+    ASGI_PORT: int = int(os.getenv("ASGI_PORT", "8000"))
+    ASYNC_MAX_CONCURRENCY: int = int(os.getenv("ASYNC_MAX_CONCURRENCY", "1000"))
+    ASYNC_MAX_CONNECTIONS: int = int(os.getenv("ASYNC_MAX_CONNECTIONS", "200"))
+    ASYNC_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("ASYNC_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    
+    # WebSocket Chat Configuration
+    WS_HEARTBEAT_INTERVAL: float = float(os.getenv("WS_HEARTBEAT_INTERVAL", "15"))
+    WS_RESUME_TTL: float = float(os.getenv("WS_RESUME_TTL", "120"))
+    WS_MAX_IN_FLIGHT: int = int(os.getenv("WS_MAX_IN_FLIGHT", "4"))
+    WS_MAX_GENERATIONS: int = int(os.getenv("WS_MAX_GENERATIONS", "200"))
+    WS_MAX_GENERATIONS_PER_CLIENT: int = int(os.getenv("WS_MAX_GENERATIONS_PER_CLIENT", "4"))
+    
     # Streamlit Configuration
     STREAMLIT_PORT: int = int(os.getenv("STREAMLIT_PORT", "8501"))
+    STREAMLIT_HISTORY_WINDOW: int = int(os.getenv("STREAMLIT_HISTORY_WINDOW", "10"))
+    STREAMLIT_HISTORY_MAX: int = int(os.getenv("STREAMLIT_HISTORY_MAX", "200"))
     
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    LOG_JSON: bool = os.getenv("LOG_JSON", "False").lower() == "true"
+    LOG_FILE: Optional[str] = os.getenv("LOG_FILE")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Request/response payload logs (headers, bodies, messages, replies); off by default in production
+    LOG_PAYLOADS: bool = os.getenv("LOG_PAYLOADS", str(FLASK_ENV != "production")).lower() == "true"
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
     
     # Security Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -41,6 +149,12 @@ class Config:
     APP_VERSION: str = "1.0.0"
     MAX_MESSAGE_LENGTH: int = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
     
+    # Response Cache Configuration
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
+    CACHE_MAX_SIZE: int = int(os.getenv("CACHE_MAX_SIZE", "1024"))
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))
+    CACHE_PATH: Optional[str] = os.getenv("CACHE_PATH")
+    
     @classmethod
     def validate_config(cls) -> bool:
         """Validate that all required configuration is present."""
@@ -68,6 +182,95 @@ class Config:
             "timeout": cls.OPENAI_TIMEOUT
         }
     
+    @classmethod
+    def get_backend_configs(cls) -> list:
+        """
+        Get the LLM backend configurations, in failover order, as a list of dictionaries.
+        
+        Each name in LLM_BACKENDS can be configured with BACKEND_<NAME>_TYPE, _BASE_URL,
+        _API_KEY, _MODEL, _TIMEOUT and _MAX_RETRIES; unset values fall back to the OPENAI_* settings,
+        except that only the "openai" backend is given OPENAI_API_KEY and OPENAI_BASE_URL.
+        
+        BACKEND_<NAME>_<TIER>_MODEL sets the model a backend answers a routing tier with; the
+        "openai" backend falls back to ROUTE_<TIER>_MODEL, and other backends keep their own model.
+        """
+        names = [name.strip() for name in cls.LLM_BACKENDS.split(",") if name.strip()]
+        # Let the router fail over instead of retrying the same backend when there are alternatives
+        default_retries = "2" if len(names) == 1 else "0"
+        
+        backend_configs = []
+        for name in names:
+            prefix = f"BACKEND_{name.upper()}_"
+            tier_models = {}
+            for tier in ("simple", "standard", "complex"):
+                # A tier model names a model on one server, so it is never applied to the others
+                tier_model = os.getenv(f"{prefix}{tier.upper()}_MODEL",
+                                       os.getenv(f"ROUTE_{tier.upper()}_MODEL", "") if name == "openai" else "")
+                if tier_model:
+                    tier_models[tier] = tier_model
+            backend_configs.append({
+                "name": name,
+                "type": os.getenv(prefix + "TYPE", "offline" if name == "offline" else "openai"),
+                "base_url": os.getenv(prefix + "BASE_URL", cls.OPENAI_BASE_URL if name == "openai" else None),
+                # Never send the OpenAI secret to another server
+                "api_key": os.getenv(prefix + "API_KEY", cls.OPENAI_API_KEY if name == "openai" else None),
+                "model": os.getenv(prefix + "MODEL", cls.OPENAI_MODEL),
+                "timeout": float(os.getenv(prefix + "TIMEOUT", str(cls.OPENAI_TIMEOUT))),
+                "max_retries": int(os.getenv(prefix + "MAX_RETRIES", default_retries)),
+                "tier_models": tier_models
+            })
+        return backend_configs
+    
+    @classmethod
+    def get_hedge_config(cls) -> Optional[dict]:
+        """Get the request hedging settings as a dictionary, or None if hedging is disabled."""
+        if not cls.HEDGE_ENABLED:
+            return None
+        return {
+            "delay": cls.HEDGE_DELAY,
+            "percentile": cls.HEDGE_PERCENTILE,
+            "max_ratio": cls.HEDGE_MAX_RATIO,
+            "min_samples": cls.HEDGE_MIN_SAMPLES,
+            "window": cls.HEDGE_WINDOW,
+            "max_workers": cls.HEDGE_MAX_WORKERS
+        }
+    
+    @classmethod
+    def get_route_tiers(cls) -> Optional[dict]:
+        """
+        Get the output token cap for each routing tier, or None if routing is disabled.
+        
+        Each tier's cap can be set with ROUTE_<TIER>_MAX_TOKENS and defaults to half, one and one
+        and a half times OPENAI_MAX_TOKENS; tier models are set per backend (see get_backend_configs).
+        """
+        if not cls.ROUTING_ENABLED:
+            return None
+        default_max_tokens = {
+            "simple": cls.OPENAI_MAX_TOKENS // 2,
+            "standard": cls.OPENAI_MAX_TOKENS,
+            "complex": cls.OPENAI_MAX_TOKENS * 3 // 2
+        }
+        return {
+            tier: {
+                "max_tokens": int(os.getenv(f"ROUTE_{tier.upper()}_MAX_TOKENS", str(max_tokens)))
+            }
+            for tier, max_tokens in default_max_tokens.items()
+        }
+    
+    @classmethod
+    def get_breaker_config(cls) -> Optional[dict]:
+        """Get the circuit breaker settings as a dictionary, or None if circuit breaking is disabled."""
+        if not cls.CIRCUIT_BREAKER_ENABLED:
+            return None
+        return {
+            "failure_rate": cls.CIRCUIT_FAILURE_RATE,
+            "min_calls": cls.CIRCUIT_MIN_CALLS,
+            "window": cls.CIRCUIT_WINDOW,
+            "consecutive_timeouts": cls.CIRCUIT_CONSECUTIVE_TIMEOUTS,
+            "reset_timeout": cls.CIRCUIT_RESET_TIMEOUT,
+            "half_open_probes": cls.CIRCUIT_HALF_OPEN_PROBES
+        }
+    
     @classmethod
     def get_flask_config(cls) -> dict:
         """Get Flask configuration as a dictionary."""
@@ -86,12 +289,32 @@ class Config:
         print(f"  OpenAI Model: {cls.OPENAI_MODEL}")
         print(f"  OpenAI Temperature: {cls.OPENAI_TEMPERATURE}")
         print(f"  OpenAI Max Tokens: {cls.OPENAI_MAX_TOKENS}")
+        print(f"  LLM Backends: {cls.LLM_BACKENDS}")
+        print(f"  Request Hedging: {cls.HEDGE_ENABLED} (delay {cls.HEDGE_DELAY or f'p{cls.HEDGE_PERCENTILE:g}'}, max ratio {cls.HEDGE_MAX_RATIO})")
+        print(f"  Query Routing: {cls.ROUTING_ENABLED} (simple up to {cls.ROUTE_SIMPLE_MAX_WORDS} words, complex from {cls.ROUTE_COMPLEX_MIN_WORDS})")
+        print(f"  Circuit Breaker: {cls.CIRCUIT_BREAKER_ENABLED} (reset after {cls.CIRCUIT_RESET_TIMEOUT}s)")
         print(f"  Flask Host: {cls.FLASK_HOST}")
         print(f"  Flask Port: {cls.FLASK_PORT}")
         print(f"  Flask Debug: {cls.FLASK_DEBUG}")
+        print(f"  Static Assets: {cls.STATIC_DIR} (max-age {cls.STATIC_MAX_AGE}s)")
+        print(f"  Gunicorn Worker Class: {cls.GUNICORN_WORKER_CLASS} (upstream wait ratio {cls.UPSTREAM_WAIT_RATIO})")
+        print(f"  Conversation Store: {cls.CONVERSATION_DB_PATH or 'In memory'} (retention {cls.CONVERSATION_RETENTION_DAYS:g} days)")
+        print(f"  Context Token Budget: {cls.CONTEXT_MAX_TOKENS} (+{cls.CONTEXT_SUMMARY_TOKENS} summary)")
+        print(f"  Rate Limit: {cls.RATE_LIMIT_PER_MINUTE}/min per client (burst {cls.RATE_LIMIT_BURST})")
+        print(f"  Max Concurrent Chats: {cls.MAX_CONCURRENT_CHATS} (queue {cls.ADMISSION_QUEUE_SIZE})")
+        print(f"  Batch API: up to {cls.BATCH_MAX_MESSAGES} messages, {cls.BATCH_MAX_WORKERS} workers")
+        print(f"  Job Queue: {cls.JOB_WORKERS} workers, {cls.JOB_QUEUE_SIZE} queued, results kept {cls.JOB_TTL:g}s")
+        print(f"  ASGI Port: {cls.ASGI_PORT}")
+        print(f"  Async Max Concurrency: {cls.ASYNC_MAX_CONCURRENCY}")
+        print(f"  WebSocket Chat: heartbeat {cls.WS_HEARTBEAT_INTERVAL:g}s, resumable for {cls.WS_RESUME_TTL:g}s")
+        print(f"  WebSocket Replies: {cls.WS_MAX_GENERATIONS} generating at once, {cls.WS_MAX_GENERATIONS_PER_CLIENT} per client")
         print(f"  Streamlit Port: {cls.STREAMLIT_PORT}")
         print(f"  Log Level: {cls.LOG_LEVEL}")
+        print(f"  Payload Logging: {'Enabled' if cls.LOG_PAYLOADS else 'Disabled'} (sample rate {cls.LOG_PAYLOAD_SAMPLE_RATE})")
         print(f"  Max Message Length: {cls.MAX_MESSAGE_LENGTH}")
+        print(f"  Emergency Triage: {'Enabled' if cls.TRIAGE_ENABLED else 'Disabled'} (model follow-up {'on' if cls.TRIAGE_FOLLOW_UP else 'off'})")
+        print(f"  FAQ Answers: {'Enabled' if cls.FAQ_ENABLED else 'Disabled'} ({cls.FAQ_PATH}, threshold {cls.FAQ_THRESHOLD}, margin {cls.FAQ_MIN_MARGIN})")
+        print(f"  Response Cache: {'Enabled' if cls.CACHE_ENABLED else 'Disabled'} (size={cls.CACHE_MAX_SIZE}, ttl={cls.CACHE_TTL}s)")
         print(f"  OpenAI API Key: {'✅ Set' if cls.OPENAI_API_KEY else '❌ Not Set'}")
 
 # Create a global config instance
@@ -0,0 +1,17 @@
+"""
+Pytest configuration for Healthcare Chatbot
+The checks in test_app.py report their outcome by returning True or False so that
+`python test_app.py` can tally them; this hook makes a False result fail under pytest.
+"""
+
+import inspect
+import pytest
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run a test function and fail it if it returns False."""
+    parameters = inspect.signature(pyfuncitem.obj).parameters
+    funcargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem.fixturenames if name in parameters}
+    result = pyfuncitem.obj(**funcargs)
+    assert result is not False, f"{pyfuncitem.name} reported a failure (see its output above)"
+    return True
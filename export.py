@@ -0,0 +1,128 @@
+"""
+Transcript export for Healthcare Chatbot
+This module keeps a conversation transcript as turns are appended and renders it lazily,
+in chunks, as plain text, Markdown or JSON Lines when a download is requested.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+class ExportFormat(NamedTuple):
+    """How a transcript is rendered in one download format."""
+    mimetype: str
+    extension: str
+    header: str
+    render: Callable[[dict], str]
+
+def _render_text(turn: dict) -> str:
+    user = f"User: {turn['user']}\n" if turn["user"] else ""
+    return f"{user}Bot: {turn['bot']}\n---\n"
+
+def _render_markdown(turn: dict) -> str:
+    user = f"**👤 You:** {turn['user']}\n\n" if turn["user"] else ""
+    return f"### Turn {turn['turn']}\n\n{user}**🤖 Bot:** {turn['bot']}\n\n"
+
+def _render_jsonl(turn: dict) -> str:
+    return json.dumps(turn, ensure_ascii=False) + "\n"
+
+FORMATS: Dict[str, ExportFormat] = {
+    "txt": ExportFormat("text/plain; charset=utf-8", "txt", "", _render_text),
+    "md": ExportFormat("text/markdown; charset=utf-8", "md", "# Healthcare Chat Transcript\n\n", _render_markdown),
+    "jsonl": ExportFormat("application/x-ndjson; charset=utf-8", "jsonl", "", _render_jsonl)
+}
+
+CHUNK_SIZE = 64 * 1024
+
+def _chunk(header: str, pieces: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """Join rendered pieces into chunks of roughly chunk_size characters, header first."""
+    chunk, size = [header], len(header)
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+def render_chunks(turns: Iterable[dict], fmt: str = "txt", chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Render turns read from elsewhere, such as the conversation store, in chunks.
+    
+    Args:
+        turns (iterable): Turn dictionaries with turn, timestamp, user and bot keys
+        fmt (str): One of FORMATS
+        chunk_size (int): Characters collected before a chunk is yielded
+        
+    Yields:
+        str: Successive pieces of the export
+    """
+    export_format = FORMATS[fmt]
+    return _chunk(export_format.header, (export_format.render(turn) for turn in turns), chunk_size)
+
+class Transcript:
+    """An append-only record of a conversation, rendered per format only when exported."""
+    
+    def __init__(self, max_turns: Optional[int] = None):
+        """
+        Args:
+            max_turns (int): Most recent turns kept; None keeps every turn
+        """
+        self.max_turns = max_turns
+        self.total_turns = 0
+        self._turns = deque()
+        # Rendered turns per format, from the oldest kept turn; extended on export
+        self._rendered: Dict[str, deque] = {name: deque() for name in FORMATS}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._turns)
+    
+    def append(self, user_message: str, bot_message: str):
+        """Record a completed turn."""
+        with self._lock:
+            self.total_turns += 1
+            self._turns.append({
+                "turn": self.total_turns,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "user": user_message,
+                "bot": bot_message
+            })
+            if self.max_turns and len(self._turns) > self.max_turns:
+                self._turns.popleft()
+                for rendered in self._rendered.values():
+                    if rendered:
+                        rendered.popleft()
+    
+    def iter_chunks(self, fmt: str = "txt", chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        """
+        Render the transcript in chunks of roughly chunk_size characters.
+        
+        Only turns added since the last export in this format are rendered; the rest
+        are reused.
+        
+        Args:
+            fmt (str): One of FORMATS
+            chunk_size (int): Characters collected before a chunk is yielded
+            
+        Yields:
+            str: Successive pieces of the export
+        """
+        with self._lock:
+            rendered = self._rendered[fmt]
+            for index in range(len(rendered), len(self._turns)):
+                rendered.append(FORMATS[fmt].render(self._turns[index]))
+            pieces = list(rendered)
+        return _chunk(FORMATS[fmt].header, pieces, chunk_size)
+    
+    def recent(self, limit: int) -> List[dict]:
+        """Get up to limit of the most recent turns, oldest first."""
+        with self._lock:
+            return list(self._turns)[-limit:] if limit > 0 else []
+    
+    def export(self, fmt: str = "txt") -> str:
+        """Render the whole transcript as one string."""
+        return "".join(self.iter_chunks(fmt))
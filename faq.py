@@ -0,0 +1,232 @@
+"""
+FAQ retrieval for Healthcare Chatbot
+This module embeds a curated set of vetted questions and answers with hashed n-gram
+TF-IDF vectors, keeps them in a memory-mapped NumPy matrix, and answers paraphrased
+questions by cosine similarity without calling the model.
+
+The index is built from the corpus on first use, or ahead of time with:
+    python faq.py
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+from cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature space; collisions are rare at this size for a corpus of a few hundred questions
+DIMENSIONS = 1 << 13
+
+# Character n-gram lengths taken inside each word, so inflections ("hurt", "hurts") still overlap
+CHAR_NGRAMS = (3, 4, 5)
+
+# Words too common in questions to say anything about the topic
+STOPWORDS = frozenset("""
+a about am an and any are at be can could do does for from get got have how i i m if in is it
+its me my of on or should so than that the there this to up was what when which why will with would you your
+""".split())
+
+# Vetted answers are written for general questions about adults; a question quoting its own
+# readings ("200/120", "a fever of 39"), about an animal, about a group of patients whose
+# care differs (babies, children, pregnancy) or about a more serious cause ("a burn from
+# acid") needs the model instead
+_MEASUREMENT_RE = re.compile(r"\d")
+NON_HUMAN = frozenset("""
+animal animals bird birds cat cats dog dogs horse horses kitten kittens pet pets puppy puppies rabbit rabbits
+""".split())
+SPECIAL_CASES = frozenset("""
+baby babies newborn newborns infant infants toddler toddlers child children kid kids son daughter teen teens
+teenager teenagers pregnant pregnancy breastfeeding elderly
+acid acids alkali bleach chemical chemicals electric electrical lye
+""".split())
+
+INDEX_VERSION = 1
+
+class FaqMatch(NamedTuple):
+    """The vetted answer closest to a question."""
+    id: str
+    answer: str
+    score: float
+
+def _features(text: str) -> Counter:
+    """Count the word, word-pair and in-word character n-gram features of normalized text."""
+    words = [word for word in text.split() if word not in STOPWORDS]
+    features = Counter(f"w:{word}" for word in words)
+    features.update(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f" {word} "
+        for n in CHAR_NGRAMS:
+            features.update(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    return features
+
+def _hashed_counts(text: str) -> Dict[int, float]:
+    """Map a text's features to signed, sublinearly scaled counts per hashed dimension."""
+    counts: Dict[int, float] = {}
+    for feature, count in _features(normalize_query(text)).items():
+        # crc32 is stable across processes, unlike hash(); its top bit picks the sign
+        digest = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        index = digest % DIMENSIONS
+        counts[index] = counts.get(index, 0.0) + sign * (1.0 + math.log(count))
+    return counts
+
+def _corpus_digest(path: str) -> str:
+    """Fingerprint the corpus file so a stale index is rebuilt."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _answerable(question: str) -> bool:
+    """Check that a question is general enough for a vetted answer."""
+    text = normalize_query(question)
+    words = text.split()
+    return not _MEASUREMENT_RE.search(text) and NON_HUMAN.isdisjoint(words) and SPECIAL_CASES.isdisjoint(words)
+
+class FaqIndex:
+    """Vetted FAQ answers looked up by TF-IDF cosine similarity."""
+    
+    def __init__(self, corpus_path: str, index_dir: str, threshold: float = 0.7, margin: float = 0.1):
+        """
+        Args:
+            corpus_path (str): JSON list of {"id", "questions", "answer"} entries
+            index_dir (str): Directory holding the built index files
+            threshold (float): Minimum cosine similarity for an answer to be used
+            margin (float): How much closer the best entry must be than the runner-up entry
+        """
+        self.corpus_path = corpus_path
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self.margin = margin
+        self._vectors = None
+        self._idf = None
+        self._rows: List[int] = []
+        self._entries: List[dict] = []
+        self._lock = threading.Lock()
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+    
+    def build(self) -> bool:
+        """
+        Embed the corpus and write the index files.
+        
+        Returns:
+            bool: True if the index was written, False if it is only held in memory
+        """
+        import numpy as np
+        
+        with open(self.corpus_path, encoding="utf-8") as f:
+            entries = json.load(f)
+        rows = [index for index, entry in enumerate(entries) for _ in entry["questions"]]
+        counts = [_hashed_counts(question) for entry in entries for question in entry["questions"]]
+        
+        vectors = np.zeros((len(counts), DIMENSIONS), dtype=np.float32)
+        for row, row_counts in enumerate(counts):
+            vectors[row, list(row_counts)] = list(row_counts.values())
+        document_frequency = np.count_nonzero(vectors, axis=0)
+        idf = (np.log((1 + len(counts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        vectors *= idf
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        
+        self._vectors, self._idf, self._rows, self._entries = vectors, idf, rows, entries
+        meta = {
+            "version": INDEX_VERSION,
+            "dimensions": DIMENSIONS,
+            "corpus_sha256": _corpus_digest(self.corpus_path),
+            "rows": rows
+        }
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            np.save(self._path("vectors.npy"), vectors)
+            np.save(self._path("idf.npy"), idf)
+            with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logger.warning("Could not save the FAQ index to %s: %s", self.index_dir, e)
+            return False
+        return True
+    
+    def _load(self):
+        """Memory-map the index, building it first if it is missing or out of date."""
+        if self._vectors is not None:
+            return
+        with self._lock:
+            if self._vectors is not None:
+                return
+            import numpy as np
+            
+            try:
+                with open(self._path("meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                current = (
+                    meta.get("version") == INDEX_VERSION
+                    and meta.get("dimensions") == DIMENSIONS
+                    and meta.get("corpus_sha256") == _corpus_digest(self.corpus_path)
+                )
+            except (OSError, ValueError):
+                current = False
+            
+            if not current:
+                logger.info("Building FAQ index from %s", self.corpus_path)
+                self.build()
+                return
+            
+            with open(self.corpus_path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._rows = meta["rows"]
+            self._idf = np.load(self._path("idf.npy"), mmap_mode="r")
+            self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+    
+    def warm_up(self):
+        """Load the index now rather than on the first question."""
+        self._load()
+    
+    def search_many(self, questions: List[str]) -> List[Optional[FaqMatch]]:
+        """
+        Find the closest vetted answer for each of several questions in one matrix product.
+        
+        Returns:
+            list: A FaqMatch per question, or None where nothing clears the threshold
+        """
+        import numpy as np
+        
+        self._load()
+        queries = np.zeros((len(questions), DIMENSIONS), dtype=np.float32)
+        for row, question in enumerate(questions):
+            counts = _hashed_counts(question)
+            queries[row, list(counts)] = list(counts.values())
+        queries *= self._idf
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        
+        scores = queries @ self._vectors.T
+        best = scores.argmax(axis=1)
+        rows = np.asarray(self._rows)
+        matches = []
+        for row, column in enumerate(best):
+            score = float(scores[row, column])
+            # The closest question of any other entry; an ambiguous question is left to the model
+            others = scores[row, rows != rows[column]]
+            runner_up = float(others.max()) if others.size else 0.0
+            if score < self.threshold or score - runner_up < self.margin or not _answerable(questions[row]):
+                matches.append(None)
+                continue
+            entry = self._entries[self._rows[column]]
+            matches.append(FaqMatch(entry["id"], entry["answer"], score))
+        return matches
+    
+    def search(self, question: str) -> Optional[FaqMatch]:
+        """Find the closest vetted answer for a question, or None if nothing clears the threshold."""
+        return self.search_many([question])[0]
+
+if __name__ == "__main__":
+    from config import config
+    index = FaqIndex(config.FAQ_PATH, config.FAQ_INDEX_DIR)
+    if index.build():
+        print(f"✅ FAQ index written to {config.FAQ_INDEX_DIR} ({len(index._rows)} questions)")
@@ -1,86 +1,453 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify, make_response, g, Response, stream_with_context
 from flask_cors import CORS
-from chatbot import get_healthcare_response
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import wraps
+from admission import AdmissionController, AdmissionRejected
+from chatbot import get_healthcare_response, is_error_reply, stream_healthcare_response
+from export import FORMATS
+from jobs import JobQueue, JobQueueFull
+from sessions import session_store
+from static_assets import StaticAssets, etag_matches
+from triage import triage_engine
+import json
 import logging
+import os
+import time
+import metrics
 from config import config
+from logging_setup import configure_logging, log_payload, payload_logger, should_log_payload
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)
 app.config['SECRET_KEY'] = config.SECRET_KEY
 CORS(app)  # Enable CORS for all routes
 
+# Rate limiting and load shedding in front of the chat endpoints
+admission = AdmissionController(
+    rate_per_minute=config.RATE_LIMIT_PER_MINUTE,
+    burst=config.RATE_LIMIT_BURST,
+    max_concurrency=config.MAX_CONCURRENT_CHATS,
+    max_queue=config.ADMISSION_QUEUE_SIZE,
+    queue_timeout=config.ADMISSION_QUEUE_TIMEOUT
+)
+metrics.registry.gauge("chatbot_admission_active", "Chat requests being processed.", lambda: admission.active)
+metrics.registry.gauge("chatbot_admission_waiting", "Chat requests waiting for a free slot.", lambda: admission.waiting)
+metrics.registry.gauge("chatbot_admission_rate_limited", "Chat requests rejected by per-client rate limits.", lambda: admission.rate_limited)
+metrics.registry.gauge("chatbot_admission_shed", "Chat requests shed because the server was overloaded.", lambda: admission.shed)
+
+def _answer_admitted(message, session_id=None):
+    """Answer a message off the request thread while holding one of the MAX_CONCURRENT_CHATS slots."""
+    with admission.slot():
+        return get_healthcare_response(message, session_id)
+
+# Chat requests accepted with POST /chat/jobs and answered in the background; a worker
+# answers a job only once it holds a slot, so jobs never add to MAX_CONCURRENT_CHATS
+job_queue = JobQueue(
+    _answer_admitted,
+    workers=config.JOB_WORKERS,
+    max_queued=config.JOB_QUEUE_SIZE,
+    ttl=config.JOB_TTL,
+    max_jobs=config.JOB_MAX_STORED,
+    # With CONVERSATION_DB_PATH set, any worker process can report a job another accepted
+    store=session_store.store
+)
+metrics.registry.gauge("chatbot_jobs_queued", "Chat jobs waiting for a worker.", lambda: job_queue.queued)
+metrics.registry.gauge("chatbot_jobs_running", "Chat jobs being answered.", lambda: job_queue.running)
+metrics.registry.gauge("chatbot_jobs_stored", "Chat jobs remembered, including finished ones awaiting collection.", lambda: job_queue.stored)
+
+# Bounded pool answering the questions of /chat/batch requests concurrently
+batch_executor = ThreadPoolExecutor(max_workers=config.BATCH_MAX_WORKERS, thread_name_prefix="chat-batch")
+
+# The web UI, loaded and pre-compressed once at startup
+static_assets = StaticAssets(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), config.STATIC_DIR),
+    max_age=config.STATIC_MAX_AGE
+)
+
+@app.before_request
+def _start_timer():
+    """Remember when the request started for latency metrics."""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    """Count the request and record its latency."""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_requests.inc(endpoint=endpoint, status=response.status_code)
+    if 'request_started' in g:
+        metrics.request_latency.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    return response
+
 @app.route('/')
 def index():
-    """Render the main chat interface."""
-    return render_template('index.html')
+    """Serve the main chat interface."""
+    return _serve_asset('index.html')
+
+@app.route('/static/<path:filename>')
+def static_file(filename):
+    """Serve a file from the static asset directory."""
+    return _serve_asset(filename)
+
+def _serve_asset(name):
+    """Send the best pre-compressed representation of an asset the client accepts, or 304 if it has it."""
+    asset = static_assets.get(name)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    
+    coding, variant = static_assets.negotiate(asset, request.headers.get('Accept-Encoding', ''))
+    headers = {
+        'ETag': variant.etag,
+        'Cache-Control': static_assets.cache_control,
+        'Vary': 'Accept-Encoding'
+    }
+    if coding != 'identity':
+        headers['Content-Encoding'] = coding
+    if etag_matches(request.headers.get('If-None-Match', ''), variant.etag):
+        return Response(status=304, headers=headers)
+    return Response(variant.body, content_type=asset.mimetype, headers=headers)
+
+def _get_chat_message():
+    """
+    Validate the JSON body of a chat request.
+    
+    Returns:
+        tuple: (message, None) on success, or (None, error response) on failure
+    """
+    if not request.is_json:
+        logger.error("Request is not JSON")
+        return None, (jsonify({'error': 'Content-Type must be application/json'}), 400)
+        
+    data = request.get_json()
+    
+    if not data:
+        logger.error("No JSON data provided")
+        return None, (jsonify({'error': 'No JSON data provided'}), 400)
+        
+    if 'message' not in data:
+        logger.error("No message field in request")
+        return None, (jsonify({'error': 'No message field provided'}), 400)
+    
+    user_message = data['message']
+    if not isinstance(user_message, str):
+        logger.error("Message is not a string: %s", type(user_message))
+        return None, (jsonify({'error': 'Message must be a string'}), 400)
+        
+    user_message = user_message.strip()
+    if not user_message:
+        logger.error("Empty message received")
+        return None, (jsonify({'error': 'Empty message'}), 400)
+    
+    return user_message, None
+
+def _get_session_id():
+    """Return the session id sent by the client, or a new one if it sent none."""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id')
+    if isinstance(session_id, str) and 0 < len(session_id) <= 64:
+        return session_id
+    return session_store.new_session_id()
+
+def _client_id():
+    """Identify the client for rate limiting."""
+    if config.TRUST_PROXY_HEADERS and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+def _is_emergency():
+    """Check whether a chat request will be answered locally with emergency guidance."""
+    if not config.TRIAGE_ENABLED or config.TRIAGE_FOLLOW_UP:
+        return False
+    message = (request.get_json(silent=True) or {}).get('message')
+    return isinstance(message, str) and triage_engine.match(message) is not None
+
+def admission_control(view):
+    """Admit a request through the admission controller, or fail fast with 429/503."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Emergency guidance needs no upstream call, so it never waits behind one
+        if _is_emergency():
+            return view(*args, **kwargs)
+        
+        try:
+            admission.acquire(_client_id())
+        except AdmissionRejected as e:
+            logger.warning("Request rejected with %s: %s", e.status, e.message)
+            return jsonify({
+                'error': e.message,
+                'status': 'error'
+            }), e.status, {'Retry-After': str(e.retry_after)}
+        
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            admission.release()
+            raise
+        # Hold the slot until the body, which may be streamed, has been sent
+        response.call_on_close(admission.release)
+        return response
+    return wrapper
 
 @app.route('/chat', methods=['POST'])
+@admission_control
 def chat():
     """Handle chat messages and return AI responses."""
     try:
-        logger.info(f"Chat endpoint called with method: {request.method}")
-        logger.info(f"Request headers: {dict(request.headers)}")
+        logger.debug("Chat endpoint called with method: %s", request.method)
+        # Header and body dumps are built only for sampled requests
+        if should_log_payload():
+            payload_logger.info("Request headers: %s", dict(request.headers))
+            payload_logger.info("Request data: %s", request.get_json(silent=True))
         
         # Validate request
-        if not request.is_json:
-            logger.error("Request is not JSON")
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-            
-        data = request.get_json()
-        logger.info(f"Request data: {data}")
-        
-        if not data:
-            logger.error("No JSON data provided")
-            return jsonify({'error': 'No JSON data provided'}), 400
-            
-        if 'message' not in data:
-            logger.error("No message field in request")
-            return jsonify({'error': 'No message field provided'}), 400
-        
-        user_message = data['message']
-        if not isinstance(user_message, str):
-            logger.error(f"Message is not a string: {type(user_message)}")
-            return jsonify({'error': 'Message must be a string'}), 400
-            
-        user_message = user_message.strip()
-        if not user_message:
-            logger.error("Empty message received")
-            return jsonify({'error': 'Empty message'}), 400
+        user_message, error_response = _get_chat_message()
+        if error_response:
+            return error_response
+        
+        session_id = _get_session_id()
         
         # Log the request
-        logger.info(f"Processing chat request: {user_message[:100]}...")
+        log_payload("Processing chat request: %s...", user_message[:100])
         
         # Get AI response
-        ai_response = get_healthcare_response(user_message)
+        ai_response = get_healthcare_response(user_message, session_id)
         
-        logger.info(f"Generated response: {ai_response[:100]}...")
+        log_payload("Generated response: %s...", ai_response[:100])
         
         response_data = {
             'reply': ai_response,
-            'status': 'success'
+            'status': 'success',
+            'session_id': session_id
         }
         
-        logger.info(f"Returning response: {response_data}")
+        log_payload("Returning response: %s", response_data)
         return jsonify(response_data)
         
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}", exc_info=True)
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
         return jsonify({
             'error': 'Internal server error',
             'status': 'error'
         }), 500
 
+def _sse_event(payload: dict) -> str:
+    """Format a payload as a single Server-Sent Events message."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+@admission_control
+def chat_stream():
+    """Stream AI responses to the client as Server-Sent Events."""
+    try:
+        user_message, error_response = _get_chat_message()
+        if error_response:
+            return error_response
+        
+        session_id = _get_session_id()
+        
+        log_payload("Processing streaming chat request: %s...", user_message[:100])
+        
+        def generate():
+            try:
+                for delta in stream_healthcare_response(user_message, session_id):
+                    yield _sse_event({'delta': delta})
+                yield _sse_event({'status': 'success', 'done': True, 'session_id': session_id})
+            except Exception as e:
+                logger.error("Error while streaming response: %s", e, exc_info=True)
+                yield _sse_event({'error': 'Internal server error', 'status': 'error', 'done': True})
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        logger.error("Error in chat stream endpoint: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Internal server error',
+            'status': 'error'
+        }), 500
+
+def _get_batch_messages():
+    """
+    Validate every message of a batch request up front.
+    
+    Returns:
+        tuple: (messages, None) on success, or (None, error response) on failure
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('messages'), list):
+        return None, (jsonify({'error': 'Body must be a JSON object with a "messages" list'}), 400)
+    
+    messages = data['messages']
+    if not messages:
+        return None, (jsonify({'error': 'No messages provided'}), 400)
+    if len(messages) > config.BATCH_MAX_MESSAGES:
+        return None, (jsonify({'error': f'At most {config.BATCH_MAX_MESSAGES} messages per batch'}), 400)
+    
+    errors = []
+    for index, message in enumerate(messages):
+        if not isinstance(message, str) or not message.strip():
+            errors.append({'index': index, 'error': 'Message must be a non-empty string'})
+        elif len(message.strip()) > config.MAX_MESSAGE_LENGTH:
+            errors.append({'index': index, 'error': f'Message is longer than {config.MAX_MESSAGE_LENGTH} characters'})
+    if errors:
+        return None, (jsonify({'error': 'Invalid messages', 'errors': errors}), 400)
+    
+    return [message.strip() for message in messages], None
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of messages concurrently, streaming one NDJSON line per message as each finishes."""
+    messages, error_response = _get_batch_messages()
+    if error_response:
+        return error_response
+    
+    # Identical questions are answered once and reported for every position they appear at
+    positions = {}
+    for index, message in enumerate(messages):
+        positions.setdefault(message, []).append(index)
+    logger.info("Batch of %d messages (%d unique)", len(messages), len(positions))
+    
+    # Each unique message is a chat of its own: charge the client's rate limit for all of them,
+    # and let every worker take a slot like /chat rather than holding one for the whole batch
+    if admission.max_cost is not None and len(positions) > admission.max_cost:
+        return jsonify({
+            'error': f'At most {admission.max_cost} different messages per batch',
+            'status': 'error'
+        }), 400
+    try:
+        admission.charge(_client_id(), len(positions))
+    except AdmissionRejected as e:
+        logger.warning("Batch rejected with %s: %s", e.status, e.message)
+        return jsonify({
+            'error': e.message,
+            'status': 'error'
+        }), e.status, {'Retry-After': str(e.retry_after)}
+    
+    futures = {batch_executor.submit(_answer_admitted, message): message for message in positions}
+    
+    def generate():
+        failed = 0
+        try:
+            for future in as_completed(futures):
+                message = futures[future]
+                try:
+                    reply = future.result()
+                    # The chat pipeline reports backend failures as an error message in place of a reply
+                    if is_error_reply(reply):
+                        result = {'error': reply, 'status': 'error'}
+                        failed += len(positions[message])
+                    else:
+                        result = {'reply': reply, 'status': 'success'}
+                except Exception as e:
+                    logger.error("Error answering batch message: %s", e, exc_info=True)
+                    result = {'error': 'Internal server error', 'status': 'error'}
+                    failed += len(positions[message])
+                for index in positions[message]:
+                    yield json.dumps({'index': index, **result}) + '\n'
+            yield json.dumps({'done': True, 'count': len(messages), 'unique': len(positions), 'errors': failed}) + '\n'
+        finally:
+            # Stop work nobody will read if the client went away
+            for future in futures:
+                future.cancel()
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/chat/jobs', methods=['POST'])
+@admission_control
+def create_chat_job():
+    """Queue a chat message to be answered in the background and return its job id at once."""
+    user_message, error_response = _get_chat_message()
+    if error_response:
+        return error_response
+    
+    session_id = _get_session_id()
+    try:
+        job = job_queue.submit(user_message, session_id)
+    except JobQueueFull as e:
+        logger.warning("Chat job rejected: %s", e)
+        return jsonify({
+            'error': 'Server is busy, please retry shortly',
+            'status': 'error'
+        }), 503, {'Retry-After': '5'}
+    
+    log_payload("Queued chat job %s: %s...", job.id, user_message[:100])
+    return jsonify(job.to_dict()), 202, {'Location': f'/chat/jobs/{job.id}'}
+
+@app.route('/chat/jobs/<job_id>')
+def get_chat_job(job_id):
+    """Report a chat job's status and reply, optionally waiting up to ?wait= seconds for it to finish."""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = -1.0
+    if not wait >= 0:
+        return jsonify({'error': 'wait must be a non-negative number of seconds'}), 400
+    wait = min(wait, config.JOB_MAX_WAIT)
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
+    # Long-poll: hold the request until the reply is ready rather than have the client poll
+    if wait and not job.finished:
+        job.wait(wait)
+    
+    if not job.finished:
+        return jsonify(job.to_dict()), 202, {'Retry-After': '1'}
+    return jsonify(job.to_dict())
+
+@app.route('/export')
+def export_transcript():
+    """Download a session's transcript as plain text, Markdown or JSON Lines, streamed in chunks."""
+    fmt = request.args.get('format', 'txt')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(FORMATS)}"}), 400
+    
+    session_id = request.args.get('session_id', '')
+    chunks = session_store.export(session_id, fmt) if session_id else None
+    if chunks is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    
+    return Response(
+        stream_with_context(chunks),
+        content_type=FORMATS[fmt].mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=healthcare_chat_history.{FORMATS[fmt].extension}',
+            'Cache-Control': 'no-store'
+        }
+    )
+
+@app.route('/history')
+def history():
+    """Return a session's most recent turns, oldest first."""
+    session_id = request.args.get('session_id', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    turns = session_store.history(session_id, limit) if session_id else []
+    return jsonify({
+        'session_id': session_id,
+        'total_turns': session_store.turn_count(session_id) if session_id else 0,
+        'turns': turns
+    })
+
 @app.route('/health')
 def health_check():
     """Health check endpoint."""
     return jsonify({'status': 'healthy', 'service': 'healthcare-chatbot'})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/test')
 def test_endpoint():
     """Test endpoint for debugging."""
@@ -110,7 +477,7 @@ if __name__ == '__main__':
     # Get Flask configuration
     flask_config = config.get_flask_config()
     
-    logger.info(f"Starting Flask app on {flask_config['host']}:{flask_config['port']} (debug={flask_config['debug']})")
+    logger.info("Starting Flask app on %s:%s (debug=%s)", flask_config['host'], flask_config['port'], flask_config['debug'])
     app.run(
         debug=flask_config['debug'], 
         host=flask_config['host'], 
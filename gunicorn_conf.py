@@ -0,0 +1,117 @@
+"""
+Gunicorn configuration for Healthcare Chatbot
+This module sizes the production server from the CPU count and the share of each chat
+request spent waiting on the upstream model, and aligns its timeouts with OPENAI_TIMEOUT.
+
+Usage: gunicorn -c gunicorn_conf.py flask_app:app
+"""
+
+import importlib.util
+import math
+import os
+# Renamed because gunicorn treats a module-level "config" as its own setting
+from config import config as app_config
+
+def choose_worker_class(requested: str, wait_ratio: float) -> str:
+    """
+    Pick the gunicorn worker class.
+    
+    Args:
+        requested (str): "auto", or an explicit class such as "gthread", "gevent" or "sync"
+        wait_ratio (float): Fraction of a request's time spent waiting on the upstream
+        
+    Returns:
+        str: Worker class name
+    """
+    if requested != "auto":
+        return requested
+    # Greenlets only pay off when requests are almost entirely waiting, and need gevent installed
+    if wait_ratio >= 0.95 and importlib.util.find_spec("gevent"):
+        return "gevent"
+    return "gthread"
+
+def size_workers(worker_class: str, cpus: int, wait_ratio: float) -> tuple:
+    """
+    Size the worker processes and the threads in each.
+    
+    While a request waits on the upstream its CPU is free for others, so each core can
+    keep about 1 / (1 - wait_ratio) requests busy.
+    
+    Args:
+        worker_class (str): Gunicorn worker class
+        cpus (int): Available CPU cores
+        wait_ratio (float): Fraction of a request's time spent waiting on the upstream
+        
+    Returns:
+        tuple: (workers, threads per worker)
+    """
+    cpus = max(1, cpus)
+    if worker_class == "sync":
+        return 2 * cpus + 1, 1
+    
+    per_core = 1 / max(1 - min(wait_ratio, 0.99), 0.01)
+    threads = min(64, max(2, math.ceil(round(per_core, 6))))
+    return cpus + 1, threads
+
+def conversation_db_path(configured: str, workers: int) -> str:
+    """
+    Pick the conversation database for the server.
+    
+    Workers share nothing in memory, so with more than one, consecutive requests of a
+    conversation would each see only part of its history; they get a shared database
+    outside the source tree unless CONVERSATION_DB_PATH names one.
+    
+    Args:
+        configured (str): CONVERSATION_DB_PATH, possibly empty
+        workers (int): Worker processes
+        
+    Returns:
+        str: Database path, or empty to keep history in process memory
+    """
+    if configured or workers <= 1:
+        return configured
+    return os.path.join(os.path.expanduser("~"), ".healthcare-chatbot", "conversations.db")
+
+worker_class = choose_worker_class(app_config.GUNICORN_WORKER_CLASS, app_config.UPSTREAM_WAIT_RATIO)
+auto_workers, auto_threads = size_workers(worker_class, os.cpu_count() or 1, app_config.UPSTREAM_WAIT_RATIO)
+
+bind = f"{app_config.FLASK_HOST}:{app_config.FLASK_PORT}"
+workers = app_config.GUNICORN_WORKERS or auto_workers
+threads = app_config.GUNICORN_THREADS or auto_threads
+worker_connections = app_config.GUNICORN_WORKER_CONNECTIONS
+
+# Set before the preloaded app builds its session store and job queue
+default_db_path = not app_config.CONVERSATION_DB_PATH
+app_config.CONVERSATION_DB_PATH = conversation_db_path(app_config.CONVERSATION_DB_PATH, workers)
+
+# Build the app, the backends and their connection pools once, before forking workers
+preload_app = True
+
+# A request can wait for the upstream call and one failover; give it that long before a
+# worker is considered hung, and let in-flight chats finish on restart
+timeout = app_config.GUNICORN_TIMEOUT or 2 * app_config.OPENAI_TIMEOUT + 10
+graceful_timeout = app_config.GUNICORN_GRACEFUL_TIMEOUT or app_config.OPENAI_TIMEOUT + 5
+keepalive = app_config.GUNICORN_KEEPALIVE
+
+max_requests = app_config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+if worker_class == "gevent":
+    # Patch before the preloaded app imports ssl, sockets and threading
+    from gevent import monkey
+    monkey.patch_all()
+
+def when_ready(server):
+    """Build the backend clients in the preloaded app, then log the chosen server layout."""
+    import chatbot
+    chatbot.warm_up()
+    
+    server.log.info(
+        "Serving with %d %s worker(s) x %d thread(s), timeout %ss, graceful timeout %ss",
+        workers, worker_class, 1 if worker_class in ("sync", "gevent") else threads, timeout, graceful_timeout
+    )
+    if default_db_path and app_config.CONVERSATION_DB_PATH:
+        server.log.warning(
+            "CONVERSATION_DB_PATH is not set; the %d workers share conversations and chat jobs through %s",
+            workers, app_config.CONVERSATION_DB_PATH
+        )
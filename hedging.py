@@ -0,0 +1,181 @@
+"""
+Request hedging for Healthcare Chatbot
+This module cuts tail latency by sending a second, identical upstream call when the first
+one is slower than usual, using whichever answers first.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, TimeoutError as FutureTimeout, wait
+from typing import Awaitable, Callable, Optional
+
+import metrics
+
+hedges_fired = metrics.registry.register(metrics.Counter(
+    "chatbot_hedges_fired_total", "Hedged upstream calls sent because the first call was slow.", ("backend",)
+))
+hedges_won = metrics.registry.register(metrics.Counter(
+    "chatbot_hedges_won_total", "Hedged upstream calls that answered before the original call.", ("backend",)
+))
+
+class Hedger:
+    """Decide when to hedge calls to one backend, and run hedged calls."""
+    
+    def __init__(self, name: str, executor: Executor, delay: float = 0.0, percentile: float = 95.0,
+                 max_ratio: float = 0.1, min_samples: int = 20, window: int = 200):
+        """
+        Args:
+            name (str): Backend name used in metrics
+            executor (Executor): Runs blocking calls so they can be raced
+            delay (float): Seconds to wait before hedging; 0 uses the adaptive percentile
+            percentile (float): Percentile of recent latency to wait for when delay is 0
+            max_ratio (float): Maximum hedged calls per request, e.g. 0.1 for 10%
+            min_samples (int): Latency samples needed before the adaptive delay is used
+            window (int): Number of recent latency samples kept
+        """
+        self.name = name
+        self.executor = executor
+        self.delay = delay
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        # Hedges accrue max_ratio of a token per request, so over any window no more than
+        # max_ratio of requests are hedged
+        self._budget = 0.0
+        self._budget_cap = max(1.0, max_ratio * window)
+        self._lock = threading.Lock()
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if calls should not be hedged yet."""
+        if self.max_ratio <= 0:
+            return None
+        if self.delay > 0:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            samples = sorted(self._latencies)
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+    
+    def _admit(self) -> Optional[float]:
+        """Account for a new request and return its hedge delay, if any."""
+        with self._lock:
+            self._budget = min(self._budget_cap, self._budget + self.max_ratio)
+        return self.hedge_delay()
+    
+    def _take_budget(self) -> bool:
+        """Spend one hedge from the budget, if the hedge ratio allows it."""
+        with self._lock:
+            if self._budget < 1.0:
+                return False
+            self._budget -= 1.0
+            return True
+    
+    def _observe(self, started: float):
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+    
+    def call(self, fn: Callable[[], str]) -> str:
+        """
+        Run fn, running a second copy if the first has not finished within the hedge delay.
+        
+        The slower call is cancelled if it has not started; a call that is already running
+        cannot be interrupted, so its result is discarded.
+        
+        Args:
+            fn (callable): Makes the upstream call
+            
+        Returns:
+            str: The result of whichever call succeeded first
+        """
+        delay = self._admit()
+        started = time.perf_counter()
+        if delay is None:
+            result = fn()
+            self._observe(started)
+            return result
+        
+        primary = self.executor.submit(fn)
+        try:
+            result = primary.result(timeout=delay)
+            self._observe(started)
+            return result
+        except FutureTimeout:
+            pass
+        
+        if not self._take_budget():
+            result = primary.result()
+            self._observe(started)
+            return result
+        
+        hedges_fired.inc(backend=self.name)
+        hedge = self.executor.submit(fn)
+        starts = {primary: started, hedge: time.perf_counter()}
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        hedges_won.inc(backend=self.name)
+                    self._observe(starts[future])
+                    return future.result()
+        raise error
+    
+    async def call_async(self, fn: Callable[[], Awaitable[str]]) -> str:
+        """
+        Await fn, starting a second copy if the first has not finished within the hedge delay.
+        
+        The slower call is cancelled as soon as one succeeds.
+        
+        Args:
+            fn (callable): Returns an awaitable that makes the upstream call
+            
+        Returns:
+            str: The result of whichever call succeeded first
+        """
+        delay = self._admit()
+        started = time.perf_counter()
+        if delay is None:
+            result = await fn()
+            self._observe(started)
+            return result
+        
+        primary = asyncio.ensure_future(fn())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._take_budget():
+                result = await primary
+                self._observe(started)
+                return result
+            
+            hedges_fired.inc(backend=self.name)
+            hedge = asyncio.ensure_future(fn())
+            tasks.append(hedge)
+            starts = {primary: started, hedge: time.perf_counter()}
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge:
+                            hedges_won.inc(backend=self.name)
+                        self._observe(starts[task])
+                        return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
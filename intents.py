@@ -0,0 +1,309 @@
+"""
+Offline intent engine for Healthcare Chatbot
+This module answers greetings, thanks and capability questions locally, and provides
+canned answers for common health topics when the OpenAI API is unavailable.
+"""
+
+from collections import deque
+from typing import List, Optional, Tuple
+from cache import normalize_query
+
+# Intents in priority order: when several match, the earliest entry wins.
+# Small-talk intents may be answered without calling the model at all;
+# topic intents are only used as a fallback when the model is unavailable.
+INTENTS = [
+    {
+        "name": "headache",
+        "keywords": ["headache", "headaches", "head pain"],
+        "response": "For headaches, try resting in a dark room, applying a cold compress, and staying hydrated. If headaches persist or are severe, consult a healthcare professional."
+    },
+    {
+        "name": "fever",
+        "keywords": ["fever", "temperature"],
+        "response": "For fever management, rest, stay hydrated, and monitor your temperature. If fever is high (>103°F) or persists, seek medical attention."
+    },
+    {
+        "name": "cold",
+        "keywords": ["cold", "colds", "cough", "coughing"],
+        "response": "For cold symptoms, rest, drink fluids, use a humidifier, and consider over-the-counter remedies. If symptoms worsen, consult a doctor."
+    },
+    {
+        "name": "stomach",
+        "keywords": ["stomach", "nausea", "nauseous"],
+        "response": "For stomach issues, try bland foods, stay hydrated, and avoid spicy or fatty foods. If symptoms are severe or persistent, seek medical advice."
+    },
+    {
+        "name": "sleep",
+        "keywords": ["sleep", "insomnia"],
+        "response": "For better sleep, maintain a regular schedule, avoid screens before bed, and create a comfortable sleep environment. If sleep problems persist, consult a healthcare provider."
+    },
+    {
+        "name": "exercise",
+        "keywords": ["exercise", "fitness"],
+        "response": "Regular exercise is important for health. Start slowly, choose activities you enjoy, and aim for at least 150 minutes of moderate activity per week."
+    },
+    {
+        "name": "diet",
+        "keywords": ["diet", "nutrition"],
+        "response": "A balanced diet with fruits, vegetables, lean proteins, and whole grains supports good health. Stay hydrated and limit processed foods."
+    },
+    {
+        "name": "stress",
+        "keywords": ["stress", "stressed", "anxiety", "anxious"],
+        "response": "For stress management, try deep breathing, meditation, regular exercise, and maintaining social connections. If stress becomes overwhelming, consider professional help."
+    },
+    {
+        "name": "tropical_disease",
+        "keywords": ["malaria", "dengue", "typhoid"],
+        "response": "For serious conditions like malaria, dengue, or typhoid, immediate medical attention is crucial. These conditions require proper diagnosis and treatment from healthcare professionals. Please consult a doctor right away."
+    },
+    {
+        "name": "diabetes",
+        "keywords": ["diabetes", "diabetic", "blood sugar"],
+        "response": "For diabetes management, monitor blood sugar levels regularly, follow a balanced diet, exercise regularly, and take medications as prescribed. Always consult your healthcare provider for personalized advice."
+    },
+    {
+        "name": "blood_pressure",
+        "keywords": ["blood pressure", "hypertension"],
+        "response": "For blood pressure management, maintain a low-sodium diet, exercise regularly, manage stress, limit alcohol, and take medications as prescribed. Regular monitoring and medical follow-up are important."
+    },
+    {
+        "name": "covid",
+        "keywords": ["covid", "covid 19", "coronavirus"],
+        "response": "For COVID-19 concerns, follow current health guidelines, practice good hygiene, wear masks when recommended, and get vaccinated. If you have symptoms, isolate and consult healthcare providers."
+    },
+    {
+        "name": "cancer",
+        "keywords": ["cancer", "tumor", "tumour"],
+        "response": "For cancer-related concerns, early detection and professional medical care are essential. Please consult with healthcare specialists for proper diagnosis, treatment options, and ongoing care."
+    },
+    {
+        "name": "heart",
+        "keywords": ["heart", "cardiac"],
+        "response": "For heart-related concerns, maintain a heart-healthy diet, exercise regularly, avoid smoking, manage stress, and monitor cholesterol. Any chest pain or heart symptoms require immediate medical attention."
+    },
+    {
+        "name": "pregnancy",
+        "keywords": ["pregnancy", "pregnant"],
+        "response": "For pregnancy-related questions, regular prenatal care is essential. Follow your doctor's recommendations for nutrition, exercise, and medications. Always consult your obstetrician for personalized guidance."
+    },
+    {
+        "name": "allergy",
+        "keywords": ["allergy", "allergies", "allergic"],
+        "response": "For allergies, identify and avoid triggers, carry emergency medications if prescribed, and consider allergy testing. Severe allergic reactions require immediate medical attention."
+    },
+    {
+        "name": "skin",
+        "keywords": ["skin", "rash", "acne"],
+        "response": "For skin concerns, maintain good hygiene, use gentle cleansers, protect from sun exposure, and avoid picking at skin. Persistent or severe skin issues should be evaluated by a dermatologist."
+    },
+    {
+        "name": "back_pain",
+        "keywords": ["back pain", "backache"],
+        "response": "For back pain, try gentle stretching, apply heat or cold packs, maintain good posture, and avoid heavy lifting. If pain is severe or persistent, consult a healthcare provider."
+    },
+    {
+        "name": "joint_pain",
+        "keywords": ["joint pain", "arthritis"],
+        "response": "For joint pain, gentle exercise, maintaining healthy weight, and anti-inflammatory foods can help. If pain is severe or affects daily activities, consult a healthcare provider."
+    },
+    {
+        "name": "greeting",
+        "keywords": ["hello", "hi", "hii", "hey", "good morning", "good afternoon", "good evening"],
+        "response": "Hello! 👋 I'm your AI healthcare assistant. I can help with health questions, symptoms, wellness tips, and general medical information. What health topic would you like to discuss?",
+        "smalltalk": True
+    },
+    {
+        "name": "how_are_you",
+        "keywords": ["how are you", "how do you do"],
+        "response": "I'm doing well, thank you for asking! I'm here and ready to help with any health-related questions you might have. What can I assist you with today?",
+        "smalltalk": True
+    },
+    {
+        "name": "capabilities",
+        "keywords": ["what can you do", "what can you help with"],
+        "response": "I can help with various health topics including: symptom analysis, wellness advice, nutrition guidance, exercise tips, mental health support, and general medical information. Just ask me anything health-related!",
+        "smalltalk": True
+    },
+    {
+        "name": "help",
+        "keywords": ["help", "support"],
+        "response": "I'm here to help! You can ask me about symptoms, health conditions, wellness tips, nutrition advice, exercise recommendations, or any other health-related questions. What would you like to know?",
+        "smalltalk": True
+    },
+    {
+        "name": "thanks",
+        "keywords": ["thank you", "thank", "thanks"],
+        "response": "You're very welcome! 😊 I'm happy to help with your health questions. Feel free to ask me anything else about health, wellness, or medical topics.",
+        "smalltalk": True
+    },
+    {
+        "name": "pain",
+        "keywords": ["pain", "hurt", "hurts", "ache", "aches"],
+        "response": "For pain management, rest the affected area, apply heat or cold packs, and consider over-the-counter pain relievers. If pain is severe or persistent, please consult a healthcare provider for proper evaluation."
+    },
+    {
+        "name": "symptoms",
+        "keywords": ["symptom", "symptoms", "feel", "sick"],
+        "response": "I understand you're experiencing symptoms. It's important to monitor your symptoms and seek medical attention if they worsen or persist. For specific health concerns, please consult with a healthcare professional."
+    },
+    {
+        "name": "medication",
+        "keywords": ["medicine", "medication", "medications", "drug", "drugs"],
+        "response": "For medication-related questions, always consult with your healthcare provider or pharmacist. They can provide guidance on proper usage, side effects, and interactions with other medications."
+    },
+    {
+        "name": "healthcare_services",
+        "keywords": ["doctor", "hospital", "clinic"],
+        "response": "For medical appointments and healthcare services, contact your local healthcare providers. They can provide proper diagnosis, treatment, and ongoing care for your health concerns."
+    }
+]
+
+# Small talk is answered locally only if every word besides its keywords is filler,
+# and there are at most this many of them; "help with depression" needs the model
+SMALLTALK_MAX_EXTRA_WORDS = 4
+
+SMALLTALK_FILLER = frozenset("""
+a all again bot can could doc everyone for good great guys i just lot me much my need oh ok okay
+please really so some the there to very well you your
+""".split())
+
+DEGRADED_NOTICE = "(Our AI service is temporarily unavailable, so this is a general answer.)"
+
+def _word_offsets(text: str) -> List[Tuple[str, int]]:
+    """Split normalized text into (word, start offset) pairs."""
+    offsets = []
+    start = 0
+    for word in text.split(" "):
+        offsets.append((word, start))
+        start += len(word) + 1
+    return offsets
+
+class KeywordMatcher:
+    """Aho-Corasick automaton matching whole-word keywords in a single pass."""
+    
+    def __init__(self, keywords: List[str]):
+        """
+        Args:
+            keywords (list): Normalized keywords; the index of each is reported on a match
+        """
+        self._keywords = keywords
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        
+        for index, keyword in enumerate(keywords):
+            # Pad with spaces so matches only start and end on word boundaries
+            state = 0
+            for char in f" {keyword} ":
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(index)
+        
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """Return (start offset, keyword index) pairs for all keywords found in normalized text."""
+        found = []
+        state = 0
+        for position, char in enumerate(f" {text} "):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                # The padded keyword ends one past its last character
+                found.append((position - len(self._keywords[index]) - 1, index))
+        return found
+
+class IntentEngine:
+    """Match user messages against a keyword table of canned intents."""
+    
+    def __init__(self, intents: List[dict]):
+        """
+        Args:
+            intents (list): Intent definitions in priority order
+        """
+        self.intents = intents
+        self._keywords = []
+        self._keyword_intent = []
+        for priority, intent in enumerate(intents):
+            for keyword in intent["keywords"]:
+                self._keywords.append(normalize_query(keyword))
+                self._keyword_intent.append(priority)
+        self._matcher = KeywordMatcher(self._keywords)
+    
+    def match(self, user_input: str) -> Optional[dict]:
+        """Return the highest-priority intent mentioned in the message, if any."""
+        matches = self._matcher.find(normalize_query(user_input))
+        if not matches:
+            return None
+        return self.intents[min(self._keyword_intent[i] for _, i in matches)]
+    
+    def topics(self, user_input: str) -> List[str]:
+        """Return the distinct health topics (non-small-talk intents) mentioned in the message."""
+        priorities = sorted({self._keyword_intent[i] for _, i in self._matcher.find(normalize_query(user_input))})
+        return [self.intents[p]["name"] for p in priorities if not self.intents[p].get("smalltalk")]
+    
+    def smalltalk_response(self, user_input: str) -> Optional[str]:
+        """
+        Answer a message that is nothing but small talk, such as a greeting or thanks.
+        
+        Returns:
+            str: Canned response, or None if the message needs the model
+        """
+        text = normalize_query(user_input)
+        matches = self._matcher.find(text)
+        if not matches:
+            return None
+        
+        priorities = {self._keyword_intent[i] for _, i in matches}
+        if not all(self.intents[p].get("smalltalk") for p in priorities):
+            return None
+        
+        # Words not covered by any matched keyword mean the user asked something more,
+        # unless they are only filler such as "so much" or "please"
+        covered = set()
+        for start, index in matches:
+            covered.update(range(start, start + len(self._keywords[index])))
+        extra_words = [
+            word for word, start in _word_offsets(text)
+            if start not in covered
+        ]
+        if len(extra_words) > SMALLTALK_MAX_EXTRA_WORDS or not SMALLTALK_FILLER.issuperset(extra_words):
+            return None
+        
+        return self.intents[min(priorities)]["response"]
+    
+    def fallback_response(self, user_input: str) -> Optional[str]:
+        """
+        Answer a message locally while the model is unavailable.
+        
+        Returns:
+            str: Canned response marked as degraded, or None if no intent matches
+        """
+        intent = self.match(user_input)
+        if not intent:
+            return None
+        if intent.get("smalltalk"):
+            return intent["response"]
+        return f"{intent['response']}\n\n{DEGRADED_NOTICE}"
+
+intent_engine = IntentEngine(INTENTS)
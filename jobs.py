@@ -0,0 +1,255 @@
+"""
+Background chat jobs for Healthcare Chatbot
+This module runs long chat requests on a bounded in-process queue and worker pool, so a
+client gets a job id at once and collects the reply later instead of holding a request open.
+With a shared store, job states are also written there so any worker process can report them.
+"""
+
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+import metrics
+
+if TYPE_CHECKING:
+    from store import ConversationStore
+
+logger = logging.getLogger(__name__)
+
+jobs_total = metrics.registry.register(metrics.Counter(
+    "chatbot_jobs_total", "Chat jobs by outcome: success, error, rejected (queue full) or expired.", ("outcome",)
+))
+job_wait = metrics.registry.register(metrics.Histogram(
+    "chatbot_job_wait_seconds", "Time chat jobs spent queued before a worker picked them up."
+))
+
+class JobQueueFull(Exception):
+    """Raised when a job cannot be queued because the queue is full."""
+
+class Job:
+    """One queued chat request and, once finished, its reply or error."""
+    
+    def __init__(self, message: str, session_id: Optional[str]):
+        self.id = secrets.token_urlsafe(16)
+        self.message = message
+        self.session_id = session_id
+        self.status = "queued"
+        self.reply: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+    
+    @property
+    def finished(self) -> bool:
+        """Whether the job has a reply or an error."""
+        return self._done.is_set()
+    
+    def wait(self, timeout: float) -> bool:
+        """Block until the job finishes or the timeout expires; returns whether it finished."""
+        return self._done.wait(timeout)
+    
+    def state(self) -> dict:
+        """Get the job's state as a dictionary for the shared store."""
+        return {
+            "id": self.id, "status": self.status, "session_id": self.session_id, "reply": self.reply,
+            "error": self.error, "created_at": self.created_at, "finished_at": self.finished_at
+        }
+    
+    def to_dict(self) -> dict:
+        """Describe the job for API responses."""
+        result = {"job_id": self.id, "status": self.status, "session_id": self.session_id}
+        if self.reply is not None:
+            result["reply"] = self.reply
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+class StoredJob(Job):
+    """A job accepted by another process, read from the shared store."""
+    
+    def __init__(self, state: dict, load: Callable[[], Optional[dict]], poll_interval: float):
+        """
+        Args:
+            state (dict): The job's state as read from the store
+            load (callable): Reads the job's latest state; None once it has expired
+            poll_interval (float): Seconds between reads while waiting for the job to finish
+        """
+        super().__init__(None, state["session_id"])
+        self._load = load
+        self.poll_interval = poll_interval
+        self._apply(state)
+    
+    def _apply(self, state: dict):
+        self.id, self.status, self.reply, self.error = state["id"], state["status"], state["reply"], state["error"]
+        self.created_at, self.finished_at = state["created_at"], state["finished_at"]
+        if self.finished_at is not None:
+            self._done.set()
+    
+    def wait(self, timeout: float) -> bool:
+        """Poll the store until the job finishes or the timeout expires; returns whether it finished."""
+        deadline = time.monotonic() + timeout
+        while not self.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+            state = self._load()
+            if state is not None:
+                self._apply(state)
+        return True
+
+class JobQueue:
+    """A bounded queue of chat jobs answered by a pool of worker threads."""
+    
+    def __init__(self, handler: Callable[[str, Optional[str]], str], workers: int = 8,
+                 max_queued: int = 1000, ttl: float = 600, max_jobs: int = 10000,
+                 store: Optional["ConversationStore"] = None, poll_interval: float = 0.25):
+        """
+        Args:
+            handler (callable): Answers a (message, session_id) pair
+            workers (int): Jobs answered at once
+            max_queued (int): Jobs that may wait for a worker before new ones are rejected
+            ttl (float): Seconds a finished job's result is kept for collection
+            max_jobs (int): Most finished jobs kept in memory; the oldest are evicted first
+            store (ConversationStore): Shared store job states are written to, so every process
+                serving the app can report them; None keeps them in this process only
+            poll_interval (float): Seconds between store reads while waiting for another process's job
+        """
+        self.handler = handler
+        self.workers = workers
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.store = store
+        self.poll_interval = poll_interval
+        self.running = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Job] = {}
+        # Finish times of finished jobs in the order they finished, so expired ones are at the front
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def _after_fork(self):
+        """Drop the parent's jobs and worker threads in a forked child."""
+        self.running = 0
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+    
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a worker."""
+        return self._queue.qsize()
+    
+    @property
+    def stored(self) -> int:
+        """Jobs remembered, finished or not."""
+        return len(self._jobs)
+    
+    def _ensure_workers(self):
+        """Start the worker threads if they are not running."""
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"chat-job-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def submit(self, message: str, session_id: Optional[str] = None) -> Job:
+        """
+        Queue a chat request.
+        
+        Returns:
+            Job: The queued job
+        
+        Raises:
+            JobQueueFull: If the queue has no room
+        """
+        self._ensure_workers()
+        job = Job(message, session_id)
+        with self._lock:
+            self._evict(time.time())
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                jobs_total.inc(outcome="rejected")
+                raise JobQueueFull("Too many queued jobs") from None
+            self._jobs[job.id] = job
+        self._save(job)
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id, in this process or else in the shared store; None if it is unknown or has expired."""
+        with self._lock:
+            self._evict(time.time())
+            job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        load = partial(self.store.load_job, job_id, self.ttl)
+        state = load()
+        return StoredJob(state, load, self.poll_interval) if state is not None else None
+    
+    def _save(self, job: Job):
+        """Write a job's state to the shared store, if there is one."""
+        if self.store is None:
+            return
+        try:
+            self.store.save_job(job.state(), self.ttl)
+        except Exception:
+            logger.exception("Failed to store the state of chat job %s", job.id)
+    
+    def _evict(self, now: float):
+        """Forget finished jobs past their TTL, oldest first, and any beyond max_jobs. Call with the lock held."""
+        evicted = 0
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < self.ttl and len(self._finished) <= self.max_jobs:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+            evicted += 1
+        if evicted:
+            jobs_total.inc(evicted, outcome="expired")
+    
+    def _run(self):
+        """Worker loop: answer queued jobs one at a time."""
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job_wait.observe(time.time() - job.created_at)
+            with self._lock:
+                self.running += 1
+            self._save(job)
+            try:
+                job.reply = self.handler(job.message, job.session_id)
+                job.status = "success"
+            except Exception as e:
+                logger.error("Error answering chat job %s: %s", job.id, e, exc_info=True)
+                job.error = "Internal server error"
+                job.status = "error"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self.running -= 1
+                    self._finished[job.id] = job.finished_at
+                jobs_total.inc(outcome=job.status)
+                self._save(job)
+                job._done.set()
+                self._queue.task_done()
+    
+    def stats(self) -> Dict[str, int]:
+        """Get job queue statistics as a dictionary."""
+        return {"queued": self.queued, "running": self.running, "stored": self.stored}
@@ -0,0 +1,109 @@
+"""
+Logging pipeline for Healthcare Chatbot
+This module routes log records through a bounded queue to a background thread, so
+formatting and I/O stay off the request path, and controls sampled payload logging.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from config import config
+
+# Logger for request/response payloads (headers, bodies, messages and replies)
+payload_logger = logging.getLogger("healthcare.payload")
+
+_setup_lock = threading.Lock()
+_listener = None
+_handler = None
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that defers formatting to the listener thread and drops records when full."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the traceback now, since frames do not outlive the request,
+        # but leave msg % args to be formatted on the listener thread.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def configure_logging():
+    """Install the queue-based logging pipeline on the root logger (once per process)."""
+    global _listener, _handler
+    
+    with _setup_lock:
+        if _listener is not None:
+            return
+        
+        formatter = JsonFormatter() if config.LOG_JSON else logging.Formatter(config.LOG_FORMAT)
+        handlers = [logging.StreamHandler()]
+        if config.LOG_FILE:
+            handlers.append(logging.FileHandler(config.LOG_FILE, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, config.LOG_LEVEL))
+        _handler = BackgroundQueueHandler(log_queue)
+        root.addHandler(_handler)
+        
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_after_fork)
+
+def _restart_after_fork():
+    """Give a forked child (e.g. a preloaded gunicorn worker) its own queue and writer thread."""
+    global _listener
+    
+    # The parent's writer thread does not survive fork, and its queue may have been locked
+    atexit.unregister(_listener.stop)
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    _handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def should_log_payload() -> bool:
+    """Decide whether to log the payloads of the current request, honouring the sample rate."""
+    if not config.LOG_PAYLOADS or not payload_logger.isEnabledFor(logging.INFO):
+        return False
+    return config.LOG_PAYLOAD_SAMPLE_RATE >= 1 or random.random() < config.LOG_PAYLOAD_SAMPLE_RATE
+
+def log_payload(msg: str, *args):
+    """Log a payload message through the payload logger, subject to sampling."""
+    if should_log_payload():
+        payload_logger.info(msg, *args)
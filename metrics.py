@@ -0,0 +1,146 @@
+"""
+Metrics for Healthcare Chatbot
+This module records request counts, latency histograms, token usage and error counts,
+and renders them in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {name="value",...}."""
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        """Increase the counter for the given label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def collect(self) -> List[str]:
+        """Render the counter as exposition lines."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """Observations counted into cumulative buckets, optionally split by labels."""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        """Record one observation for the given label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+    
+    def collect(self) -> List[str]:
+        """Render the histogram as exposition lines."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class GaugeFunction:
+    """A gauge whose current values are read from a callback at collection time."""
+    
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+    
+    def collect(self) -> List[str]:
+        """Render the gauge as exposition lines."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.fn()}"
+        ]
+
+class Registry:
+    """A collection of metrics rendered together."""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric):
+        """Add a metric, replacing any earlier metric with the same name."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def gauge(self, name: str, documentation: str, fn: Callable[[], float]):
+        """Register a callback gauge."""
+        return self.register(GaugeFunction(name, documentation, fn))
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "chatbot_http_requests_total", "HTTP requests by endpoint and status code.", ("endpoint", "status")
+))
+request_latency = registry.register(Histogram(
+    "chatbot_request_latency_seconds", "End-to-end request latency by endpoint.", ("endpoint",)
+))
+upstream_latency = registry.register(Histogram(
+    "chatbot_upstream_latency_seconds", "Latency of upstream chat completion calls.", ("backend", "mode")
+))
+route_latency = registry.register(Histogram(
+    "chatbot_route_latency_seconds", "Latency of model answers by routing tier.", ("tier",)
+))
+upstream_tokens = registry.register(Counter(
+    "chatbot_upstream_tokens_total", "Tokens reported by OpenAI usage, by kind.", ("kind",)
+))
+upstream_errors = registry.register(Counter(
+    "chatbot_upstream_errors_total", "Failed OpenAI calls by exception class.", ("error",)
+))
@@ -0,0 +1,107 @@
+"""
+Resumable reply streams for Healthcare Chatbot
+This module buffers the chunks of replies sent over the WebSocket channel, so a client
+that reconnects mid-answer can pick up from the last chunk it received.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+
+class ReplyStream:
+    """The chunks of one reply, readable from any offset while it is still being generated."""
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        # Replaced on every change, so each waiting reader wakes exactly once per change
+        self._changed = asyncio.Event()
+    
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    def append(self, delta: str):
+        """Add the next chunk of the reply."""
+        self.chunks.append(delta)
+        self._notify()
+    
+    def finish(self, error: Optional[str] = None):
+        """Mark the reply complete, or failed with an error message."""
+        self.done = True
+        self.error = error
+        self.finished_at = time.time()
+        self._notify()
+    
+    async def follow(self, offset: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Yield (sequence number, chunk) pairs from an offset until the reply is complete.
+        
+        Args:
+            offset (int): Number of chunks the reader already has
+        """
+        while True:
+            changed = self._changed
+            while offset < len(self.chunks):
+                yield offset, self.chunks[offset]
+                offset += 1
+            if self.done:
+                return
+            await changed.wait()
+
+class ReplyRegistry:
+    """Reply streams by key, kept for a while after they finish so clients can resume them; used from the event loop only."""
+    
+    def __init__(self, ttl: float = 120, max_replies: int = 10000):
+        """
+        Args:
+            ttl (float): Seconds a finished reply can still be resumed
+            max_replies (int): Most finished replies kept; the oldest are evicted first
+        """
+        self.ttl = ttl
+        self.max_replies = max_replies
+        self._replies: Dict[Hashable, ReplyStream] = {}
+        # Finish times of finished replies in the order they finished, so expired ones are at the front
+        self._finished: "OrderedDict[Hashable, float]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._replies)
+    
+    def start(self, key: Hashable, session_id: str) -> Tuple[ReplyStream, bool]:
+        """
+        Get the reply stream for a key, creating it if it is new.
+        
+        Returns:
+            tuple: (stream, True if it was created and still has to be generated)
+        """
+        self._evict(time.time())
+        reply = self._replies.get(key)
+        if reply is not None:
+            return reply, False
+        reply = self._replies[key] = ReplyStream(session_id)
+        return reply, True
+    
+    def finish(self, key: Hashable, error: Optional[str] = None):
+        """Complete a reply and start its resume window."""
+        reply = self._replies.get(key)
+        if reply is not None:
+            reply.finish(error)
+            self._finished[key] = reply.finished_at
+    
+    def get(self, key: Hashable) -> Optional[ReplyStream]:
+        """Look up a reply stream; None if it is unknown or has expired."""
+        self._evict(time.time())
+        return self._replies.get(key)
+    
+    def _evict(self, now: float):
+        """Forget finished replies past their TTL, oldest first, and any beyond max_replies."""
+        while self._finished:
+            key, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < self.ttl and len(self._finished) <= self.max_replies:
+                break
+            self._finished.popitem(last=False)
+            self._replies.pop(key, None)
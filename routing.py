@@ -0,0 +1,85 @@
+"""
+Query routing for Healthcare Chatbot
+This module classifies each question by cheap local features and picks the model tier
+and output token cap used to answer it, so simple questions get fast, short answers.
+"""
+
+from typing import Dict, NamedTuple, Optional
+from cache import normalize_query
+from intents import intent_engine
+
+TIERS = ("simple", "standard", "complex")
+
+class QueryFeatures(NamedTuple):
+    """Cheap signals of how much a question asks for."""
+    words: int
+    symptom_terms: int
+    questions: int
+    
+    @property
+    def symptom_density(self) -> float:
+        """Fraction of the words that name a health topic or symptom."""
+        return self.symptom_terms / self.words if self.words else 0.0
+
+class Route(NamedTuple):
+    """The tier chosen for a question and the settings used to answer it."""
+    tier: str
+    max_tokens: int
+    features: QueryFeatures
+
+def extract_features(user_input: str) -> QueryFeatures:
+    """Measure a question's length, health topics mentioned and number of questions asked."""
+    return QueryFeatures(
+        words=len(normalize_query(user_input).split()),
+        symptom_terms=len(intent_engine.topics(user_input)),
+        questions=max(user_input.count("?"), 1)
+    )
+
+class QueryRouter:
+    """Map questions to model tiers with a small rule table."""
+    
+    def __init__(self, tiers: Optional[Dict[str, dict]], default_max_tokens: int,
+                 simple_max_words: int = 12, complex_min_words: int = 60,
+                 complex_min_terms: int = 3, complex_min_density: float = 0.5, complex_min_questions: int = 3):
+        """
+        Args:
+            tiers (dict): Settings per tier ({"max_tokens"}); None disables routing
+            default_max_tokens (int): Output token cap used when routing is disabled
+            simple_max_words (int): Longest question still considered simple
+            complex_min_words (int): Shortest question always considered complex
+            complex_min_terms (int): Health topics mentioned that make a question complex
+            complex_min_density (float): Share of words naming health topics that makes a question with two or more complex
+            complex_min_questions (int): Question marks that make a message complex
+        """
+        self.tiers = tiers
+        self.default_max_tokens = default_max_tokens
+        self.simple_max_words = simple_max_words
+        self.complex_min_words = complex_min_words
+        self.complex_min_terms = complex_min_terms
+        self.complex_min_density = complex_min_density
+        self.complex_min_questions = complex_min_questions
+    
+    def classify(self, features: QueryFeatures) -> str:
+        """Pick the tier for a question's features."""
+        if (features.words >= self.complex_min_words
+                or features.symptom_terms >= self.complex_min_terms
+                or (features.symptom_terms >= 2 and features.symptom_density >= self.complex_min_density)
+                or features.questions >= self.complex_min_questions):
+            return "complex"
+        if features.words <= self.simple_max_words and features.symptom_terms <= 1 and features.questions == 1:
+            return "simple"
+        return "standard"
+    
+    def route(self, user_input: str) -> Route:
+        """
+        Choose how to answer a question.
+        
+        Returns:
+            Route: The tier, which each backend maps to a model, and its output token cap
+        """
+        features = extract_features(user_input)
+        if not self.tiers:
+            return Route("default", self.default_max_tokens, features)
+        tier = self.classify(features)
+        settings = self.tiers[tier]
+        return Route(tier, settings["max_tokens"], features)
@@ -0,0 +1,266 @@
+"""
+Conversation memory for Healthcare Chatbot
+This module keeps a compact server-side history per session, in memory or in the
+persistent conversation store, and assembles a token-budgeted context window from it
+for each model call.
+"""
+
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Iterable, Iterator, List, Optional
+import metrics
+from config import config
+from export import Transcript, render_chunks
+from store import ConversationStore
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+# Most recent stored turns read to build a context window when history is in the conversation store
+CONTEXT_SCAN_TURNS = 50
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in text (roughly four characters per token)."""
+    return len(text) // 4 + 1
+
+def _summarize_turn(turn: dict) -> str:
+    """Reduce a turn to a short note about what the user asked."""
+    question = _SENTENCE_END_RE.split(turn["user"].strip(), maxsplit=1)[0]
+    if len(question) > 120:
+        question = question[:117] + "..."
+    return question
+
+def _build_messages(summary: Iterable[str], turns: Iterable[dict]) -> List[dict]:
+    """Turn a summary of older turns and the recent turns into chat messages."""
+    messages = []
+    summary = list(summary)
+    if summary:
+        messages.append({
+            "role": "system",
+            "content": "Earlier in this conversation the user asked about: " + "; ".join(summary)
+        })
+    for turn in turns:
+        # Follow-up answers are recorded without repeating the user's message
+        if turn["user"]:
+            messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["bot"]})
+    return messages
+
+class Conversation:
+    """A session's recent turns plus a running summary of older ones, and its transcript."""
+    
+    def __init__(self, transcript_turns: Optional[int] = None):
+        self.turns = deque()
+        self.transcript = Transcript(max_turns=transcript_turns)
+        self.tokens = 0
+        self.summary = deque()
+        self.summary_tokens = 0
+        self.total_turns = 0
+        self.updated_at = time.time()
+
+class SessionStore:
+    """Thread-safe store of conversations with a token-budgeted context window.
+    
+    Conversations are kept in process memory unless a ConversationStore is given, in which
+    case every turn is persisted there and shared by all processes using the same database.
+    """
+    
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600,
+                 context_tokens: int = 1500, summary_tokens: int = 200, transcript_turns: Optional[int] = None,
+                 store: Optional[ConversationStore] = None):
+        """
+        Args:
+            max_sessions (int): Maximum sessions kept before evicting the least recently used
+            ttl (float): Seconds of inactivity after which a session is forgotten
+            context_tokens (int): Token budget for the recent turns sent to the model
+            summary_tokens (int): Token budget for the summary of older turns
+            transcript_turns (int): Most recent turns kept for export; None keeps every turn
+            store (ConversationStore): Persistent store for history; None keeps it in memory
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.context_tokens = context_tokens
+        self.summary_tokens = summary_tokens
+        self.transcript_turns = transcript_turns
+        self.store = store
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def new_session_id() -> str:
+        """Generate a new random session id."""
+        return uuid.uuid4().hex
+    
+    def _get(self, session_id: str, create: bool = False) -> Optional[Conversation]:
+        """Look up a live conversation; callers must hold the lock."""
+        conversation = self._sessions.get(session_id)
+        if conversation is not None and conversation.updated_at + self.ttl <= time.time():
+            del self._sessions[session_id]
+            conversation = None
+        
+        if conversation is None and create:
+            conversation = self._sessions[session_id] = Conversation(self.transcript_turns)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        
+        if conversation is not None:
+            self._sessions.move_to_end(session_id)
+        return conversation
+    
+    def context(self, session_id: str) -> List[dict]:
+        """
+        Build the chat messages that give the model this session's earlier context.
+        
+        Returns:
+            list: A summary system message (if any) followed by the recent turns
+        """
+        if self.store is not None:
+            return self._stored_context(session_id)
+        
+        with self._lock:
+            conversation = self._get(session_id)
+            if conversation is None:
+                return []
+            return _build_messages(conversation.summary, conversation.turns)
+    
+    def _stored_context(self, session_id: str) -> List[dict]:
+        """Build the context window from the conversation store with the same token budgets."""
+        turns = self.store.recent_turns(session_id, CONTEXT_SCAN_TURNS)
+        
+        # Keep the newest turns that fit the budget (always at least one); summarize the rest
+        tokens, start = 0, len(turns)
+        while start > 0:
+            turn = turns[start - 1]
+            tokens += estimate_tokens(turn["user"]) + estimate_tokens(turn["bot"])
+            if tokens > self.context_tokens and start < len(turns):
+                break
+            start -= 1
+        
+        summary = deque()
+        summary_tokens = 0
+        for turn in reversed(turns[:start]):
+            note = _summarize_turn(turn)
+            if not note:
+                continue
+            summary_tokens += estimate_tokens(note)
+            if summary_tokens > self.summary_tokens and summary:
+                break
+            summary.appendleft(note)
+        return _build_messages(summary, turns[start:])
+    
+    def append(self, session_id: str, user_message: str, bot_message: str):
+        """Record a completed turn, folding turns that fall out of the window into the summary."""
+        if self.store is not None:
+            self.store.append(session_id, user_message, bot_message)
+            return
+        
+        turn = {
+            "user": user_message,
+            "bot": bot_message,
+            "tokens": estimate_tokens(user_message) + estimate_tokens(bot_message)
+        }
+        
+        with self._lock:
+            conversation = self._get(session_id, create=True)
+            conversation.turns.append(turn)
+            conversation.tokens += turn["tokens"]
+            conversation.total_turns += 1
+            conversation.updated_at = time.time()
+            conversation.transcript.append(user_message, bot_message)
+            
+            # Slide the window; each evicted turn is summarized exactly once
+            while conversation.tokens > self.context_tokens and len(conversation.turns) > 1:
+                old_turn = conversation.turns.popleft()
+                conversation.tokens -= old_turn["tokens"]
+                note = _summarize_turn(old_turn)
+                if note:
+                    conversation.summary.append(note)
+                    conversation.summary_tokens += estimate_tokens(note)
+                while conversation.summary_tokens > self.summary_tokens and len(conversation.summary) > 1:
+                    conversation.summary_tokens -= estimate_tokens(conversation.summary.popleft())
+    
+    def transcript(self, session_id: str) -> Optional[Transcript]:
+        """Get a session's in-memory transcript, or None if the session is unknown or expired."""
+        with self._lock:
+            conversation = self._get(session_id)
+            return conversation.transcript if conversation is not None else None
+    
+    def history(self, session_id: str, limit: int) -> List[dict]:
+        """
+        Get a session's most recent turns for display.
+        
+        Args:
+            session_id (str): Conversation id
+            limit (int): Most turns returned
+            
+        Returns:
+            list: Turn dictionaries with turn, timestamp, user and bot keys, oldest first
+        """
+        if self.store is not None:
+            return self.store.recent_turns(session_id, limit)
+        transcript = self.transcript(session_id)
+        return transcript.recent(limit) if transcript is not None else []
+    
+    def turn_count(self, session_id: str) -> int:
+        """Number of turns recorded for a session."""
+        if self.store is not None:
+            return self.store.turn_count(session_id)
+        transcript = self.transcript(session_id)
+        return transcript.total_turns if transcript is not None else 0
+    
+    def export(self, session_id: str, fmt: str = "txt") -> Optional[Iterator[str]]:
+        """
+        Render a session's transcript in chunks.
+        
+        Returns:
+            iterator: Chunks of the export, or None if the session is unknown or expired
+        """
+        if self.store is None:
+            transcript = self.transcript(session_id)
+            return transcript.iter_chunks(fmt) if transcript is not None else None
+        
+        if not self.store.turn_count(session_id):
+            return None
+        if self.transcript_turns:
+            turns = self.store.recent_turns(session_id, self.transcript_turns)
+        else:
+            turns = self.store.iter_turns(session_id)
+        return render_chunks(turns, fmt)
+    
+    def clear(self, session_id: str):
+        """Forget a session's history."""
+        if self.store is not None:
+            self.store.clear(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def stats(self) -> dict:
+        """Get session store statistics as a dictionary."""
+        if self.store is not None:
+            return self.store.stats()
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions
+            }
+
+session_store = SessionStore(
+    max_sessions=config.SESSION_MAX_SESSIONS,
+    ttl=config.SESSION_TTL,
+    context_tokens=config.CONTEXT_MAX_TOKENS,
+    summary_tokens=config.CONTEXT_SUMMARY_TOKENS,
+    transcript_turns=config.EXPORT_MAX_TURNS or None,
+    store=ConversationStore(
+        config.CONVERSATION_DB_PATH,
+        batch_size=config.CONVERSATION_DB_BATCH_SIZE,
+        flush_interval=config.CONVERSATION_DB_FLUSH_INTERVAL,
+        queue_size=config.CONVERSATION_DB_QUEUE_SIZE,
+        retention=config.CONVERSATION_RETENTION_DAYS * 86400
+    ) if config.CONVERSATION_DB_PATH else None
+)
+
+if session_store.store is not None:
+    metrics.registry.gauge("chatbot_conversation_store_queued", "Conversation store writes waiting for the writer.", lambda: session_store.store.queued)
+    metrics.registry.gauge("chatbot_conversation_store_batches", "Batches committed to the conversation store.", lambda: session_store.store.batches)
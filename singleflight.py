@@ -0,0 +1,99 @@
+"""
+In-flight request coalescing for Healthcare Chatbot
+This module lets concurrent identical requests share a single upstream call instead of
+each triggering their own.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict
+
+class _Call:
+    """A call in progress whose outcome is shared with every waiting caller."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution."""
+    
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: str, fn: Callable[[], str]) -> str:
+        """
+        Run fn once for all threads that call with the same key at the same time.
+        
+        Args:
+            key (str): Identifies requests that can share a result
+            fn (callable): Performs the work; its result or exception is shared
+            
+        Returns:
+            str: The result of fn
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """
+        Await fn once for all tasks that call with the same key at the same time.
+        
+        Args:
+            key (str): Identifies requests that can share a result
+            fn (callable): Returns the awaitable doing the work; its result or exception is shared
+            
+        Returns:
+            str: The result of fn
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish_task(key, done))
+        
+        # Shield so a cancelled caller does not cancel the call shared with others
+        return await asyncio.shield(task)
+    
+    def _finish_task(self, key: str, task: asyncio.Task):
+        """Forget a finished shared task, retrieving its exception so it is never reported as lost."""
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> dict:
+        """Get coalescing statistics as a dictionary."""
+        with self._lock:
+            in_flight = len(self._calls) + len(self._tasks)
+        return {
+            "coalesced": self.coalesced,
+            "in_flight": in_flight
+        }
@@ -4,6 +4,7 @@ Startup script for Flask Healthcare Chatbot
 This script provides an easy way to start the Flask application with proper configuration.
 """
 
+import argparse
 import os
 import sys
 import subprocess
@@ -43,8 +44,24 @@ def check_env_file():
     print("✅ Environment configuration is valid")
     return True
 
+def server_command(production: bool) -> list:
+    """Build the command that serves flask_app, with gunicorn in production mode."""
+    if not production:
+        return [sys.executable, "flask_app.py"]
+    if os.name == "nt":
+        print("⚠️ gunicorn does not run on Windows; falling back to the development server")
+        return [sys.executable, "flask_app.py"]
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "flask_app:app"]
+
 def main():
     """Main startup function."""
+    parser = argparse.ArgumentParser(description="Start the Flask Healthcare Chatbot")
+    parser.add_argument("--production", action="store_true", default=None,
+                        help="serve with gunicorn instead of the development server (default when FLASK_ENV=production)")
+    parser.add_argument("--dev", dest="production", action="store_false",
+                        help="serve with the Flask development server")
+    args = parser.parse_args()
+    
     print("🏥 Healthcare Chatbot - Flask Application")
     print("=" * 50)
     
@@ -56,7 +73,8 @@ def main():
     if not check_env_file():
         sys.exit(1)
     
-    print("\n🚀 Starting Flask application...")
+    production = args.production if args.production is not None else os.getenv("FLASK_ENV") == "production"
+    print(f"\n🚀 Starting Flask application ({'production, gunicorn' if production else 'development server'})...")
     print("📱 Frontend will be available at: http://localhost:5000")
     print("🔧 API endpoint: http://localhost:5000/chat")
     print("💚 Health check: http://localhost:5000/health")
@@ -65,7 +83,7 @@ def main():
     
     try:
         # Start Flask app
-        subprocess.run([sys.executable, "flask_app.py"], check=True)
+        subprocess.run(server_command(production), check=True)
     except KeyboardInterrupt:
         print("\n\n👋 Server stopped by user")
     except subprocess.CalledProcessError as e:
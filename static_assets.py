@@ -0,0 +1,132 @@
+"""
+Static asset serving for Healthcare Chatbot
+This module loads the web UI's files once at startup, pre-compresses them with gzip
+(and brotli when installed), and picks the representation a client accepts.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred content codings, best first, with how to produce each one
+ENCODERS = {
+    "br": (lambda data: brotli.compress(data, quality=11)) if brotli else None,
+    "gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+}
+
+# Files whose type gains nothing from compression
+INCOMPRESSIBLE = ("image/png", "image/jpeg", "image/gif", "image/webp", "font/woff", "font/woff2")
+
+class Variant(NamedTuple):
+    """One encoded representation of an asset."""
+    body: bytes
+    etag: str
+
+class Asset(NamedTuple):
+    """A static file with its representations keyed by content coding ("identity" is uncompressed)."""
+    mimetype: str
+    variants: Dict[str, Variant]
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into quality values by coding.
+    
+    Args:
+        header (str): Header value, e.g. "gzip, br;q=0.9"
+    
+    Returns:
+        dict: Quality value for each coding named in the header
+    """
+    qualities = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[coding] = q
+    return qualities
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+class StaticAssets:
+    """In-memory, pre-compressed copies of the files in an asset directory."""
+    
+    def __init__(self, directory: str, max_age: int = 300):
+        """
+        Args:
+            directory (str): Directory whose files are served
+            max_age (int): Seconds browsers may reuse an asset before revalidating it
+        """
+        self.directory = directory
+        self.cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        self.assets: Dict[str, Asset] = {}
+        self.load()
+    
+    def load(self):
+        """Read and compress every file in the directory, replacing what was loaded before."""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    data = f.read()
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                assets[relative] = self._build(relative, data)
+        self.assets = assets
+    
+    @staticmethod
+    def _build(name: str, data: bytes) -> Asset:
+        """Build an asset's representations, keeping compressed ones only when they are smaller."""
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if mimetype.startswith("text/") or mimetype in ("application/javascript", "application/json"):
+            mimetype += "; charset=utf-8"
+        
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        variants = {"identity": Variant(data, f'"{digest}"')}
+        if not mimetype.startswith(INCOMPRESSIBLE):
+            for coding, encode in ENCODERS.items():
+                if encode is None:
+                    continue
+                body = encode(data)
+                if len(body) < len(data):
+                    # Each coding is a different representation, so it needs its own strong ETag
+                    variants[coding] = Variant(body, f'"{digest}-{coding}"')
+        return Asset(mimetype, variants)
+    
+    def get(self, name: str) -> Optional[Asset]:
+        """Look up an asset by its path relative to the directory."""
+        return self.assets.get(name)
+    
+    @staticmethod
+    def negotiate(asset: Asset, accept_encoding: str) -> Tuple[str, Variant]:
+        """
+        Choose the representation to send for a request's Accept-Encoding header.
+        
+        Returns:
+            tuple: (content coding, variant); the coding is "identity" for the uncompressed file
+        """
+        qualities = parse_accept_encoding(accept_encoding or "")
+        best, best_q = "identity", 0.0
+        for coding in ENCODERS:
+            q = qualities.get(coding, qualities.get("*", 0.0))
+            if coding in asset.variants and q > best_q:
+                best, best_q = coding, q
+        return best, asset.variants[best]
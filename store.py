@@ -0,0 +1,323 @@
+"""
+Persistent conversation store for Healthcare Chatbot
+This module keeps conversation turns in a SQLite database in WAL mode, so every worker
+process and restarts share history, and writes them from a background thread in batches
+to keep database work off the request path.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    turn_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    user TEXT NOT NULL,
+    bot TEXT NOT NULL,
+    PRIMARY KEY (session_id, turn)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    session_id TEXT,
+    reply TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at);
+"""
+
+# Seconds between purges of conversations older than the retention period
+PURGE_INTERVAL = 600
+
+def _turn(turn: int, created_at: float, user: str, bot: str) -> dict:
+    """Build the dictionary describing one turn."""
+    return {
+        "turn": turn,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(created_at)),
+        "user": user,
+        "bot": bot
+    }
+
+class ConversationStore:
+    """SQLite-backed conversation history with batched background writes."""
+    
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 0.05,
+                 queue_size: int = 10000, retention: float = 30 * 86400):
+        """
+        Args:
+            path (str): SQLite database file, shared by every process serving the app
+            batch_size (int): Most writes committed in one transaction
+            flush_interval (float): Seconds the writer waits to fill a batch
+            queue_size (int): Writes that may wait for the writer before callers block
+            retention (float): Seconds an idle conversation is kept; 0 keeps them forever
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.batches = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        # Turns queued but not yet committed, by session, so readers see their own writes
+        self._pending: Dict[str, List[dict]] = {}
+        self._pending_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._last_purge = 0.0
+        
+        atexit.register(self.flush, 5.0)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def _after_fork(self):
+        """Drop the parent's connections, writer thread and queue in a forked child."""
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it and creating the schema on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+    
+    @property
+    def queued(self) -> int:
+        """Writes waiting for the background writer."""
+        return self._queue.qsize()
+    
+    def _ensure_writer(self):
+        """Start the background writer thread if it is not running."""
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+                self._writer.start()
+    
+    def append(self, session_id: str, user_message: str, bot_message: str):
+        """Queue a completed turn for writing; it is visible to readers in this process at once."""
+        pending = {"created_at": time.time(), "user": user_message, "bot": bot_message}
+        with self._pending_lock:
+            self._pending.setdefault(session_id, []).append(pending)
+        self._ensure_writer()
+        self._queue.put(("append", session_id, pending))
+    
+    def clear(self, session_id: str):
+        """Queue the deletion of a session and its turns."""
+        with self._pending_lock:
+            self._pending.pop(session_id, None)
+        self._ensure_writer()
+        self._queue.put(("clear", session_id, None))
+    
+    def _run(self):
+        """Writer loop: collect queued operations into batches and commit each in one transaction."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Failed to write %d conversation store operations", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _write(self, batch: list):
+        """Commit a batch of operations, then drop the written turns from the pending set."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op, session_id, pending in batch:
+                if op == "clear":
+                    conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                    continue
+                conn.execute(
+                    "INSERT INTO sessions (id, created_at, updated_at, turn_count) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at, turn_count = turn_count + 1",
+                    (session_id, pending["created_at"], pending["created_at"])
+                )
+                turn = conn.execute("SELECT turn_count FROM sessions WHERE id = ?", (session_id,)).fetchone()[0]
+                conn.execute(
+                    "INSERT INTO turns (session_id, turn, created_at, user, bot) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, turn, pending["created_at"], pending["user"], pending["bot"])
+                )
+            self._purge(conn)
+            
+            # Readers merge pending turns with committed ones under this lock, so a turn is
+            # never seen twice or missed while it moves from one to the other
+            with self._pending_lock:
+                conn.execute("COMMIT")
+                for op, session_id, pending in batch:
+                    turns = self._pending.get(session_id)
+                    if pending is not None and turns and pending in turns:
+                        turns.remove(pending)
+                        if not turns:
+                            del self._pending[session_id]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        
+        self.batches += 1
+        self.written += len(batch)
+    
+    def _purge(self, conn: sqlite3.Connection):
+        """Delete conversations idle for longer than the retention period, at most every PURGE_INTERVAL."""
+        now = time.time()
+        if not self.retention or now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = now - self.retention
+        conn.execute("DELETE FROM turns WHERE session_id IN (SELECT id FROM sessions WHERE updated_at < ?)", (cutoff,))
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued write has been committed.
+        
+        Returns:
+            bool: False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def recent_turns(self, session_id: str, limit: int) -> List[dict]:
+        """
+        Get a session's most recent turns, oldest first, including turns not yet written.
+        
+        Args:
+            session_id (str): Conversation id
+            limit (int): Most turns returned
+        
+        Returns:
+            list: Turn dictionaries with turn, timestamp, user and bot keys
+        """
+        conn = self._connect()
+        with self._pending_lock:
+            rows = conn.execute(
+                "SELECT turn, created_at, user, bot FROM turns WHERE session_id = ? ORDER BY turn DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+            pending = list(self._pending.get(session_id, ()))
+        
+        turns = [_turn(*row) for row in reversed(rows)]
+        last = rows[0][0] if rows else self._committed_turns(conn, session_id)
+        turns.extend(_turn(last + i, p["created_at"], p["user"], p["bot"]) for i, p in enumerate(pending, 1))
+        return turns[-limit:]
+    
+    def _committed_turns(self, conn: sqlite3.Connection, session_id: str) -> int:
+        """Number of turns committed for a session."""
+        row = conn.execute("SELECT turn_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+    
+    def turn_count(self, session_id: str) -> int:
+        """Number of turns recorded for a session, including turns not yet written."""
+        conn = self._connect()
+        with self._pending_lock:
+            return self._committed_turns(conn, session_id) + len(self._pending.get(session_id, ()))
+    
+    def iter_turns(self, session_id: str, page_size: int = 500) -> Iterator[dict]:
+        """
+        Iterate over every turn of a session, oldest first, reading a page at a time.
+        
+        Pending writes are flushed first so the result is complete.
+        """
+        self.flush()
+        conn = self._connect()
+        last = 0
+        while True:
+            rows = conn.execute(
+                "SELECT turn, created_at, user, bot FROM turns WHERE session_id = ? AND turn > ? ORDER BY turn LIMIT ?",
+                (session_id, last, page_size)
+            ).fetchall()
+            for row in rows:
+                yield _turn(*row)
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+    
+    def save_job(self, job: dict, ttl: float):
+        """
+        Write a chat job's current state so any process can report it, and drop finished jobs past their TTL.
+        
+        Job states are few and small, so they are written at once rather than through the batch writer.
+        
+        Args:
+            job (dict): id, status, session_id, reply, error, created_at and finished_at
+            ttl (float): Seconds a finished job's result is kept
+        """
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, session_id, reply, error, created_at, finished_at) "
+            "VALUES (:id, :status, :session_id, :reply, :error, :created_at, :finished_at)",
+            job
+        )
+        if job["finished_at"] is not None:
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - ttl,))
+    
+    def load_job(self, job_id: str, ttl: float) -> Optional[dict]:
+        """Read a chat job written by any process; None if it is unknown or its result has expired."""
+        row = self._connect().execute(
+            "SELECT id, status, session_id, reply, error, created_at, finished_at FROM jobs "
+            "WHERE id = ? AND (finished_at IS NULL OR finished_at >= ?)",
+            (job_id, time.time() - ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "status", "session_id", "reply", "error", "created_at", "finished_at"), row))
+    
+    def stats(self) -> dict:
+        """Get conversation store statistics as a dictionary."""
+        conn = self._connect()
+        return {
+            "sessions": conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "queued": self.queued,
+            "batches": self.batches,
+            "written": self.written
+        }
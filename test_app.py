@@ -6,8 +6,12 @@ This script tests the basic functionality of the chatbot.
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 
+# Keep test conversations out of the repository and any configured database
+os.environ["CONVERSATION_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="chatbot-test-"), "conversations.db")
+
 def test_imports():
     """Test if all required modules can be imported."""
     print("🧪 Testing imports...")
@@ -102,6 +106,1167 @@ def test_flask_app():
         print(f"❌ Flask app test failed: {e}")
         return False
 
+def test_streaming():
+    """Test the streaming chat endpoint."""
+    print("\n📡 Testing streaming endpoint...")
+    
+    try:
+        from flask_app import app
+        
+        with app.test_client() as client:
+            response = client.post('/chat/stream', json={'message': 'Hello'})
+            body = response.get_data(as_text=True)
+            if response.status_code == 200 and response.mimetype == 'text/event-stream' and '"done": true' in body:
+                print("✅ Streaming endpoint working")
+            else:
+                print(f"⚠️  Streaming endpoint returned status {response.status_code}")
+                return False
+        
+        return True
+    except Exception as e:
+        print(f"❌ Streaming test failed: {e}")
+        return False
+
+def test_response_cache():
+    """Test response cache normalization, eviction and expiry."""
+    print("\n🗄️  Testing response cache...")
+    
+    try:
+        from cache import ResponseCache
+        
+        cache = ResponseCache(max_size=2, ttl=60)
+        key = ResponseCache.make_key("What to do for a headache?", "gpt-3.5-turbo", 0.7, 400)
+        same_key = ResponseCache.make_key("  what to do for a HEADACHE ", "gpt-3.5-turbo", 0.7, 400)
+        if key != same_key:
+            print("❌ Normalized questions produced different cache keys")
+            return False
+        
+        cache.set(key, "Rest and hydrate.")
+        cache.set("b", "2")
+        cache.get(key)
+        cache.set("c", "3")
+        if cache.get("b") is not None or cache.get(key) != "Rest and hydrate.":
+            print("❌ Least recently used entry was not evicted")
+            return False
+        
+        expired = ResponseCache(ttl=0)
+        expired.set(key, "stale")
+        if expired.get(key) is not None:
+            print("❌ Expired entry was returned")
+            return False
+        
+        print(f"✅ Response cache working: {cache.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Response cache test failed: {e}")
+        return False
+
+def test_intent_engine():
+    """Test the offline intent engine fast path and fallback."""
+    print("\n💬 Testing intent engine...")
+    
+    try:
+        from intents import intent_engine
+        
+        if not intent_engine.smalltalk_response("Hello there!"):
+            print("❌ Greeting was not answered locally")
+            return False
+        
+        if intent_engine.smalltalk_response("Hi, I have a headache"):
+            print("❌ Health question was answered as small talk")
+            return False
+        
+        for question in ("help with depression", "support for grief", "help me sleep", "thanks, what about my rash?"):
+            if intent_engine.smalltalk_response(question):
+                print(f"❌ Health question was answered as small talk: {question}")
+                return False
+        
+        for message in ("Thank you so much!", "Can you help me please?", "Hey there"):
+            if not intent_engine.smalltalk_response(message):
+                print(f"❌ Small talk was not answered locally: {message}")
+                return False
+        
+        fallback = intent_engine.fallback_response("What should I do for a headache?")
+        if not fallback or "headache" not in fallback.lower():
+            print("❌ Headache fallback answer not found")
+            return False
+        
+        print("✅ Intent engine working")
+        return True
+    except Exception as e:
+        print(f"❌ Intent engine test failed: {e}")
+        return False
+
+def test_asgi_app():
+    """Test the async ASGI app and the async chat pipeline against the fake OpenAI server."""
+    print("\n⚡ Testing ASGI app...")
+    
+    try:
+        import asyncio
+        import secrets
+        import chatbot
+        from starlette.testclient import TestClient
+        from asgi_app import app
+        from backends import BackendRouter, build_backends
+        from benchmarks.fake_openai import FakeOpenAIServer
+        print("✅ ASGI app imported successfully")
+        
+        server = FakeOpenAIServer(latency="fixed:0.2").start()
+        
+        def fake_router():
+            # A fresh router per event loop, since async clients are bound to the loop that built them
+            return BackendRouter(build_backends([
+                {"type": "openai", "name": "fake", "model": "gpt-3.5-turbo", "timeout": 5,
+                 "api_key": "test-key", "base_url": server.base_url, "max_retries": 0}
+            ]))
+        
+        saved_router = chatbot.backend_router
+        try:
+            chatbot.backend_router = fake_router()
+            async def ask():
+                return await chatbot.get_healthcare_response_async(f"Which stretches ease stiffness after a long flight? (ref {secrets.token_hex(4)})")
+            reply = asyncio.run(ask())
+            if server.requests != 1 or reply.startswith("Error"):
+                print(f"❌ Async chat pipeline did not answer from the backend: {reply}")
+                return False
+            
+            chatbot.backend_router = fake_router()
+            with TestClient(app) as client:
+                response = client.get('/health')
+                if response.status_code != 200:
+                    print(f"❌ Async health endpoint returned status {response.status_code}")
+                    return False
+                response = client.post('/chat', json={"message": f"How do I ease a stiff neck? (ref {secrets.token_hex(4)})"})
+                data = response.json()
+                if response.status_code != 200 or data.get("status") != "success" or not data.get("reply") or server.requests != 2:
+                    print(f"❌ Async chat endpoint failed: {response.status_code} {data}")
+                    return False
+        finally:
+            chatbot.backend_router = saved_router
+            server.stop()
+        
+        print("✅ Async chat pipeline and endpoint working")
+        return True
+    except Exception as e:
+        print(f"❌ ASGI app test failed: {e}")
+        return False
+
+def test_single_flight():
+    """Test that concurrent identical calls share one execution."""
+    print("\n🔀 Testing request coalescing...")
+    
+    try:
+        import asyncio
+        import secrets
+        import threading
+        import time
+        import chatbot
+        from backends import BackendRouter, build_backends
+        from benchmarks.fake_openai import FakeOpenAIServer
+        from singleflight import SingleFlight
+        
+        flight = SingleFlight()
+        calls = []
+        
+        def slow_call():
+            calls.append(1)
+            time.sleep(0.2)
+            return "shared answer"
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("key", slow_call)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if len(calls) != 1 or results != ["shared answer"] * 5:
+            print(f"❌ Expected one shared call, got {len(calls)}")
+            return False
+        
+        # Identical async questions asked at the same time reach the backend once
+        server = FakeOpenAIServer(latency="fixed:0.2").start()
+        saved_router = chatbot.backend_router
+        try:
+            chatbot.backend_router = BackendRouter(build_backends([
+                {"type": "openai", "name": "fake", "model": "gpt-3.5-turbo", "timeout": 5,
+                 "api_key": "test-key", "base_url": server.base_url, "max_retries": 0}
+            ]))
+            question = f"Which stretches ease stiffness after a long flight? (ref {secrets.token_hex(4)})"
+            async def ask_together():
+                return await asyncio.gather(*(chatbot.get_healthcare_response_async(question) for _ in range(5)))
+            replies = asyncio.run(ask_together())
+        finally:
+            chatbot.backend_router = saved_router
+            server.stop()
+        if server.requests != 1 or len(set(replies)) != 1 or replies[0].startswith("Error"):
+            print(f"❌ Concurrent identical async calls made {server.requests} upstream calls: {replies}")
+            return False
+        
+        print(f"✅ Request coalescing working: {flight.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Request coalescing test failed: {e}")
+        return False
+
+def test_session_memory():
+    """Test that conversation context stays within its token budget."""
+    print("\n🧠 Testing conversation memory...")
+    
+    try:
+        from sessions import SessionStore, estimate_tokens
+        
+        store = SessionStore(context_tokens=200, summary_tokens=50)
+        session_id = store.new_session_id()
+        for i in range(50):
+            store.append(session_id, f"Question {i} about my symptoms?", "A fairly long answer. " * 5)
+        
+        context = store.context(session_id)
+        context_tokens = sum(estimate_tokens(m["content"]) for m in context)
+        if context_tokens > 300:
+            print(f"❌ Context grew to {context_tokens} tokens")
+            return False
+        
+        if context[0]["role"] != "system" or "Question" not in context[0]["content"]:
+            print("❌ Older turns were not summarized")
+            return False
+        
+        print(f"✅ Conversation memory working: {context_tokens} tokens after 50 turns")
+        return True
+    except Exception as e:
+        print(f"❌ Conversation memory test failed: {e}")
+        return False
+
+def test_admission_control():
+    """Test per-client rate limiting and load shedding."""
+    print("\n🚦 Testing admission control...")
+    
+    try:
+        from admission import AdmissionController, AdmissionRejected
+        
+        controller = AdmissionController(rate_per_minute=60, burst=2, max_concurrency=1, max_queue=0)
+        controller.acquire("client-a")
+        
+        try:
+            controller.acquire("client-b")
+            print("❌ Request beyond the concurrency cap was admitted")
+            return False
+        except AdmissionRejected as e:
+            if e.status != 503:
+                print(f"❌ Expected 503 when overloaded, got {e.status}")
+                return False
+        
+        controller.release()
+        controller.acquire("client-a")
+        controller.release()
+        try:
+            controller.acquire("client-a")
+            print("❌ Client beyond its burst was admitted")
+            return False
+        except AdmissionRejected as e:
+            if e.status != 429 or e.retry_after < 1:
+                print(f"❌ Expected 429 with Retry-After, got {e.status}")
+                return False
+        
+        print(f"✅ Admission control working: {controller.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Admission control test failed: {e}")
+        return False
+
+def test_metrics_endpoint():
+    """Test the Prometheus metrics endpoint."""
+    print("\n📈 Testing metrics endpoint...")
+    
+    try:
+        from flask_app import app
+        
+        with app.test_client() as client:
+            client.get('/health')
+            response = client.get('/metrics')
+            body = response.get_data(as_text=True)
+            if response.status_code != 200 or 'chatbot_http_requests_total{endpoint="/health",status="200"}' not in body:
+                print(f"❌ Metrics endpoint returned status {response.status_code}")
+                return False
+            if 'chatbot_request_latency_seconds_bucket' not in body:
+                print("❌ Latency histogram missing from metrics")
+                return False
+        
+        print("✅ Metrics endpoint working")
+        return True
+    except Exception as e:
+        print(f"❌ Metrics test failed: {e}")
+        return False
+
+def test_fake_openai_server():
+    """Test the local OpenAI stand-in used by the benchmarks."""
+    print("\n🧪 Testing fake OpenAI server...")
+    
+    try:
+        import openai
+        from benchmarks.fake_openai import FakeOpenAIServer
+        
+        server = FakeOpenAIServer(latency="fixed:0.01").start()
+        try:
+            client = openai.OpenAI(api_key="test-key", base_url=server.base_url, max_retries=0)
+            messages = [{"role": "user", "content": "Hello"}]
+            
+            response = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages)
+            if not response.choices[0].message.content or not response.usage.completion_tokens:
+                print("❌ Fake completion was empty")
+                return False
+            
+            stream = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, stream=True)
+            streamed = "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+            if streamed.strip() != response.choices[0].message.content:
+                print("❌ Streamed completion did not match")
+                return False
+        finally:
+            server.stop()
+        
+        print("✅ Fake OpenAI server working")
+        return True
+    except Exception as e:
+        print(f"❌ Fake OpenAI server test failed: {e}")
+        return False
+
+def test_backend_failover():
+    """Test that the backend router fails over on errors and timeouts."""
+    print("\n🔀 Testing backend failover...")
+    
+    try:
+        import asyncio
+        from backends import BackendRouter, ClientNotConfiguredError, build_backends
+        from benchmarks.fake_openai import FakeOpenAIServer
+        
+        failing = FakeOpenAIServer(error_rate=1.0).start()
+        slow = FakeOpenAIServer(latency="fixed:2").start()
+        try:
+            router = BackendRouter(build_backends([
+                {"type": "openai", "name": "failing", "model": "gpt-3.5-turbo", "timeout": 5,
+                 "api_key": "test-key", "base_url": failing.base_url, "max_retries": 0},
+                {"type": "openai", "name": "slow", "model": "gpt-3.5-turbo", "timeout": 0.2,
+                 "api_key": "test-key", "base_url": slow.base_url, "max_retries": 0},
+                {"type": "offline", "name": "offline", "model": "canned", "timeout": 1}
+            ]))
+            messages = [{"role": "user", "content": "I have a headache"}]
+            
+            text, backend = router.complete(messages)
+            if backend.name != "offline" or backend.cacheable or "headache" not in text:
+                print(f"❌ Expected the offline backend to answer, got {backend.name}")
+                return False
+            
+            streamed = [(backend.name, delta) for backend, delta in router.stream(messages)]
+            if [name for name, _ in streamed] != ["offline"]:
+                print(f"❌ Streaming did not fail over: {streamed}")
+                return False
+            
+            async def stream_async(router):
+                return [(backend.name, delta) async for backend, delta in router.stream_async(messages)]
+            streamed = asyncio.run(stream_async(router))
+            if [name for name, _ in streamed] != ["offline"]:
+                print(f"❌ Async streaming did not fail over: {streamed}")
+                return False
+        finally:
+            failing.stop()
+            slow.stop()
+        
+        try:
+            BackendRouter(build_backends([
+                {"type": "openai", "name": "openai", "model": "gpt-3.5-turbo", "timeout": 1, "api_key": None}
+            ])).complete(messages)
+            print("❌ Unconfigured backends should raise ClientNotConfiguredError")
+            return False
+        except ClientNotConfiguredError:
+            pass
+        
+        # Only the openai backend inherits OPENAI_API_KEY; a keyless compatible server still works
+        from config import Config as config
+        local = FakeOpenAIServer(latency="fixed:0").start()
+        saved = config.LLM_BACKENDS, config.OPENAI_API_KEY, os.environ.get("BACKEND_LOCAL_BASE_URL")
+        try:
+            config.LLM_BACKENDS, config.OPENAI_API_KEY = "openai,local", "sk-secret"
+            os.environ["BACKEND_LOCAL_BASE_URL"] = local.base_url
+            keys = {c["name"]: c["api_key"] for c in config.get_backend_configs()}
+            if keys != {"openai": "sk-secret", "local": None}:
+                print(f"❌ OpenAI key leaked to another backend: {keys}")
+                return False
+            keyless = build_backends([c for c in config.get_backend_configs() if c["name"] == "local"])
+            text, backend = BackendRouter(keyless).complete(messages)
+            if backend.name != "local" or not text:
+                print("❌ Keyless OpenAI-compatible backend did not answer")
+                return False
+            streamed = asyncio.run(stream_async(BackendRouter(keyless)))
+            if not streamed or {name for name, _ in streamed} != {"local"}:
+                print(f"❌ Async stream from an OpenAI-compatible backend failed: {streamed}")
+                return False
+        finally:
+            config.LLM_BACKENDS, config.OPENAI_API_KEY = saved[0], saved[1]
+            if saved[2] is None:
+                os.environ.pop("BACKEND_LOCAL_BASE_URL", None)
+            else:
+                os.environ["BACKEND_LOCAL_BASE_URL"] = saved[2]
+            local.stop()
+        
+        print("✅ Backend failover working")
+        return True
+    except Exception as e:
+        print(f"❌ Backend failover test failed: {e}")
+        return False
+
+def test_request_hedging():
+    """Test that slow upstream calls are hedged within the hedge ratio."""
+    print("\n🪃 Testing request hedging...")
+    
+    try:
+        import asyncio
+        import itertools
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from hedging import Hedger
+        
+        # The first call stalls, later ones answer straight away
+        calls = itertools.count()
+        def slow_then_fast():
+            if next(calls) == 0:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+        
+        executor = ThreadPoolExecutor(max_workers=4)
+        hedger = Hedger("test", executor, delay=0.05, max_ratio=1.0)
+        if hedger.call(slow_then_fast) != "fast":
+            print("❌ Hedged call did not return the faster answer")
+            return False
+        
+        async_calls = itertools.count()
+        async def slow_then_fast_async():
+            if next(async_calls) == 0:
+                await asyncio.sleep(0.5)
+                return "slow"
+            return "fast"
+        
+        hedger = Hedger("test", executor, delay=0.05, max_ratio=1.0)
+        if asyncio.run(hedger.call_async(slow_then_fast_async)) != "fast":
+            print("❌ Hedged async call did not return the faster answer")
+            return False
+        
+        # A hedge ratio of 0.5 allows at most one hedge for the first two requests
+        calls = itertools.count()
+        hedger = Hedger("test", executor, delay=0.05, max_ratio=0.5)
+        if hedger.call(slow_then_fast) != "slow":
+            print("❌ Hedge ratio was not respected")
+            return False
+        
+        # The adaptive delay waits until enough latency samples have been seen
+        hedger = Hedger("test", executor, min_samples=3)
+        for _ in range(3):
+            hedger.call(lambda: "ok")
+        if hedger.hedge_delay() is None:
+            print("❌ Adaptive hedge delay was not computed")
+            return False
+        executor.shutdown(wait=False)
+        
+        print("✅ Request hedging working")
+        return True
+    except Exception as e:
+        print(f"❌ Request hedging test failed: {e}")
+        return False
+
+def test_circuit_breaker():
+    """Test that circuit breakers trip, fail fast and recover through half-open probes."""
+    print("\n🔌 Testing circuit breaker...")
+    
+    try:
+        import time
+        from backends import BackendRouter, build_backends
+        from circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+        
+        breaker = CircuitBreaker("test", consecutive_timeouts=2, reset_timeout=0.1)
+        for _ in range(2):
+            try:
+                with breaker.guard():
+                    raise TimeoutError()
+            except TimeoutError:
+                pass
+        if breaker.state != OPEN:
+            print(f"❌ Breaker did not trip on consecutive timeouts: {breaker.state}")
+            return False
+        
+        try:
+            with breaker.guard():
+                print("❌ Open breaker let a call through")
+                return False
+        except CircuitOpenError:
+            pass
+        
+        # After the reset timeout a single probe is allowed; its success closes the breaker
+        time.sleep(0.15)
+        with breaker.guard():
+            if breaker.state != HALF_OPEN:
+                print(f"❌ Breaker did not go half-open: {breaker.state}")
+                return False
+            try:
+                with breaker.guard():
+                    print("❌ Half-open breaker allowed too many probes")
+                    return False
+            except CircuitOpenError:
+                pass
+        if breaker.state != CLOSED:
+            print(f"❌ Successful probe did not close the breaker: {breaker.state}")
+            return False
+        
+        # With the upstream unreachable, the router trips and then fails fast to the offline backend
+        router = BackendRouter(build_backends([
+            {"type": "openai", "name": "down", "model": "gpt-3.5-turbo", "timeout": 1,
+             "api_key": "test-key", "base_url": "http://127.0.0.1:9/v1", "max_retries": 0},
+            {"type": "offline", "name": "offline", "model": "canned", "timeout": 1}
+        ]), breaker_options={"min_calls": 2, "window": 2, "reset_timeout": 60})
+        messages = [{"role": "user", "content": "I have a headache"}]
+        for _ in range(3):
+            text, backend = router.complete(messages)
+            if backend.name != "offline":
+                print(f"❌ Expected the offline backend to answer, got {backend.name}")
+                return False
+        if router.breakers["down/gpt-3.5-turbo"].state != OPEN:
+            print("❌ Router breaker did not trip")
+            return False
+        
+        print("✅ Circuit breaker working")
+        return True
+    except Exception as e:
+        print(f"❌ Circuit breaker test failed: {e}")
+        return False
+
+def test_gunicorn_sizing():
+    """Test the production server sizing."""
+    print("\n🦄 Testing gunicorn sizing...")
+    
+    try:
+        import gunicorn_conf
+        
+        if gunicorn_conf.size_workers("gthread", 4, 0.9) != (5, 10):
+            print(f"❌ Unexpected gthread sizing: {gunicorn_conf.size_workers('gthread', 4, 0.9)}")
+            return False
+        if gunicorn_conf.size_workers("sync", 2, 0.9) != (5, 1):
+            print("❌ Unexpected sync sizing")
+            return False
+        if gunicorn_conf.size_workers("gthread", 1, 0.0)[1] < 2:
+            print("❌ Workers should get at least two threads")
+            return False
+        if gunicorn_conf.choose_worker_class("auto", 0.5) != "gthread":
+            print("❌ CPU-heavy workloads should use gthread workers")
+            return False
+        # Several workers need a shared conversation store outside the source tree
+        shared = gunicorn_conf.conversation_db_path("", 5)
+        if not shared or shared.startswith(os.path.dirname(os.path.abspath(__file__))):
+            print(f"❌ Workers not given a shared conversation store outside the repository: {shared!r}")
+            return False
+        if gunicorn_conf.conversation_db_path("", 1) != "" or gunicorn_conf.conversation_db_path("chat.db", 5) != "chat.db":
+            print("❌ A single worker or a configured path should be kept")
+            return False
+        if not gunicorn_conf.preload_app or gunicorn_conf.graceful_timeout <= gunicorn_conf.app_config.OPENAI_TIMEOUT:
+            print("❌ Server should preload the app and let upstream calls finish on shutdown")
+            return False
+        
+        print("✅ Gunicorn sizing working")
+        return True
+    except Exception as e:
+        print(f"❌ Gunicorn sizing test failed: {e}")
+        return False
+
+def test_lazy_startup():
+    """Test that importing the app does not load the OpenAI SDK or build clients."""
+    print("\n🥶 Testing lazy startup...")
+    
+    try:
+        import subprocess
+        import sys
+        from backends import OpenAIBackend
+        
+        loaded = subprocess.run(
+            [sys.executable, "-c", "import sys, flask_app; print('openai' in sys.modules)"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        if loaded != "False":
+            print("❌ Importing flask_app loaded the OpenAI SDK")
+            return False
+        
+        backend = OpenAIBackend("test", "gpt-3.5-turbo", 1, api_key="test-key")
+        if not backend.configured or backend._client is not None:
+            print("❌ Backend built its client before first use")
+            return False
+        backend.warm_up()
+        if backend._client is None or backend._async_client is None:
+            print("❌ Warm-up did not build the clients")
+            return False
+        
+        print("✅ Lazy startup working")
+        return True
+    except Exception as e:
+        print(f"❌ Lazy startup test failed: {e}")
+        return False
+
+def test_transcript_export():
+    """Test incremental transcript export and the /export endpoint."""
+    print("\n📥 Testing transcript export...")
+    
+    try:
+        import json
+        from export import Transcript
+        from flask_app import app
+        from sessions import session_store
+        
+        transcript = Transcript(max_turns=3)
+        for i in range(5):
+            transcript.append(f"Question {i}?", f"Answer {i}.")
+        lines = [json.loads(line) for line in transcript.export("jsonl").splitlines()]
+        if [line["turn"] for line in lines] != [3, 4, 5]:
+            print(f"❌ Transcript kept the wrong turns: {lines}")
+            return False
+        if len(list(transcript.iter_chunks("txt", chunk_size=10))) != 3:
+            print("❌ Export was not split into chunks")
+            return False
+        
+        session_id = session_store.new_session_id()
+        session_store.append(session_id, "What helps a headache?", "Rest and water.")
+        with app.test_client() as client:
+            response = client.get(f"/export?session_id={session_id}&format=md")
+            body = response.get_data(as_text=True)
+            if response.status_code != 200 or "**👤 You:** What helps a headache?" not in body:
+                print(f"❌ Markdown export failed: {response.status_code}")
+                return False
+            if "attachment" not in response.headers.get("Content-Disposition", ""):
+                print("❌ Export was not sent as a download")
+                return False
+            if client.get("/export?session_id=unknown").status_code != 404:
+                print("❌ Unknown sessions should return 404")
+                return False
+            if client.get(f"/export?session_id={session_id}&format=pdf").status_code != 400:
+                print("❌ Unsupported formats should return 400")
+                return False
+        
+        print("✅ Transcript export working")
+        return True
+    except Exception as e:
+        print(f"❌ Transcript export test failed: {e}")
+        return False
+
+def test_conversation_store():
+    """Test the SQLite conversation store and session history backed by it."""
+    print("\n🗄️ Testing conversation store...")
+    
+    try:
+        import os
+        import tempfile
+        from sessions import SessionStore
+        from store import ConversationStore
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "conversations.db")
+            store = ConversationStore(path, flush_interval=0.2)
+            for i in range(5):
+                store.append("abc", f"Question {i}?", f"Answer {i}.")
+            
+            # Turns are readable before the writer commits them
+            recent = store.recent_turns("abc", 3)
+            if [turn["turn"] for turn in recent] != [3, 4, 5] or store.turn_count("abc") != 5:
+                print(f"❌ Pending turns not readable: {recent}")
+                return False
+            if not store.flush(5) or store.batches != 1:
+                print(f"❌ Writes were not batched: {store.stats()}")
+                return False
+            
+            other = ConversationStore(path)
+            if other._connect().execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                print("❌ Database is not in WAL mode")
+                return False
+            if [turn["user"] for turn in other.recent_turns("abc", 2)] != ["Question 3?", "Question 4?"]:
+                print("❌ A second store did not see the stored history")
+                return False
+            if len(list(other.iter_turns("abc", page_size=2))) != 5:
+                print("❌ Paged read returned the wrong number of turns")
+                return False
+            
+            sessions = SessionStore(context_tokens=20, summary_tokens=200, store=other)
+            context = sessions.context("abc")
+            if context[0]["role"] != "system" or context[-1]["content"] != "Answer 4.":
+                print(f"❌ Context not built from stored turns: {context}")
+                return False
+            sessions.clear("abc")
+            other.flush(5)
+            if store.turn_count("abc") or sessions.export("abc") is not None:
+                print("❌ Cleared session still has history")
+                return False
+        
+        print("✅ Conversation store working")
+        return True
+    except Exception as e:
+        print(f"❌ Conversation store test failed: {e}")
+        return False
+
+def test_static_assets():
+    """Test pre-compressed static asset serving with ETags and conditional GETs."""
+    print("\n🗜️ Testing static assets...")
+    
+    try:
+        import gzip
+        from flask_app import app
+        from static_assets import parse_accept_encoding
+        
+        if parse_accept_encoding("gzip;q=0.5, br;q=0, *") != {"gzip": 0.5, "br": 0.0, "*": 1.0}:
+            print("❌ Accept-Encoding parsed incorrectly")
+            return False
+        
+        with app.test_client() as client:
+            plain = client.get("/")
+            if plain.status_code != 200 or b"<!DOCTYPE html>" not in plain.data or "Content-Encoding" in plain.headers:
+                print(f"❌ Uncompressed page not served: {plain.status_code}")
+                return False
+            
+            response = client.get("/", headers={"Accept-Encoding": "gzip"})
+            if response.headers.get("Content-Encoding") != "gzip" or gzip.decompress(response.data) != plain.data:
+                print("❌ Gzip representation not served")
+                return False
+            etag = response.headers.get("ETag")
+            if not etag or etag.startswith("W/") or etag == plain.headers.get("ETag"):
+                print(f"❌ Each representation needs its own strong ETag: {etag}")
+                return False
+            if "max-age" not in response.headers.get("Cache-Control", "") or response.headers.get("Vary") != "Accept-Encoding":
+                print("❌ Caching headers missing")
+                return False
+            
+            cached = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+            if cached.status_code != 304 or cached.data:
+                print(f"❌ Conditional GET was not answered with 304: {cached.status_code}")
+                return False
+            if client.get("/static/index.html").status_code != 200 or client.get("/static/missing.js").status_code != 404:
+                print("❌ Static route failed")
+                return False
+        
+        print(f"✅ Static assets working ({len(plain.data)} bytes, {len(response.data)} gzipped)")
+        return True
+    except Exception as e:
+        print(f"❌ Static assets test failed: {e}")
+        return False
+
+def test_emergency_triage():
+    """Test red-flag triage ahead of the model."""
+    print("\n🚨 Testing emergency triage...")
+    
+    try:
+        import time
+        import chatbot
+        from triage import triage_engine
+        
+        cases = {
+            "Chest pain and I can't breathe!": "cardiac",
+            "My dad is slurring his words": "stroke",
+            "my throat is swelling after eating peanuts": "anaphylaxis",
+            "I have food poisoning": None,
+            "What are the benefits of exercise?": None,
+            # Condition names count only in a message about someone's own case
+            "I think I'm having a stroke": "stroke",
+            "My son is having a seizure": "unresponsive",
+            "What are the symptoms of a stroke?": None,
+            "How can I prevent a heart attack?": None,
+            "what is heat stroke": None,
+            "side effects of seizure medication": None,
+            "can you overdose on vitamin C": None,
+            "is shortness of breath a symptom of asthma": None
+        }
+        for message, expected in cases.items():
+            match = triage_engine.match(message)
+            if (match.name if match else None) != expected:
+                print(f"❌ Triage of {message!r} gave {match}, expected {expected}")
+                return False
+        
+        if "emergency" not in chatbot.get_healthcare_response("sudden chest pain spreading to my arm"):
+            print("❌ Emergency guidance not returned")
+            return False
+        if "emergency" not in "".join(chatbot.stream_healthcare_response("I think I'm having a stroke")):
+            print("❌ Streamed reply missing emergency guidance")
+            return False
+        
+        # The follow-up answer sees the question once, without the guidance, and adds an answer-only turn
+        from sessions import session_store
+        seen, complete, follow_up = [], chatbot._complete, chatbot.config.TRIAGE_FOLLOW_UP
+        chatbot._complete = lambda user_input, context=None: seen.append(context) or "Model answer"
+        chatbot.config.TRIAGE_FOLLOW_UP = True
+        try:
+            session_id = session_store.new_session_id()
+            chatbot.get_healthcare_response("I have crushing chest pain", session_id)
+            deadline = time.monotonic() + 5
+            while session_store.turn_count(session_id) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            chatbot._complete, chatbot.config.TRIAGE_FOLLOW_UP = complete, follow_up
+        turns = session_store.history(session_id, 10)
+        if seen != [[]] or [(t["user"], t["bot"]) for t in turns][1:] != [("", "Model answer")]:
+            print(f"❌ Follow-up answer used the wrong context or turns: {seen} {turns}")
+            return False
+        
+        print("✅ Emergency triage working")
+        return True
+    except Exception as e:
+        print(f"❌ Emergency triage test failed: {e}")
+        return False
+
+def test_faq_index():
+    """Test FAQ retrieval by similarity and its memory-mapped index."""
+    print("\n📚 Testing FAQ index...")
+    
+    try:
+        import os
+        import tempfile
+        import time
+        from faq import FaqIndex
+        
+        with tempfile.TemporaryDirectory() as directory:
+            index = FaqIndex("faq.json", os.path.join(directory, "index"))
+            matches = index.search_many(["my head hurts", "headache remedies", "what is the capital of France?"])
+            if [m.id if m else None for m in matches] != ["headache", "headache", None]:
+                print(f"❌ Wrong FAQ matches: {matches}")
+                return False
+            
+            # A second index reuses the saved files through a memory map
+            reloaded = FaqIndex("faq.json", os.path.join(directory, "index"))
+            match = reloaded.search("How do I lower my blood pressure?")
+            if match is None or match.id != "blood_pressure" or type(reloaded._vectors).__name__ != "memmap":
+                print(f"❌ Saved FAQ index not reused: {match}")
+                return False
+            
+            # Personal readings, animals, other patient groups, serious causes and loose matches need the model
+            loose = ["my blood pressure is 200/120 what do I do", "diabetes in dogs", "my dog has a fever",
+                     "is it normal to have a fever of 39", "can I exercise with a cold?",
+                     "how to bring down a fever in a newborn", "how do I stop diarrhea in my infant",
+                     "symptoms of diabetes in children", "how do I treat a burn from acid"]
+            if any(reloaded.search_many(loose)):
+                print(f"❌ Generic FAQ answer used for a specific question: {reloaded.search_many(loose)}")
+                return False
+            started = time.perf_counter()
+            reloaded.search("tips for better sleep")
+            elapsed = time.perf_counter() - started
+        
+        print(f"✅ FAQ index working ({elapsed * 1000:.2f} ms per lookup)")
+        return True
+    except Exception as e:
+        print(f"❌ FAQ index test failed: {e}")
+        return False
+
+def test_query_routing():
+    """Test complexity-based model routing and adaptive output token caps."""
+    print("\n🧭 Testing query routing...")
+    
+    try:
+        import chatbot
+        from backends import OpenAIBackend
+        from config import Config
+        from routing import QueryRouter
+        
+        router = QueryRouter({
+            "simple": {"max_tokens": 150},
+            "standard": {"max_tokens": 400},
+            "complex": {"max_tokens": 800}
+        }, default_max_tokens=400)
+        cases = {
+            "Is ibuprofen safe?": "simple",
+            "What should I do about a persistent cough that keeps me awake at night?": "standard",
+            "I have a fever, a rash, joint pain and a headache": "complex",
+            "What is diabetes? How is it treated? Can diet help?": "complex"
+        }
+        for question, expected in cases.items():
+            route = router.route(question)
+            if route.tier != expected:
+                print(f"❌ {question!r} routed to {route.tier} ({route.features}), expected {expected}")
+                return False
+        
+        simple = chatbot._completion_params(router.route("Is ibuprofen safe?"))
+        if simple["tier"] != "simple" or simple["max_tokens"] != 150 or "model" in simple:
+            print(f"❌ Wrong completion parameters: {simple}")
+            return False
+        
+        # Each backend maps the tier to its own model, so failing over never sends a model name to the wrong server
+        hosted = OpenAIBackend("openai", "gpt-3.5-turbo", 5, api_key="sk-test", tier_models={"simple": "fast-model"})
+        local = OpenAIBackend("local", "llama3", 5, base_url="http://localhost:11434/v1")
+        models = (hosted._request([], simple)["model"], local._request([], simple)["model"],
+                  hosted._request([], dict(simple, tier="complex"))["model"])
+        if models != ("fast-model", "llama3", "gpt-3.5-turbo") or "tier" in local._request([], simple):
+            print(f"❌ Tier models not resolved per backend: {models}")
+            return False
+        
+        saved_backends = Config.LLM_BACKENDS
+        os.environ["ROUTE_SIMPLE_MODEL"] = "fast-model"
+        os.environ["BACKEND_LOCAL_COMPLEX_MODEL"] = "llama3:70b"
+        try:
+            Config.LLM_BACKENDS = "openai,local"
+            tier_models = {c["name"]: c["tier_models"] for c in Config.get_backend_configs()}
+        finally:
+            Config.LLM_BACKENDS = saved_backends
+            del os.environ["ROUTE_SIMPLE_MODEL"], os.environ["BACKEND_LOCAL_COMPLEX_MODEL"]
+        if tier_models != {"openai": {"simple": "fast-model"}, "local": {"complex": "llama3:70b"}}:
+            print(f"❌ Wrong tier models configured: {tier_models}")
+            return False
+        
+        unrouted = QueryRouter(None, default_max_tokens=400).route("I have a fever, a rash and a headache")
+        if unrouted.tier != "default" or unrouted.max_tokens != 400:
+            print(f"❌ Disabled routing should keep the defaults: {unrouted}")
+            return False
+        
+        print("✅ Query routing working")
+        return True
+    except Exception as e:
+        print(f"❌ Query routing test failed: {e}")
+        return False
+
+def test_chat_batch():
+    """Test the /chat/batch endpoint."""
+    print("\n📦 Testing batch chat...")
+    
+    try:
+        import json
+        import flask_app
+        from admission import AdmissionController
+        from config import config
+        from flask_app import app
+        
+        with app.test_client() as client:
+            response = client.post("/chat/batch", json={"messages": ["Hello", "", "x" * (config.MAX_MESSAGE_LENGTH + 1)]})
+            errors = response.get_json().get("errors", [])
+            if response.status_code != 400 or [e["index"] for e in errors] != [1, 2]:
+                print(f"❌ Invalid messages not rejected up front: {response.status_code} {errors}")
+                return False
+            
+            messages = ["Hello", "What are good headache remedies?", "Hello", "Thanks!"]
+            response = client.post("/chat/batch", json={"messages": messages})
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+            if response.status_code != 200 or response.mimetype != "application/x-ndjson":
+                print(f"❌ Batch request failed: {response.status_code}")
+                return False
+            results, summary = lines[:-1], lines[-1]
+            if sorted(line["index"] for line in results) != [0, 1, 2, 3] or not all(line.get("reply") for line in results):
+                print(f"❌ Missing batch results: {results}")
+                return False
+            if summary != {"done": True, "count": 4, "unique": 3, "errors": 0}:
+                print(f"❌ Wrong batch summary: {summary}")
+                return False
+            
+            # Every unique message costs a rate-limit token and runs within the global concurrency cap
+            saved_admission, saved_answer = flask_app.admission, flask_app.get_healthcare_response
+            flask_app.admission = AdmissionController(rate_per_minute=6, burst=3, max_concurrency=1)
+            peak = []
+            def answer(message, session_id=None):
+                peak.append(flask_app.admission.active)
+                return "Error: Request timed out. Please try again." if message == "two" else message.upper()
+            flask_app.get_healthcare_response = answer
+            try:
+                too_large = client.post("/chat/batch", json={"messages": ["one", "two", "three", "four"]})
+                response = client.post("/chat/batch", json={"messages": ["one", "two", "three", "one"]})
+                lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+                limited = client.post("/chat/batch", json={"messages": ["four"]})
+            finally:
+                flask_app.admission, flask_app.get_healthcare_response = saved_admission, saved_answer
+            if too_large.status_code != 400:
+                print(f"❌ Batch with more messages than the burst was accepted: {too_large.status_code}")
+                return False
+            if max(peak) != 1 or len(peak) != 3:
+                print(f"❌ Batch workers not held to the concurrency cap: {peak}")
+                return False
+            failed = [line for line in lines[:-1] if line["status"] == "error"]
+            if [line["index"] for line in failed] != [1] or "reply" in failed[0] or lines[-1]["errors"] != 1:
+                print(f"❌ Failed batch message not reported as an error: {lines}")
+                return False
+            if limited.status_code != 429 or not limited.headers.get("Retry-After"):
+                print(f"❌ Batch beyond the client's rate was accepted: {limited.status_code}")
+                return False
+        
+        print("✅ Batch chat working")
+        return True
+    except Exception as e:
+        print(f"❌ Batch chat test failed: {e}")
+        return False
+
+def test_chat_jobs():
+    """Test the background job queue and the /chat/jobs endpoints."""
+    print("\n📬 Testing chat jobs...")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        import flask_app
+        from admission import AdmissionController
+        from jobs import JobQueue, JobQueueFull
+        from flask_app import app
+        from store import ConversationStore
+        
+        release = threading.Event()
+        queue = JobQueue(lambda message, session_id: release.wait(5) and message.upper(), workers=1, max_queued=1, ttl=0.2)
+        first, second = queue.submit("one"), None
+        time.sleep(0.05)
+        second = queue.submit("two")
+        try:
+            queue.submit("three")
+            print("❌ Full job queue accepted another job")
+            return False
+        except JobQueueFull:
+            pass
+        release.set()
+        if not second.wait(5) or (first.status, first.reply, second.reply) != ("success", "ONE", "TWO"):
+            print(f"❌ Jobs not answered: {first.to_dict()} {second.to_dict()}")
+            return False
+        time.sleep(0.25)
+        if queue.get(first.id) is not None or queue.stored:
+            print("❌ Finished jobs not evicted after their TTL")
+            return False
+        
+        # A job accepted by one worker process can be read and awaited from another through the shared store
+        store = ConversationStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        release.clear()
+        accepting = JobQueue(lambda message, session_id: release.wait(5) and message.upper(), workers=1, store=store)
+        other = JobQueue(lambda message, session_id: None, workers=1, store=store, poll_interval=0.01)
+        job = accepting.submit("shared", "session-1")
+        seen = other.get(job.id)
+        release.set()
+        if seen is None or seen.finished or not seen.wait(5) or (seen.status, seen.reply, seen.session_id) != ("success", "SHARED", "session-1"):
+            print(f"❌ Job not shared between processes: {seen and seen.to_dict()}")
+            return False
+        if other.get("unknown") is not None:
+            print("❌ Unknown job found in the shared store")
+            return False
+        
+        with app.test_client() as client:
+            response = client.post("/chat/jobs", json={"message": "Hello"})
+            job_id = response.get_json().get("job_id")
+            if response.status_code != 202 or response.headers.get("Location") != f"/chat/jobs/{job_id}":
+                print(f"❌ Job not accepted: {response.status_code}")
+                return False
+            
+            response = client.get(f"/chat/jobs/{job_id}?wait=10")
+            data = response.get_json()
+            if response.status_code != 200 or data["status"] != "success" or not data.get("reply"):
+                print(f"❌ Job result not returned: {response.status_code} {data}")
+                return False
+            if client.get("/chat/jobs/unknown").status_code != 404 or client.get(f"/chat/jobs/{job_id}?wait=x").status_code != 400:
+                print("❌ Bad job requests not rejected")
+                return False
+        
+        # Job workers wait for a slot under the same cap as /chat
+        saved_admission = flask_app.admission
+        flask_app.admission = AdmissionController(max_concurrency=1)
+        try:
+            flask_app.admission.acquire_slot()
+            job = flask_app.job_queue.submit("Hello")
+            blocked = job.wait(0.2)
+            flask_app.admission.release()
+            finished = job.wait(5)
+        finally:
+            flask_app.admission = saved_admission
+        if blocked or not finished or job.status != "success":
+            print(f"❌ Job not held to the concurrency cap: {job.to_dict()}")
+            return False
+        
+        print("✅ Chat jobs working")
+        return True
+    except Exception as e:
+        print(f"❌ Chat jobs test failed: {e}")
+        return False
+
+def test_websocket_chat():
+    """Test the WebSocket chat channel and resuming replies."""
+    print("\n🔌 Testing WebSocket chat...")
+    
+    try:
+        import asyncio
+        import asgi_app
+        from starlette.testclient import TestClient
+        from asgi_app import app
+        from config import Config as config
+        from replies import ReplyRegistry
+        
+        async def collect(chunks):
+            return [chunk async for chunk in chunks]
+        
+        async def resume():
+            registry = ReplyRegistry(ttl=60)
+            reply, created = registry.start(("s", "r"), "s")
+            reply.append("one ")
+            reader = asyncio.ensure_future(collect(reply.follow(1)))
+            await asyncio.sleep(0)
+            reply.append("two ")
+            registry.finish(("s", "r"))
+            return created, registry.start(("s", "r"), "s")[1], await reader
+        
+        if asyncio.run(resume()) != (True, False, [(1, "two ")]):
+            print("❌ Reply stream not resumed from its offset")
+            return False
+        
+        with TestClient(app) as client:
+            with client.websocket_connect("/ws") as ws:
+                if ws.receive_json().get("type") != "status":
+                    print("❌ No status frame on connect")
+                    return False
+                ws.send_json({"type": "chat", "id": "q1", "message": "Hello"})
+                frames = [ws.receive_json()]
+                while frames[-1]["type"] not in ("done", "error"):
+                    frames.append(ws.receive_json())
+                ack, chunks, end = frames[0], frames[1:-1], frames[-1]
+                if ack["type"] != "ack" or end["type"] != "done" or not chunks or any(f["id"] != "q1" for f in frames):
+                    print(f"❌ Unexpected reply frames: {frames}")
+                    return False
+            
+            with client.websocket_connect("/ws") as ws:
+                ws.receive_json()
+                ws.send_json({"type": "resume", "id": "q1", "session_id": ack["session_id"], "offset": 0})
+                resumed = [ws.receive_json()]
+                while resumed[-1]["type"] not in ("done", "error"):
+                    resumed.append(ws.receive_json())
+                if "".join(f["delta"] for f in resumed[:-1]) != "".join(f["delta"] for f in chunks):
+                    print("❌ Resumed reply differs from the original")
+                    return False
+                ws.send_json({"type": "ping"})
+                if ws.receive_json() != {"type": "pong"}:
+                    print("❌ Ping not answered")
+                    return False
+            
+            # A question resent with the client's session id is answered once
+            with client.websocket_connect("/ws") as ws:
+                ws.receive_json()
+                replies = len(asgi_app.reply_registry)
+                for _ in range(2):
+                    ws.send_json({"type": "chat", "id": "q3", "message": "Hello", "session_id": "client-session"})
+                frames = [ws.receive_json()]
+                while frames[-1]["type"] != "done":
+                    frames.append(ws.receive_json())
+                if len(asgi_app.reply_registry) != replies + 1 or frames[0].get("session_id") != "client-session":
+                    print(f"❌ Resent question not deduplicated: {frames}")
+                    return False
+            
+            # New replies beyond a client's generation cap are refused; resuming one is not
+            saved = config.WS_MAX_GENERATIONS_PER_CLIENT
+            config.WS_MAX_GENERATIONS_PER_CLIENT = 0
+            try:
+                with client.websocket_connect("/ws") as ws:
+                    ws.receive_json()
+                    ws.send_json({"type": "chat", "id": "q2", "message": "Hello"})
+                    refused = ws.receive_json()
+                    ws.send_json({"type": "resume", "id": "q1", "session_id": ack["session_id"], "offset": len(chunks)})
+                    resumed = ws.receive_json()
+            finally:
+                config.WS_MAX_GENERATIONS_PER_CLIENT = saved
+            if refused.get("type") != "error" or "busy" not in refused.get("error", "") or resumed.get("type") != "done":
+                print(f"❌ Generation cap not applied: {refused} {resumed}")
+                return False
+        
+        print("✅ WebSocket chat working")
+        return True
+    except Exception as e:
+        print(f"❌ WebSocket chat test failed: {e}")
+        return False
+
 def main():
     """Main test function."""
     print("=" * 60)
@@ -112,7 +1277,30 @@ def main():
         test_imports,
         test_config,
         test_chatbot,
-        test_flask_app
+        test_flask_app,
+        test_streaming,
+        test_response_cache,
+        test_intent_engine,
+        test_asgi_app,
+        test_single_flight,
+        test_session_memory,
+        test_admission_control,
+        test_metrics_endpoint,
+        test_fake_openai_server,
+        test_backend_failover,
+        test_request_hedging,
+        test_circuit_breaker,
+        test_gunicorn_sizing,
+        test_lazy_startup,
+        test_transcript_export,
+        test_conversation_store,
+        test_static_assets,
+        test_emergency_triage,
+        test_faq_index,
+        test_query_routing,
+        test_chat_batch,
+        test_chat_jobs,
+        test_websocket_chat
     ]
     
     passed = 0
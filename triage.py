@@ -0,0 +1,139 @@
+"""
+Emergency triage for Healthcare Chatbot
+This module recognizes red-flag symptoms with one precompiled pattern so that urgent
+messages get emergency guidance immediately instead of waiting for the model.
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+from cache import normalize_query
+
+EMERGENCY_NOTICE = "🚨 This may be a medical emergency. Call your local emergency number (911 in the US, 112 in Europe) or go to the nearest emergency department now."
+
+# Red-flag symptom groups, matched against normalized text (lowercase, punctuation
+# replaced by spaces, so "can't" reads "can t"); the first red flag in the message
+# decides the guidance, and earlier groups win when two match at the same place.
+# "patterns" describe symptoms and always count; "topics" only name a condition, so they
+# count only in a message about someone's own case (see PERSONAL and INFORMATIONAL)
+RED_FLAGS = [
+    {
+        "name": "self_harm",
+        "patterns": [
+            r"suicid(?:e|al)", r"kill(?:ing)? myself", r"end(?:ing)? my (?:own )?life", r"want to die",
+            r"hurt(?:ing)? myself", r"self harm"
+        ],
+        "topics": [r"overdos(?:e|ed|es|ing)"],
+        "response": "You don't have to go through this alone. If you might act on these thoughts or have taken an overdose, call your local emergency number now. In the US you can call or text 988 (Suicide & Crisis Lifeline) any time; elsewhere, contact your local crisis line or go to the nearest emergency department."
+    },
+    {
+        "name": "cardiac",
+        "patterns": [
+            r"chest (?:pain|pressure|tightness|is tight)", r"(?:pain|pressure|tightness) in (?:my|the) chest"
+        ],
+        "topics": [r"heart attack", r"cardiac arrest"],
+        "response": "Chest pain or pressure can be a sign of a heart attack. Stop what you are doing and rest, and do not drive yourself to hospital. If you are not allergic, chewing an aspirin may help while you wait for help."
+    },
+    {
+        "name": "breathing",
+        "patterns": [
+            r"(?:can t|cannot|can not|couldn t|unable to|struggling to|hard to) (?:breathe|breath)",
+            r"(?:difficulty|trouble) breathing", r"not breathing",
+            r"stopped breathing", r"choking", r"lips (?:are |turning )?blue"
+        ],
+        "topics": [r"short(?:ness)? of breath"],
+        "response": "Severe difficulty breathing needs emergency care. Sit upright, loosen tight clothing, and use any prescribed rescue inhaler while you wait for help."
+    },
+    {
+        "name": "stroke",
+        "patterns": [
+            r"face (?:is )?droop(?:ing|s)?", r"slurred speech", r"slurring (?:my |his |her |their )?words",
+            r"(?:numb|numbness|weakness|weak) (?:on|in) one side", r"sudden (?:numbness|weakness|confusion)"
+        ],
+        "topics": [r"(?<!heat )(?<!sun )stroke"],
+        "response": "Face drooping, arm weakness or slurred speech can be signs of a stroke. Note the time the symptoms started; every minute counts for treatment."
+    },
+    {
+        "name": "anaphylaxis",
+        "patterns": [
+            r"anaphyla(?:xis|ctic)", r"throat (?:is )?(?:swelling|closing|swollen)",
+            r"(?:tongue|lips|face) (?:is |are )?swelling"
+        ],
+        "response": "Swelling of the throat, tongue or face can be a severe allergic reaction. Use an adrenaline auto-injector (EpiPen) now if one has been prescribed."
+    },
+    {
+        "name": "bleeding",
+        "patterns": [
+            r"(?:severe|heavy|uncontrolled) bleeding", r"bleeding (?:won t|will not|doesn t|does not) stop",
+            r"(?:coughing|vomiting|throwing) up blood", r"vomiting blood"
+        ],
+        "response": "For heavy bleeding, press firmly on the wound with a clean cloth and keep pressing until help arrives."
+    },
+    {
+        "name": "unresponsive",
+        "patterns": [
+            r"unconscious", r"unresponsive", r"passed out", r"won t wake up", r"not waking up",
+            r"convulsing"
+        ],
+        "topics": [r"seizures?", r"convulsions?"],
+        "response": "If someone is unresponsive or having a seizure, keep them safe from injury, do not put anything in their mouth, and lay them on their side once it stops. Start CPR if they are not breathing."
+    },
+    {
+        "name": "poisoning",
+        "patterns": [
+            r"(?:swallowed|drank|ate|ingested) (?:some |a |the )?(?:bleach|poison|detergent|antifreeze|battery)",
+            r"(?:been|was|am|is) poisoned"
+        ],
+        "response": "For a suspected poisoning, do not make the person vomit. Keep the container to show emergency services; in the US, Poison Control is 1-800-222-1222."
+    }
+]
+
+# A message about someone's own case names a person...
+PERSONAL = re.compile(r"\b(?:i|me|my|we|us|our|he|him|his|she|her|they|them|their|someone|somebody)\b")
+# ...and does not ask about a condition in general
+INFORMATIONAL = re.compile(
+    r"\b(?:what (?:is|are|causes)|symptoms? of|signs? of|prevent(?:s|ing|ion)?|side effects?|can you|"
+    r"risks? (?:of|factors?)|causes? of|difference between|how common|history of|recover(?:y|ing)? from)\b"
+)
+
+class TriageMatch(NamedTuple):
+    """A red-flag group found in a message."""
+    name: str
+    response: str
+
+class TriageEngine:
+    """Detect red-flag symptoms with a single combined regular expression."""
+    
+    def __init__(self, red_flags: List[dict]):
+        """
+        Args:
+            red_flags (list): Red-flag groups in priority order
+        """
+        self.red_flags = {flag["name"]: flag for flag in red_flags}
+        # One alternation with a named group per red flag, scanned once per message; the
+        # second one also recognizes condition names, for messages about someone's own case
+        self._symptoms = self._compile(red_flags, with_topics=False)
+        self._symptoms_and_topics = self._compile(red_flags, with_topics=True)
+    
+    @staticmethod
+    def _compile(red_flags: List[dict], with_topics: bool) -> "re.Pattern":
+        return re.compile("|".join(
+            rf"(?P<{flag['name']}>\b(?:{'|'.join(flag['patterns'] + (flag.get('topics', []) if with_topics else []))})\b)"
+            for flag in red_flags
+        ))
+    
+    def match(self, user_input: str) -> Optional[TriageMatch]:
+        """
+        Return the first red flag mentioned in the message, if any.
+        
+        Condition names such as "stroke" only count when the message is about someone's own
+        case ("I think I'm having a stroke"), not a general question ("symptoms of a stroke").
+        """
+        text = normalize_query(user_input)
+        personal = PERSONAL.search(text) is not None and INFORMATIONAL.search(text) is None
+        found = (self._symptoms_and_topics if personal else self._symptoms).search(text)
+        if found is None:
+            return None
+        flag = self.red_flags[found.lastgroup]
+        return TriageMatch(flag["name"], f"{EMERGENCY_NOTICE}\n\n{flag['response']}")
+
+triage_engine = TriageEngine(RED_FLAGS)